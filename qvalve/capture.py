@@ -0,0 +1,211 @@
+"""Capture and replay of main server and A2S traffic.
+
+`RecordingTransport` writes every datagram sent and received, and every
+receive that timed out, with its time, to a capture file.
+`ReplayTransport` answers the same requests from a capture file instead
+of the network, with the recorded delays (scaled by `speed`), so a scan
+of the live fleet can be re-run offline, repeatably.
+
+A capture file is gzipped; after `MAGIC`, each record is a `_RECORD`
+header, then the server's "HOST:PORTNO", then the datagram.
+"""
+
+# -------------------------------------------------------------------------------
+
+import gzip
+import struct
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+from loguru import logger
+
+from qvalve.transport import Transport
+
+# -------------------------------------------------------------------------------
+
+MAGIC = b"qvalve-capture-1\n"
+
+# kind, seconds since start, len(name), len(data).
+_RECORD = struct.Struct("<BdBH")
+
+# kinds of record.
+SEND, RECV, TIMEOUT = range(3)
+
+# -------------------------------------------------------------------------------
+
+
+def read_capture(path):
+    """Yield `(kind, secs, name, data)` for each record in capture file `path`."""
+
+    with gzip.open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{str(path)!r} is not a capture file")
+        while header := file.read(_RECORD.size):
+            kind, secs, namelen, datalen = _RECORD.unpack(header)
+            name = file.read(namelen).decode()
+            yield kind, secs, name, file.read(datalen)
+
+
+# -------------------------------------------------------------------------------
+
+
+class RecordingTransport(Transport):
+    """`Transport` that records its traffic to a capture file."""
+
+    def __init__(self, path):
+        """Initialize transport, recording to `path`."""
+
+        super().__init__()
+        self.path = Path(path)
+        # SIM115: the file stays open across calls, until `close`.
+        self._file = gzip.open(self.path, "wb")  # noqa: SIM115
+        self._file.write(MAGIC)
+        self._file_lock = threading.Lock()
+        self._start = time.monotonic()
+        self._nrecords = 0
+
+    # -------------------------------------------------------------------------------
+
+    def _write(self, kind, name, data=b""):
+
+        name = name.encode()
+        header = _RECORD.pack(kind, time.monotonic() - self._start, len(name), len(data))
+        with self._file_lock:
+            if self._file is not None:
+                self._file.write(header + name + data)
+                self._nrecords += 1
+
+    def on_send(self, name, data):
+        """Record datagram sent."""
+
+        super().on_send(name, data)
+        self._write(SEND, name, data)
+
+    def on_recv(self, name, data):
+        """Record datagram received."""
+
+        super().on_recv(name, data)
+        self._write(RECV, name, data)
+
+    def on_timeout(self, name):
+        """Record receive timed out."""
+
+        super().on_timeout(name)
+        self._write(TIMEOUT, name)
+
+    # -------------------------------------------------------------------------------
+
+    def close(self):
+        """Close sockets, and the capture file."""
+
+        super().close()
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                logger.success(f"recorded {self._nrecords} records to {str(self.path)!r}")
+
+
+# -------------------------------------------------------------------------------
+
+
+class ReplayTransport(Transport):
+    """`Transport` that answers from a capture file instead of the network.
+
+    Each request is answered with the responses (or the timeout) recorded
+    for the next identical request to the same server. Requests that
+    weren't recorded time out at once.
+    """
+
+    def __init__(self, path, speed=1.0):
+        """Initialize transport to replay `path`, `speed` times faster than recorded.
+
+        Args:
+            path: capture file, from `RecordingTransport`.
+            speed: divide recorded delays by this; 0 for no delays at all.
+        """
+
+        super().__init__()
+        self.speed = speed
+        # (name, request) -> exchanges, in order recorded; each exchange is
+        # a list of `(delay, response)`, where `response` is None for a
+        # timeout, and `delay` is from the previous event.
+        self._exchanges = defaultdict(deque)
+
+        # name -> (secs, exchange) of the last event with each server.
+        last = {}
+        nrecords = 0
+        for kind, secs, name, data in read_capture(path):
+            nrecords += 1
+            if kind == SEND:
+                exchange = []
+                self._exchanges[(name, data)].append(exchange)
+            elif name in last:
+                prev, exchange = last[name]
+                exchange.append((secs - prev, data if kind == RECV else None))
+            else:
+                continue
+            last[name] = (secs, exchange)
+
+        logger.info(f"replaying {nrecords} records from {str(path)!r}")
+
+    # -------------------------------------------------------------------------------
+
+    def _channel(self, server_addr, timeout):
+        return _ReplayChannel(self, server_addr, timeout)
+
+    def exchange(self, name, request):
+        """Return the next exchange recorded for `request` to server `name`."""
+
+        with self._lock:
+            exchanges = self._exchanges.get((name, request))
+            return exchanges.popleft() if exchanges else []
+
+    def sleep(self, delay):
+        """Sleep for recorded `delay`, scaled by `speed`."""
+
+        if self.speed:
+            time.sleep(delay / self.speed)
+
+
+# -------------------------------------------------------------------------------
+
+
+class _ReplayChannel:
+    """Socket-like view of a `ReplayTransport`, for exchanges with one server."""
+
+    def __init__(self, transport, server_addr, timeout):
+
+        self._transport = transport
+        self._name = f"{server_addr[0]}:{server_addr[1]}"
+        self._timeout = timeout
+        self._responses = deque()
+
+    def settimeout(self, timeout):
+        """Wait up to `timeout` seconds for each subsequent `recv`."""
+
+        self._timeout = timeout
+
+    def send(self, data):
+        """Look up the responses recorded for `data`."""
+
+        self._responses = deque(self._transport.exchange(self._name, data))
+        self._transport.on_send(self._name, data)
+
+    def recv(self, bufsize):
+        """Return the next response, after its recorded delay."""
+
+        delay, data = self._responses.popleft() if self._responses else (0, None)
+        if data is None or delay > self._timeout:
+            self._transport.sleep(min(delay, self._timeout))
+            self._transport.on_timeout(self._name)
+            raise TimeoutError("time out")
+
+        self._transport.sleep(delay)
+        self._transport.on_recv(self._name, data)
+        return data
+
+
+# -------------------------------------------------------------------------------
@@ -1,7 +1,10 @@
 """Command line interface."""
 
+import importlib.util
 import logging
+import re
 import sys
+from argparse import Namespace
 from pathlib import Path
 
 # import tf2mon.hacker
@@ -9,12 +12,35 @@ from libcli import BaseCLI
 from loguru import logger
 from steam.game_servers import MSRegion
 
-import qvalve.flaskapp
-import qvalve.gameserver
-import qvalve.reports
-
 __all__ = ["QvalveCLI"]
 
+# `--format` names; "text", or a `qvalve.formats.get_writer` format. Not
+# imported from there, to keep `qvalve.formats` and `qvalve.gameserver` out
+# of startup.
+FORMATS = ("text", "ndjson", "csv", "arrow")
+
+# filter options that a `query-sets` entry in the config file may set.
+QUERY_SET_OPTIONS = (
+    # stage1
+    "max-servers",
+    "regions",
+    "appid",
+    "empty",
+    "full",
+    "noplayers",
+    "map-name",
+    # stage2
+    "map-prefix",
+    "name-match",
+    "map-match",
+    "min-players",
+    "no-max-players",
+    "max-ping",
+    "no-mm-strict-1",
+    "keyword",
+    "no-keyword",
+)
+
 
 class QvalveCLI(BaseCLI):
     """Command line interface."""
@@ -28,6 +54,16 @@ class QvalveCLI(BaseCLI):
         "gamebots": Path(__file__).parent.joinpath("data/gamebots.csv"),
         "max-threads": 10,
         "max-servers": 100,
+        "rtt-model": Path("~/.qvalve-rtt.json"),
+        "last-known": Path("~/.qvalve-last-known.json"),
+        "rollups": Path("~/.qvalve-rollups.json"),
+        # main servers to page through, in order of preference.
+        "masters": ["hl2master.steampowered.com:27011"],
+        # named sets of filter options, for `--query-set`; e.g.,
+        #   [qvalve.query-sets.payload]
+        #   map-prefix = "pl_"
+        #   min-players = 12
+        "query-sets": {},
     }
 
     def init_logging(self, verbose: int) -> None:
@@ -64,6 +100,23 @@ class QvalveCLI(BaseCLI):
             show_keywords=False,
             show_tags=False,
             report_keywords=False,
+            format="text",
+            ping_sweep=None,
+            limit=None,
+            watch=None,
+            find_player=[],
+            query_set=[],
+            profile=None,
+            record=None,
+            replay=None,
+            replay_speed=1.0,
+            master=[],
+            rtt_model=self.config["rtt-model"],
+            last_known=self.config["last-known"],
+            rollups=self.config["rollups"],
+            snapshot=None,
+            deadline=None,
+            trends=None,
             # stage1 filters
             max_servers=self.config["max-servers"],
             regions=[
@@ -91,9 +144,15 @@ class QvalveCLI(BaseCLI):
             no_max_players=None,
             max_ping=None,
             no_mm_strict_1=None,
+            keyword=[],
+            no_keyword=[],
             map_prefix=None,  # prefix match; 'plr_'
+            name_match=None,  # regex or substring; 'uncletopia'
+            map_match=None,  # regex or substring; '^pl_|^plr_'
             # usage 2
             addrs=[],
+            addr_file=None,
+            as_completed=False,
             # usage 3
             web_server=False,
         )
@@ -145,6 +204,79 @@ class QvalveCLI(BaseCLI):
         )
         self.add_default_to_help(arg)
 
+        arg = self.parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help=(
+                "Print servers as human-readable `text`, or stream them as they complete "
+                "as newline-delimited JSON, CSV, or Apache Arrow IPC (requires `pyarrow`)"
+            ),
+        )
+        self.add_default_to_help(arg)
+
+        self.parser.add_argument(
+            "--ping-sweep",
+            metavar="NUM",
+            type=int,
+            help=(
+                "Probe servers with `A2S_INFO` only (no players or rules), "
+                "and print the `NUM` with the lowest ping"
+            ),
+        )
+
+        self.parser.add_argument(
+            "--limit",
+            metavar="NUM",
+            type=int,
+            help=(
+                "Stop once `NUM` servers pass the stage two filters, probing those "
+                "likely to pass first"
+            ),
+        )
+
+        self.parser.add_argument(
+            "--watch",
+            metavar="SECONDS",
+            type=float,
+            help=(
+                "Re-scan every `SECONDS`, printing only servers that were added (`+`), "
+                "removed (`-`) or changed (`~`)"
+            ),
+        )
+
+        self.parser.add_argument(
+            "--find-player",
+            metavar="NAME",
+            action="append",
+            help=(
+                "Print the servers that player `NAME` (case-insensitive, exact) "
+                "is playing on (may be repeated)"
+            ),
+        )
+
+        self.parser.add_argument(
+            "--query-set",
+            metavar="NAME",
+            action="append",
+            help=(
+                "Search for config `query-sets.NAME` (may be repeated); the sets are "
+                "searched in one pass, each server is queried once, and each set's "
+                "servers are printed separately. A set's filter options override "
+                "those on the command line"
+            ),
+        )
+
+        self.parser.add_argument(
+            "--trends",
+            choices=("minute", "hour", "day"),
+            help=(
+                "Print players, servers and median ping per map and region over time, "
+                "by the minute, hour or day, from `--rollups`; don't scan"
+            ),
+        )
+
+        self._add_engine_arguments()
+
         # -------------------------------------------------------------------------------
 
         stage1 = self.parser.add_argument_group(
@@ -220,6 +352,18 @@ class QvalveCLI(BaseCLI):
             help="Match map names that start with `PREFIX`",
         )
 
+        stage2.add_argument(
+            "--name-match",
+            metavar="PATTERN",
+            help="where server name matches regex `PATTERN` (case-insensitive; or a substring)",
+        )
+
+        stage2.add_argument(
+            "--map-match",
+            metavar="PATTERN",
+            help="where map name matches regex `PATTERN` (case-insensitive; or a substring)",
+        )
+
         stage2.add_argument(
             "--min-players",
             metavar="NUM",
@@ -246,14 +390,44 @@ class QvalveCLI(BaseCLI):
             help="where tf_mm_strict is not 1",
         )
 
+        stage2.add_argument(
+            "--keyword",
+            metavar="KEYWORD",
+            action="append",
+            help="where `keywords` or `sv_tags` include `KEYWORD` (may be repeated)",
+        )
+
+        stage2.add_argument(
+            "--no-keyword",
+            metavar="KEYWORD",
+            action="append",
+            help="where `keywords` and `sv_tags` exclude `KEYWORD` (may be repeated)",
+        )
+
         usage2 = self.parser.add_argument_group("Usage 2")
         usage2.add_argument(
             "addrs",
             metavar="ADDR",
             nargs="*",
-            help="Query list of Game server addresses, where ADDR is `IP:PORTNO`",
+            help=(
+                "Query list of Game server addresses, where ADDR is `IP:PORTNO`, "
+                "or `-` to read them from stdin"
+            ),
+        )
+
+        usage2.add_argument(
+            "--addr-file",
+            metavar="FILE",
+            help="Also query Game server addresses read from `FILE`, one or more per line",
         )
 
+        arg = usage2.add_argument(
+            "--as-completed",
+            action="store_true",
+            help="Print `text` as each server completes, rather than sorted at the end",
+        )
+        self.add_default_to_help(arg)
+
         usage3 = self.parser.add_argument_group("Usage 3")
         usage3.add_argument(
             "--web-server",
@@ -261,6 +435,241 @@ class QvalveCLI(BaseCLI):
             help="Run web server",
         )
 
+    def check_options(self) -> None:
+        """Reject combinations of options that don't go together."""
+
+        if self.options.format == "arrow" and not importlib.util.find_spec("pyarrow"):
+            self.parser.error("`--format arrow` requires `pyarrow`")
+
+        if self.options.watch is not None:
+            if self.options.format not in ("text", "ndjson"):
+                self.parser.error("`--watch` requires `--format text` or `ndjson`")
+            if self.options.addrs or self.options.ping_sweep or self.options.web_server:
+                self.parser.error("`--watch` applies to usage 1 searches only")
+
+        if self.options.limit is not None:
+            if self.options.limit < 1:
+                self.parser.error("`--limit` must be at least 1")
+            if self.options.ping_sweep or self.options.watch is not None:
+                self.parser.error("`--limit` doesn't apply to `--ping-sweep` or `--watch`")
+
+        if self.options.trends and (self.options.format != "text" or not self.options.rollups):
+            self.parser.error("`--trends` requires `--format text` and `--rollups`")
+
+        if self.options.find_player:
+            if self.options.format not in ("text", "ndjson"):
+                self.parser.error("`--find-player` requires `--format text` or `ndjson`")
+            if self.options.addrs or self.options.ping_sweep or self.options.watch is not None:
+                self.parser.error("`--find-player` applies to usage 1 searches only")
+
+        if self.options.query_set:
+            self._check_query_sets()
+
+        self._check_filter_options()
+        self._check_engine_options()
+
+    def _check_query_sets(self) -> None:
+        """Set `options.query_sets`, name -> options, from `--query-set` and the config."""
+
+        if self.options.format not in ("text", "ndjson"):
+            self.parser.error("`--query-set` requires `--format text` or `ndjson`")
+        if (
+            self.options.addrs
+            or self.options.ping_sweep
+            or self.options.watch is not None
+            or self.options.find_player
+            or self.options.limit is not None
+        ):
+            self.parser.error(
+                "`--query-set` applies to usage 1 searches only, without `--limit`"
+            )
+
+        self.options.query_sets = {}
+        for name in self.options.query_set:
+            if (query_set := self.config["query-sets"].get(name)) is None:
+                self.parser.error(f"`--query-set` {name!r} not in config `query-sets`")
+            if unknown := set(query_set) - set(QUERY_SET_OPTIONS):
+                self.parser.error(f"query set {name!r} can't set {', '.join(sorted(unknown))}")
+            options = Namespace(**vars(self.options))
+            for key, value in query_set.items():
+                setattr(options, key.replace("-", "_"), value)
+            self._check_filter_options(options, f"query set {name!r} ")
+            self.options.query_sets[name] = options
+
+    def _check_filter_options(self, options: Namespace | None = None, where: str = "") -> None:
+        """Reject stage two filters that can't be applied."""
+
+        options = options or self.options
+        for name in ("name_match", "map_match"):
+            if (pattern := getattr(options, name)) is not None:
+                try:
+                    re.compile(pattern)
+                except re.error as err:
+                    self.parser.error(f"{where}`--{name.replace('_', '-')}` {pattern!r}: {err}")
+
+    def _check_engine_options(self) -> None:
+        """Reject combinations of engine options that don't go together."""
+
+        if self.options.record and self.options.replay:
+            self.parser.error("`--record` and `--replay` are mutually exclusive")
+        if (self.options.record or self.options.replay) and self.options.web_server:
+            self.parser.error("`--record` and `--replay` don't apply to `--web-server`")
+        if self.options.replay and not self.options.replay.is_file():
+            self.parser.error(f"`--replay` file {str(self.options.replay)!r} not found")
+        addr_file = self.options.addr_file
+        if addr_file not in (None, "-") and not Path(addr_file).is_file():
+            self.parser.error(f"`--addr-file` file {addr_file!r} not found")
+
+        if self.options.deadline is not None:
+            if self.options.deadline <= 0:
+                self.parser.error("`--deadline` must be greater than 0")
+            if self.options.watch is not None:
+                self.parser.error("`--deadline` doesn't apply to `--watch`")
+
+        if self.options.snapshot is not None:
+            if self.options.addrs or self.options.addr_file or self.options.ping_sweep:
+                self.parser.error("`--snapshot` applies to usage 1 searches only")
+            if not self.options.snapshot.expanduser().parent.is_dir():
+                self.parser.error(
+                    f"`--snapshot` directory {str(self.options.snapshot.parent)!r} not found"
+                )
+
+        masters = []
+        for master in self.options.master or self.config["masters"]:
+            host, _, port = master.rpartition(":")
+            if not host or not port.isdigit():
+                self.parser.error(f"main server {master!r} is not `HOST:PORT`")
+            masters.append((host, int(port)))
+        self.options.master = masters
+
+    def _add_engine_arguments(self) -> None:
+        """Add arguments that tune, measure or record the scan engine."""
+
+        self.parser.add_argument(
+            "--master",
+            metavar="HOST:PORT",
+            action="append",
+            help=(
+                "Page through the main server at `HOST:PORT` (may be repeated); slow pages "
+                "are hedged, and failed pages retried, on the next. Default from config "
+                f"`masters`: {', '.join(self.config['masters'])}"
+            ),
+        )
+
+        self.parser.add_argument(
+            "--deadline",
+            metavar="SECONDS",
+            type=float,
+            help=(
+                "Stop the scan after `SECONDS`; cancel main server paging and outstanding "
+                "queries, report the servers completed by then, and how many were skipped"
+            ),
+        )
+
+        self.parser.add_argument(
+            "--profile",
+            metavar="FILE",
+            type=Path,
+            help=(
+                "Profile the scan; write a `pstats` dump to `FILE` and trace spans "
+                "to `FILE.trace.json` (Chrome-trace). With `--web-server`, profile "
+                "searches that check `Profile`"
+            ),
+        )
+
+        self.parser.add_argument(
+            "--record",
+            metavar="FILE",
+            type=Path,
+            help="Record all main server and `A2S` traffic, with timings, to capture `FILE`",
+        )
+
+        self.parser.add_argument(
+            "--replay",
+            metavar="FILE",
+            type=Path,
+            help="Answer main server and `A2S` requests from capture `FILE`, not the network",
+        )
+
+        arg = self.parser.add_argument(
+            "--replay-speed",
+            metavar="FACTOR",
+            type=float,
+            help=(
+                "Replay `FACTOR` times faster than recorded, or `0` for no delays "
+                "(pings shrink accordingly)"
+            ),
+        )
+        self.add_default_to_help(arg)
+
+        arg = self.parser.add_argument(
+            "--rtt-model",
+            metavar="FILE",
+            type=Path,
+            help=(
+                "Learn pings by IP prefix into `FILE`, and use it to skip servers "
+                "that are confidently over `--max-ping`"
+            ),
+        )
+        self.add_default_to_help(arg)
+
+        self.parser.add_argument(
+            "--no-rtt-model",
+            dest="rtt_model",
+            action="store_const",
+            const=None,
+            help="Don't read or write an RTT model",
+        )
+
+        arg = self.parser.add_argument(
+            "--last-known",
+            metavar="FILE",
+            type=Path,
+            help=(
+                "Keep the last-known ping, players and map of each server in `FILE`, and "
+                "probe the servers likely to pass first, under `--limit` or `--deadline`"
+            ),
+        )
+        self.add_default_to_help(arg)
+
+        self.parser.add_argument(
+            "--no-last-known",
+            dest="last_known",
+            action="store_const",
+            const=None,
+            help="Don't read or write last-known servers",
+        )
+
+        arg = self.parser.add_argument(
+            "--rollups",
+            metavar="FILE",
+            type=Path,
+            help=(
+                "Add each complete, unfiltered scan to time-series rollups of players, "
+                "servers and ping per map and region, kept in `FILE`"
+            ),
+        )
+        self.add_default_to_help(arg)
+
+        self.parser.add_argument(
+            "--no-rollups",
+            dest="rollups",
+            action="store_const",
+            const=None,
+            help="Don't read or write rollups",
+        )
+
+        self.parser.add_argument(
+            "--snapshot",
+            metavar="FILE",
+            type=Path,
+            help=(
+                "Publish the servers of each complete scan to memory-mapped snapshot `FILE`, "
+                "replacing it atomically, for other processes to read with "
+                "`qvalve.snapshot.Snapshot`"
+            ),
+        )
+
     def main(self) -> None:
         """Command line interface entry point (method)."""
 
@@ -276,19 +685,55 @@ class QvalveCLI(BaseCLI):
 
         hackers = HackerManager()
 
-        qvalve.gameserver.GameServer.configure(self.options, hackers)
+        self.check_options()
+
+        # Import each usage's modules on demand, so that `--version`,
+        # `--completion`, etc. don't pay for flask and friends, and CLI
+        # scans don't pay for the web app.
+
+        # PLC0415: deferred import keeps startup fast for non-scanning invocations.
+        import qvalve.gamebots  # noqa: PLC0415
+
+        # PLC0415: deferred import keeps startup fast for non-scanning invocations.
+        import qvalve.gameserver  # noqa: PLC0415
+
+        gamebots = qvalve.gamebots.GamebotMatcher.load(self.config["gamebots"])
+        qvalve.gameserver.GameServer.configure(self.options, hackers, gamebots)
 
         if self.options.web_server:
             # usage 3
-            qvalve.flaskapp.run_web_server(self.options)
+            # PLC0415: deferred import; only the web server needs flask.
+            import qvalve.flaskapp  # noqa: PLC0415
 
-        elif self.options.addrs:
-            # usage 2
-            qvalve.reports.query_gameservers(self.options)
+            qvalve.flaskapp.run_web_server(self.options)
 
         else:
-            # usage 1
-            qvalve.reports.search_mainserver(self.options)
+            # PLC0415: deferred import; only scans need the reports.
+            import qvalve.reports  # noqa: PLC0415
+
+            if self.options.trends:
+                # no scan; what earlier scans rolled up
+                qvalve.reports.print_trends(self.options)
+
+            elif self.options.addrs or self.options.addr_file:
+                # usage 2
+                qvalve.reports.query_gameservers(self.options)
+
+            elif self.options.query_set:
+                # usage 1, for several query sets at once
+                qvalve.reports.search_query_sets(self.options)
+
+            elif self.options.find_player:
+                # usage 1, for players
+                qvalve.reports.find_players(self.options)
+
+            elif self.options.watch is not None:
+                # usage 1, repeatedly
+                qvalve.reports.watch_mainserver(self.options)
+
+            else:
+                # usage 1
+                qvalve.reports.search_mainserver(self.options)
 
 
 def main(args: list[str] | None = None) -> None:
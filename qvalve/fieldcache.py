@@ -0,0 +1,125 @@
+"""Per-server cache of A2S_PLAYER and A2S_RULES responses.
+
+A2S_INFO is sent on every query; it measures `ping`, and carries the
+map and the number of players, along with `app_id`, `vac`, `keywords`
+and the rest, in a single packet. The other two requests are only sent
+again when what they return may have changed:
+
+* A2S_RULES (for `sv_tags`), a large, often multi-packet response that
+  rarely changes, once it's older than `RULES_TTL`.
+* A2S_PLAYER, when the number of players or the map in A2S_INFO has
+  changed since it was cached, or once it's older than `PLAYERS_TTL`.
+
+Until then, the cached players (and their scores and durations, as of
+when they were cached) and tags are restored to the `GameServer`.
+"""
+
+# -------------------------------------------------------------------------------
+
+import threading
+import time
+from collections import Counter
+
+# -------------------------------------------------------------------------------
+
+# seconds to reuse a server's A2S_RULES.
+RULES_TTL = 30 * 60
+
+# seconds to reuse a server's A2S_PLAYER, while its player count and map hold.
+PLAYERS_TTL = 5 * 60
+
+# -------------------------------------------------------------------------------
+
+
+class FieldCache:
+    """Last A2S_PLAYER and A2S_RULES of each server, and when they were fetched."""
+
+    def __init__(self, rules_ttl=RULES_TTL, players_ttl=PLAYERS_TTL, clock=time.monotonic):
+        """Initialize empty cache."""
+
+        self.rules_ttl = rules_ttl
+        self.players_ttl = players_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # addr -> (fetched, (players, map_name), a2s_players, known_hackers, gamebots)
+        self._players = {}
+        # addr -> (fetched, sv_tags)
+        self._rules = {}
+        self._stats = Counter()
+
+    # -------------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._players)
+
+    def stats(self):
+        """Return dict of hits and misses of each request."""
+
+        with self._lock:
+            return dict(self._stats)
+
+    # -------------------------------------------------------------------------------
+
+    def restore_players(self, gameserver):
+        """Restore cached players to `gameserver`, just given A2S_INFO; True if fresh."""
+
+        with self._lock:
+            entry = self._players.get(gameserver.addr)
+            if (
+                entry is None
+                or entry[1] != (gameserver.players, gameserver.map_name)
+                or self._clock() - entry[0] > self.players_ttl
+            ):
+                self._stats["players_misses"] += 1
+                return False
+            self._stats["players_hits"] += 1
+
+        gameserver.a2s_players = entry[2]
+        gameserver.known_hackers = list(entry[3])
+        gameserver.gamebots = entry[4]
+        return True
+
+    def store_players(self, gameserver):
+        """Cache the players of `gameserver`, just given A2S_PLAYER."""
+
+        with self._lock:
+            self._players[gameserver.addr] = (
+                self._clock(),
+                (gameserver.players, gameserver.map_name),
+                gameserver.a2s_players,
+                tuple(gameserver.known_hackers),
+                gameserver.gamebots,
+            )
+
+    # -------------------------------------------------------------------------------
+
+    def restore_rules(self, gameserver):
+        """Restore cached tags to `gameserver`; True if fresh."""
+
+        with self._lock:
+            entry = self._rules.get(gameserver.addr)
+            if entry is None or self._clock() - entry[0] > self.rules_ttl:
+                self._stats["rules_misses"] += 1
+                return False
+            self._stats["rules_hits"] += 1
+
+        gameserver.sv_tags = list(entry[1])
+        return True
+
+    def store_rules(self, gameserver):
+        """Cache the tags of `gameserver`, just given A2S_RULES."""
+
+        with self._lock:
+            self._rules[gameserver.addr] = (self._clock(), tuple(gameserver.sv_tags))
+
+    # -------------------------------------------------------------------------------
+
+    def forget(self, addr):
+        """Drop whatever is cached for the server at `addr`; e.g., it stopped answering."""
+
+        with self._lock:
+            self._players.pop(addr, None)
+            self._rules.pop(addr, None)
+
+
+# -------------------------------------------------------------------------------
@@ -2,6 +2,8 @@
 
 # -------------------------------------------------------------------------------
 
+import importlib.util
+
 from flask import Flask
 from loguru import logger
 
@@ -15,7 +17,6 @@ def run_web_server(args):
         {
             "BOOTSTRAP_BOOTSWATCH_THEME": "solar",
             "SECRET_KEY": "qvalve",  # secrets.token_urlsafe(16)
-            "SEND_FILE_MAX_AGE_DEFAULT": 0,  # DEV MODE ONLY
             "args": args,
         }
     )
@@ -51,6 +52,20 @@ def _create_app(config=None):
         import qvalve.flaskapp.routes  # noqa: PLC0415
 
         app.register_blueprint(qvalve.flaskapp.routes.bp)
+
+        # PLC0415: Flask app factory pattern requires deferred imports inside app context.
+        import qvalve.flaskapp.caching  # noqa: PLC0415
+
+        qvalve.flaskapp.caching.init_app(app)
+
+        if importlib.util.find_spec("flask_sock"):
+            # PLC0415: Flask app factory pattern requires deferred imports inside app context.
+            import qvalve.flaskapp.live  # noqa: PLC0415
+
+            qvalve.flaskapp.live.init_app(app)
+        else:
+            logger.warning("the live dashboard requires `flask-sock`")
+
         return app
 
 
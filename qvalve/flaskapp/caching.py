@@ -0,0 +1,106 @@
+"""HTTP caching and compression.
+
+HTML and JSON responses get a content-hash `ETag`, and a conditional
+request for one that hasn't changed is answered `304 Not Modified`,
+without a body. Those larger than `MIN_SIZE` are compressed with brotli
+(if `brotli` is installed) or gzip, when the browser accepts it; the
+`ETag` names the encoding, so each encoding is cached separately.
+
+Static assets are served with a long `max-age`, and linked with their
+content hash in the URL (`?v=...`), so a browser asks for each version
+of them once.
+"""
+
+# -------------------------------------------------------------------------------
+
+import functools
+import gzip
+import hashlib
+import importlib.util
+from http import HTTPStatus
+from pathlib import Path
+
+from flask import request
+
+# responses smaller than this many bytes aren't worth compressing.
+MIN_SIZE = 1024
+
+# seconds that browsers may cache static assets; they're versioned by URL.
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+# mimetypes of responses to tag and compress.
+_MIMETYPES = {"text/html", "application/json"}
+
+# -------------------------------------------------------------------------------
+
+
+def init_app(app):
+    """Add conditional responses, compression and static versioning to `app`."""
+
+    app.config["SEND_FILE_MAX_AGE_DEFAULT"] = STATIC_MAX_AGE
+    encoders = {"gzip": functools.partial(gzip.compress, compresslevel=6)}
+    if importlib.util.find_spec("brotli"):
+        # PLC0415: deferred import; `brotli` is optional.
+        import brotli  # noqa: PLC0415
+
+        encoders["br"] = functools.partial(brotli.compress, quality=5)
+
+    @app.url_defaults
+    def _static_version(endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            values["v"] = _file_hash(Path(app.static_folder, values["filename"]))
+
+    @app.after_request
+    def _conditional(response):
+        return _make_conditional(response, encoders)
+
+
+# -------------------------------------------------------------------------------
+
+
+def _make_conditional(response, encoders):
+    """Tag `response`; answer 304 if the browser has it, else compress it."""
+
+    if (
+        request.method not in ("GET", "HEAD", "POST")
+        or response.status_code != HTTPStatus.OK
+        or response.direct_passthrough
+        or response.mimetype not in _MIMETYPES
+    ):
+        return response
+
+    body = response.get_data()
+    encoding = None
+    if len(body) >= MIN_SIZE:
+        encoding = request.accept_encodings.best_match(encoders)
+    response.vary.add("Accept-Encoding")
+
+    if request.method != "POST":
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if encoding:
+            etag += f"-{encoding}"
+        response.set_etag(etag)
+        # cached, but checked with the server before each use.
+        response.cache_control.no_cache = True
+        response.make_conditional(request)
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            return response
+
+    if encoding:
+        response.set_data(encoders[encoding](body))
+        response.content_encoding = encoding
+
+    return response
+
+
+# -------------------------------------------------------------------------------
+
+
+@functools.lru_cache(maxsize=64)
+def _file_hash(path):
+    """Return short content hash of static file at `path`."""
+
+    try:
+        return hashlib.blake2b(path.read_bytes(), digest_size=6).hexdigest()
+    except OSError:
+        return "0"
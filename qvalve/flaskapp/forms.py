@@ -1,11 +1,16 @@
 """Web app forms."""
 
+import importlib.util
+import re
+
 from flask import current_app as app
 from flask_table import Col, Table
+from flask_table.html import element
 from flask_wtf import FlaskForm
 from steam import game_servers as gs
 from wtforms import (
     BooleanField,
+    FloatField,
     IntegerField,
     RadioField,
     SelectMultipleField,
@@ -18,6 +23,20 @@ from wtforms import (
 # -------------------------------------------------------------------------------
 
 
+class HackersCol(Col):
+    """Number of known hackers on the server; their names in the cell's title."""
+
+    def td(self, item, attr):
+        """Return table cell of `item`'s `attr`, a list of hackers."""
+
+        hackers = [str(x) for x in item.get(attr) or []]
+        attrs = {**self.td_html_attrs, "title": "\n".join(hackers)}
+        return element("td", content=str(len(hackers)), attrs=attrs)
+
+
+# -------------------------------------------------------------------------------
+
+
 class ServerTable(Table):
     """ServerTable."""
 
@@ -29,18 +48,34 @@ class ServerTable(Table):
     vac = Col("Vac")
     visibility = Col("Vis")
     n_imposters = Col("Imp", column_html_attrs={"class": "text-right"})
+    known_hackers = HackersCol("Hack", column_html_attrs={"class": "text-right"})
     server_host = Col("Host")
     server_port = Col("Port")
     ping = Col("Ping", column_html_attrs={"class": "text-right"})
     players = Col("Players", column_html_attrs={"class": "text-right"})
     max_players = Col("Max", column_html_attrs={"class": "text-right"})
     bots = Col("Bots", column_html_attrs={"class": "text-right"})
+    gamebots = Col("GB", column_html_attrs={"class": "text-right"})
     map_name = Col("Map")
     server_name = Col("Name")
     # keywords        = Col('Keywords')
 
     # -------------------------------------------------------------------------------
 
+    def __init__(self, items, **kwargs):
+        """Initialize table of `items`.
+
+        Each cell names its column in `data-col`, so that `app.js` finds
+        cells by column, whatever their position.
+        """
+
+        super().__init__(items, **kwargs)
+        for name, col in self._cols.items():
+            col.th_html_attrs["data-col"] = name
+            col.td_html_attrs["data-col"] = name
+
+    # -------------------------------------------------------------------------------
+
     def get_tr_attrs(self, item):
         """Return table row attributes for `item`."""
 
@@ -107,6 +142,26 @@ class RadioBool(RadioField):
 # -------------------------------------------------------------------------------
 
 
+def _regex(form, field):
+    """Validate that `field` is empty, or a regex."""
+
+    if field.data:
+        try:
+            re.compile(field.data)
+        except re.error as err:
+            raise validators.ValidationError(str(err)) from err
+
+
+def _live(form, field):
+    """Validate that `field` is unchecked, or the live dashboard is available."""
+
+    if field.data and not importlib.util.find_spec("flask_sock"):
+        raise validators.ValidationError("requires `flask-sock`")
+
+
+# -------------------------------------------------------------------------------
+
+
 class SearchForm(FlaskForm):
     """SearchForm."""
 
@@ -118,6 +173,14 @@ class SearchForm(FlaskForm):
         render_kw={"size": 4},
     )
     debug = BooleanField("Debug", default=app.config["args"].debug)
+    profile = BooleanField("Profile")
+    live = BooleanField("Live", [_live])
+    deadline = FloatField(
+        "Deadline (secs)",
+        [validators.optional(), validators.NumberRange(0.1, None, "Please enter at least 0.1")],
+        default=app.config["args"].deadline,
+        render_kw={"size": 4},
+    )
 
     # stage1 filters
     max_servers = IntegerField(
@@ -156,6 +219,19 @@ class SearchForm(FlaskForm):
         "Map prefix", default=app.config["args"].map_prefix, render_kw={"size": 30}
     )
 
+    name_match = StringField(
+        "Name match",
+        [_regex],
+        default=app.config["args"].name_match,
+        render_kw={"size": 30},
+    )
+    map_match = StringField(
+        "Map match",
+        [_regex],
+        default=app.config["args"].map_match,
+        render_kw={"size": 30},
+    )
+
     # stage2 filters go here
 
     min_players = IntegerField("Min Players", [validators.optional()], render_kw={"size": 4})
@@ -0,0 +1,276 @@
+"""Live dashboard.
+
+A `LiveFeed` keeps re-querying the servers found by a web search that
+checked `Live`, and pushes what changed about them (per
+`qvalve.watch.Differ`) to every browser connected to its `/live/KEY`
+WebSocket; the page patches just those rows. `LiveFeeds` keeps a feed
+per search, keyed by its parameters, so that browsers watching
+different searches each get their own rows; a feed nobody has watched
+for `IDLE` seconds is dropped. Each update is encoded once, however many
+browsers are connected, and names only the servers, and fields, that
+changed.
+
+Requires `flask-sock`.
+"""
+
+# -------------------------------------------------------------------------------
+
+import json
+import queue
+import threading
+import time
+
+from loguru import logger
+
+import qvalve.watch
+
+# seconds between re-queries of the result set.
+EVERY = 15
+
+# updates queued for a browser that isn't keeping up, before it's dropped;
+# it reconnects, and starts over from a full sync.
+BACKLOG = 32
+
+# seconds a feed is kept, and re-queried, with no browser connected.
+IDLE = 300
+
+# -------------------------------------------------------------------------------
+
+
+class LiveFeed:
+    """Re-query a result set; publish the changes to subscribers."""
+
+    def __init__(self):
+        """Initialize feed with nothing to watch."""
+
+        self._lock = threading.Lock()
+        self._mainserver = None
+        # addr -> `GameServer`; the result set, and the order of its rows.
+        self._servers = {}
+        self._differ = None
+        # bumped by `watch`, so that a re-query of an older result set is discarded.
+        self._generation = 0
+        self._seqno = 0
+        self._subscribers = set()
+        # `time.monotonic` since when there have been no subscribers.
+        self._idle_since = time.monotonic()
+
+    # -------------------------------------------------------------------------------
+
+    def watch(self, mainserver, servers):
+        """Start re-querying `servers`, a list of `GameServer`, with `mainserver`."""
+
+        with self._lock:
+            self._mainserver = mainserver
+            self._servers = {x.addr: x for x in servers}
+            self._differ = qvalve.watch.Differ()
+            self._differ.update(self._servers)
+            self._generation += 1
+            self._idle_since = time.monotonic()
+
+        logger.info(f"live: watching {len(servers)} servers")
+
+    # -------------------------------------------------------------------------------
+
+    def subscribe(self):
+        """Return a queue of encoded updates; `None` when dropped."""
+
+        subscriber = queue.Queue(BACKLOG)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            self._idle_since = None
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Stop publishing to `subscriber`."""
+
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if not self._subscribers and self._idle_since is None:
+                self._idle_since = time.monotonic()
+
+    def idle(self):
+        """Return seconds since the last subscriber left; 0 if there are any."""
+
+        with self._lock:
+            if self._idle_since is None:
+                return 0
+            return time.monotonic() - self._idle_since
+
+    # -------------------------------------------------------------------------------
+
+    def sync(self):
+        """Return an encoded update with every field of every server; for a new subscriber."""
+
+        with self._lock:
+            servers = dict(self._servers)
+            seqno = self._seqno
+        return json.dumps(
+            {
+                "seq": seqno,
+                "changed": {k: qvalve.watch.snapshot(v) for k, v in servers.items()},
+                "removed": [],
+            }
+        )
+
+    # -------------------------------------------------------------------------------
+
+    def refresh(self):
+        """Re-query the result set once; publish what changed, if anything."""
+
+        with self._lock:
+            mainserver = self._mainserver
+            servers = list(self._servers.values())
+            generation = self._generation
+            if mainserver is None or not self._subscribers:
+                return
+
+        answered = {x.addr: x for x in mainserver.requery(servers)}
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            events = self._differ.update(answered)
+            if not events:
+                return
+            self._seqno += 1
+            message = _encode(self._seqno, events)
+            subscribers = list(self._subscribers)
+
+        logger.debug(f"live: {len(events)} changed, to {len(subscribers)} subscribers")
+        for subscriber in subscribers:
+            self._publish(subscriber, message)
+
+    def _publish(self, subscriber, message):
+
+        try:
+            subscriber.put_nowait(message)
+        except queue.Full:
+            # too far behind; drop it, and let it resync.
+            self.unsubscribe(subscriber)
+            while True:
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    break
+            subscriber.put_nowait(None)
+
+
+# -------------------------------------------------------------------------------
+
+
+class LiveFeeds:
+    """A `LiveFeed` per search, by key; all re-queried by one thread."""
+
+    def __init__(self, every=EVERY):
+        """Initialize with no feeds."""
+
+        self.every = every
+        self._lock = threading.Lock()
+        # key -> `LiveFeed`.
+        self._feeds = {}
+        self._thread = None
+
+    def __len__(self):
+        return len(self._feeds)
+
+    # -------------------------------------------------------------------------------
+
+    def watch(self, key, mainserver, servers):
+        """Start re-querying `servers` with `mainserver`, for the browsers of feed `key`."""
+
+        with self._lock:
+            if (feed := self._feeds.get(key)) is None:
+                feed = self._feeds[key] = LiveFeed()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live", daemon=True)
+                self._thread.start()
+        feed.watch(mainserver, servers)
+
+    def get(self, key):
+        """Return feed `key`, or None if there isn't one; e.g., it was idle, and dropped."""
+
+        with self._lock:
+            return self._feeds.get(key)
+
+    # -------------------------------------------------------------------------------
+
+    def refresh(self):
+        """Re-query each feed once; drop those that have been idle for `IDLE`."""
+
+        with self._lock:
+            for key in [k for k, v in self._feeds.items() if v.idle() >= IDLE]:
+                logger.info(f"live: dropping idle feed {key}")
+                del self._feeds[key]
+            feeds = list(self._feeds.values())
+
+        for feed in feeds:
+            try:
+                feed.refresh()
+            except Exception as err:
+                logger.error(f"live: {err!r}")
+
+    def _run(self):
+
+        while True:
+            start = time.monotonic()
+            self.refresh()
+            time.sleep(max(0, self.every - (time.monotonic() - start)))
+
+
+# -------------------------------------------------------------------------------
+
+
+def _encode(seqno, events):
+    """Return `qvalve.watch.Differ` `events` as an update for the browser.
+
+    `changed` maps each addr to its changed fields, or all of them if it
+    answered again; `removed` lists the addrs that stopped answering.
+    """
+
+    changed = {}
+    removed = []
+    for event, addr, server, changes in events:
+        if event == "removed":
+            removed.append(addr)
+        elif event == "added":
+            changed[addr] = qvalve.watch.snapshot(server)
+        else:
+            changed[addr] = {k: v[1] for k, v in changes.items()}
+
+    return json.dumps({"seq": seqno, "changed": changed, "removed": removed})
+
+
+# -------------------------------------------------------------------------------
+
+
+def init_app(app):
+    """Add the `/live/KEY` WebSocket, and the `LiveFeeds` for it, to `app`."""
+
+    # PLC0415: deferred import; `flask-sock` is optional.
+    from flask_sock import Sock  # noqa: PLC0415
+
+    feeds = app.extensions["qvalve-live"] = LiveFeeds()
+    sock = Sock(app)
+
+    @sock.route("/live/<key>")
+    def live(ws, key):
+        if (feed := feeds.get(key)) is None:
+            # dropped while idle; the page has to search again.
+            ws.send(json.dumps({"expired": True}))
+            return
+        subscriber = feed.subscribe()
+        try:
+            ws.send(feed.sync())
+            while ws.connected:
+                try:
+                    message = subscriber.get(timeout=feeds.every)
+                except queue.Empty:
+                    continue
+                if message is None:
+                    break
+                ws.send(message)
+        except Exception as err:
+            logger.debug(f"live: {err!r}")
+        finally:
+            feed.unsubscribe(subscriber)
@@ -1,17 +1,25 @@
 """Web app routes."""
 
+import hashlib
+import json
 import os
+import tempfile
+import threading
 import time
 from pathlib import Path
 
-import pandas as pd
 from flask import Blueprint, render_template, request
 from flask import current_app as app
 from loguru import logger
 
 import qvalve.flaskapp.forms
 import qvalve.gameserver
+import qvalve.lastknown
 import qvalve.mainserver
+import qvalve.profiling
+import qvalve.reports
+import qvalve.rollups
+import qvalve.snapshot
 
 # -------------------------------------------------------------------------------
 
@@ -27,16 +35,18 @@ def index():
     form = qvalve.flaskapp.forms.SearchForm()
     data = None
     datalen = 0
+    skipped = 0
 
     if form.validate_on_submit():
-        dataframe = _search(form)
-        if dataframe is not None and len(dataframe) > 0:
-            data = qvalve.flaskapp.forms.ServerTable(
-                dataframe.to_dict("records"), table_id="servers"
-            )
-            datalen = len(dataframe)
-
-    return render_template("index.html", form=form, data=data, datalen=datalen)
+        rows, skipped = _search(form)
+        if rows:
+            data = qvalve.flaskapp.forms.ServerTable(rows, table_id="servers")
+            datalen = len(rows)
+
+    live = _live_key(form) if datalen and form.live.data else None
+    return render_template(
+        "index.html", form=form, data=data, datalen=datalen, skipped=skipped, live=live
+    )
 
 
 # -------------------------------------------------------------------------------
@@ -52,23 +62,64 @@ def _search(form):
             _MAIN_SERVER = qvalve.mainserver.MainServer(
                 max_threads=form.max_threads.data,
                 debug=form.debug.data,
+                masters=app.config["args"].master,
+                rollups=_load_rollups(),
+                last_known=_load_last_known(),
+                snapshot=app.config["args"].snapshot,
             )
 
-        servers = _MAIN_SERVER.search(
-            regions=form.regions.data,
-            max_servers=form.max_servers.data,
-            filters=_get_query_filters(form),
-        )
+        profiler = qvalve.profiling.Profiler(_profile_path() if form.profile.data else None)
+        with profiler.thread():
+            servers = _MAIN_SERVER.search(
+                regions=form.regions.data,
+                max_servers=form.max_servers.data,
+                filters=_get_query_filters(form),
+                deadline=form.deadline.data,
+                profiler=profiler,
+                likely=_likely(form),
+            )
+        profiler.save()
+        _MAIN_SERVER.rollups.save()
+        _MAIN_SERVER.last_known.save()
+        # how many the deadline skipped, if it expired.
+        skipped = servers.skipped
         if servers:
+            servers = _apply_post_query_filters(form, servers, _MAIN_SERVER)
+            if form.live.data:
+                app.extensions["qvalve-live"].watch(_live_key(form), _MAIN_SERVER, servers)
             # objs to dicts
-            dataframe = pd.DataFrame([x.__dict__ for x in servers])
-            dataframe = _apply_post_query_filters(form, dataframe)
-            return dataframe
+            return [dict(x.__dict__) for x in servers], skipped
 
     except Exception as err:
         raise err
         # logger.error(err)
-    return None
+    return None, skipped
+
+
+# -------------------------------------------------------------------------------
+
+
+def _load_rollups():
+    """Return the `--rollups` of the web server, or None."""
+
+    path = app.config["args"].rollups
+    return qvalve.rollups.Rollups.load(path) if path else None
+
+
+def _load_last_known():
+    """Return the `--last-known` servers of the web server, or None."""
+
+    path = app.config["args"].last_known
+    return qvalve.lastknown.LastKnown.load(path) if path else None
+
+
+# -------------------------------------------------------------------------------
+
+
+def _profile_path():
+    """Return where to write the profile of a search that checked `Profile`."""
+
+    return app.config["args"].profile or Path(tempfile.gettempdir(), "qvalve.pstats")
 
 
 # -------------------------------------------------------------------------------
@@ -98,29 +149,73 @@ def _get_query_filters(form):
     return filters
 
 
+# -------------------------------------------------------------------------------
+
+# form fields that don't change what a search finds.
+_NOT_SEARCH_FIELDS = ("csrf_token", "submit", "debug", "profile", "live", "max_threads")
+
+
+def _live_key(form):
+    """Return key of the live feed of the search `form` submitted; the same per search."""
+
+    params = {k: v for k, v in form.data.items() if k not in _NOT_SEARCH_FIELDS}
+    encoded = json.dumps(params, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+# -------------------------------------------------------------------------------
+
+
+def _likely(form):
+    """Return predicate of the post-query filters that a server's last-known state can test.
+
+    Probes are ranked by it, so that the servers likely to pass are
+    queried first; those that finish by a `deadline`, or arrive early
+    for `live`. None if there are no such filters.
+    """
+
+    checks = []
+    if form.map_prefix.data:
+        checks.append(lambda x: x.map_name.startswith(form.map_prefix.data))
+    if form.min_players.data:
+        checks.append(lambda x: x.players > form.min_players.data)
+    if form.max_bots.data:
+        checks.append(lambda x: x.bots <= form.max_bots.data)
+    if form.max_ping.data:
+        checks.append(lambda x: x.ping <= form.max_ping.data)
+    if not checks:
+        return None
+    return lambda x: all(check(x) for check in checks)
+
+
 # -------------------------------------------------------------------------------
 
 
-def _apply_post_query_filters(form, dataframe):
+def _apply_post_query_filters(form, servers, mainserver):
     if form.map_prefix.data:
-        dataframe = dataframe[dataframe.map_name.str.startswith(form.map_prefix.data)]
+        servers = [x for x in servers if x.map_name.startswith(form.map_prefix.data)]
+
+    # select from the indexes over all servers queried, rather than
+    # running the regex over each of `servers`.
+    if form.name_match.data:
+        addrs = mainserver.names.select(form.name_match.data)
+        servers = [x for x in servers if x.addr in addrs]
+
+    if form.map_match.data:
+        addrs = mainserver.maps.select(form.map_match.data)
+        servers = [x for x in servers if x.addr in addrs]
 
     if form.min_players.data:
-        dataframe = dataframe[dataframe.players > form.min_players.data]
+        servers = [x for x in servers if x.players > form.min_players.data]
 
     if form.max_bots.data:
-        dataframe = dataframe[dataframe.bots <= form.max_bots.data]
+        servers = [x for x in servers if x.bots <= form.max_bots.data]
 
     if form.max_ping.data:
-        dataframe = dataframe[dataframe.ping <= form.max_ping.data]
+        servers = [x for x in servers if x.ping <= form.max_ping.data]
 
     # sort
-    # dataframe.sort_values(['mapname', 'players'], ascending=[True, False], inplace=True)
-    dataframe.sort_values(
-        ["map_name", "ping", "server_host", "server_port"],
-        ascending=[True, True, True, True],
-        inplace=True,
-    )
+    servers.sort(key=lambda x: (x.map_name, x.ping, x.server_host, x.server_port))
 
     #    # toggle color on map change
     #    c1 = 'bg-default'
@@ -134,7 +229,7 @@ def _apply_post_query_filters(form, dataframe):
     #        dataframe.at[idx, 'tr_attrs'] = c
     #        # dataframe.at[idx, 'n_imposters'] = int(row['n_imposters'])
 
-    return dataframe
+    return servers
 
 
 # -------------------------------------------------------------------------------
@@ -202,7 +297,94 @@ def show_players(addr):
 
     jdoc = server.to_json()
     logger.debug(jdoc)
-    return jdoc
+    return app.response_class(jdoc, mimetype="application/json")
+
+
+# -------------------------------------------------------------------------------
+
+
+@bp.route("/find-player/<name>", methods=("GET",))
+def find_player(name):
+    """Return JSON list of the servers, searched so far, that player `name` is on."""
+
+    locations = _MAIN_SERVER.players.lookup(name) if _MAIN_SERVER else []
+    return {
+        "name": name,
+        "servers": [
+            {"addr": addr, "name": player, "score": score, "duration": duration}
+            for addr, player, score, duration in locations
+        ],
+    }
+
+
+# -------------------------------------------------------------------------------
+
+
+@bp.route("/trends/", defaults={"resolution": "hour"}, methods=("GET",))
+@bp.route("/trends/<any(minute, hour, day):resolution>", methods=("GET",))
+def trends(resolution):
+    """Players, servers and ping per map and region, by the minute, hour or day."""
+
+    rollups = _MAIN_SERVER.rollups if _MAIN_SERVER else _load_rollups()
+    starts, series = rollups.series(resolution) if rollups else ([], {})
+    return render_template(
+        "trends.html",
+        resolution=resolution,
+        starts=[time.strftime("%Y-%m-%d %H:%M", time.localtime(x)) for x in starts[-48:]],
+        maps=qvalve.reports.trend_rows(series, "map", limit=30),
+        regions=qvalve.reports.trend_rows(series, "region"),
+    )
+
+
+# -------------------------------------------------------------------------------
+
+_SNAPSHOT = None
+_SNAPSHOT_LOCK = threading.Lock()
+
+
+@bp.route("/snapshot", methods=("GET",))
+def snapshot():
+    """Return JSON of the servers in the `--snapshot` last published, that match the args.
+
+    Read in place from the shared snapshot file, however many workers
+    serve it, without scanning; e.g., `/snapshot?map_prefix=pl_&min_players=12`.
+    """
+
+    path = app.config["args"].snapshot
+    if not path:
+        return {"error": "no `--snapshot`"}, 404
+
+    try:
+        snapshot = _latest_snapshot(path)
+    except (OSError, ValueError) as err:
+        return {"error": str(err)}, 404
+
+    indexes = snapshot.select(
+        map_prefix=request.args.get("map_prefix"),
+        min_players=request.args.get("min_players", type=int),
+        max_ping=request.args.get("max_ping", type=int),
+    )
+    return {
+        "created": snapshot.created,
+        "count": len(snapshot),
+        "servers": [snapshot.record(x) for x in indexes],
+    }
+
+
+def _latest_snapshot(path):
+    """Return the shared `Snapshot` at `path`, re-mapped if a newer one has been published.
+
+    The one it replaces isn't closed (`Snapshot.refresh` would), as other
+    requests may still be reading it; it's unmapped when the last of them
+    lets go of it.
+    """
+
+    # PLW0603: _SNAPSHOT is a module-level singleton, re-mapped when a newer one is published.
+    global _SNAPSHOT  # noqa: PLW0603
+    with _SNAPSHOT_LOCK:
+        if _SNAPSHOT is None or _SNAPSHOT.is_stale():
+            _SNAPSHOT = qvalve.snapshot.Snapshot.open(path)
+        return _SNAPSHOT
 
 
 # -------------------------------------------------------------------------------
@@ -89,10 +89,11 @@ function toggle_players(server_row) {
     player_row.classList.replace('server', 'players')
 
     // make the players appear indented by skipping a few columns
+    let indent = cell(server_row, 'max_players').cellIndex
     let td = player_row.insertCell(0)
-    td.colSpan = 10
+    td.colSpan = indent
     td = player_row.insertCell(1)
-    td.colSpan = 4
+    td.colSpan = server_row.cells.length - indent
     td.width = '100%'
     td.appendChild(document.createElement(null))
 
@@ -109,11 +110,9 @@ function refresh(server_row, players_row) {
         .then((response) => response.json())
         .then((server) => {
             // render_server
-            server_row.cells[8].innerText = server['ping']
-            server_row.cells[9].innerText = server['players']
-            server_row.cells[10].innerText = server['max_players']
-            server_row.cells[11].innerText = server['bots']
-            server_row.cells[12].innerText = server['map_name']
+            for (let name of ['ping', 'players', 'max_players', 'bots', 'map_name']) {
+                cell(server_row, name).innerText = server[name]
+            }
             if (players_row) {
                 td = players_row.cells[1]
                 td.replaceChild(render_players(server), td.firstChild)
@@ -173,11 +172,70 @@ function render_players(server) {
 
 //------------------------------------------------------------------------------
 
+function live(servers_table, key) {
+    // Patch server rows with the changes pushed over the `/live/<key>`
+    // WebSocket of this search; see `qvalve.flaskapp.live`. Reconnect,
+    // and resync, if dropped.
+
+    let rows = {}
+    servers_table.querySelectorAll('tr.server').forEach((row) => {
+        rows[row.getAttribute('addr')] = row
+    })
+
+    let scheme = location.protocol == 'https:' ? 'wss' : 'ws'
+    let socket = new WebSocket(`${scheme}://${location.host}/live/${key}`)
+
+    socket.onmessage = (e) => {
+        let update = JSON.parse(e.data)
+        if (update.expired) {
+            // the feed is gone; don't reconnect.
+            socket.onclose = null
+            return
+        }
+        for (let [addr, fields] of Object.entries(update.changed)) {
+            let row = rows[addr]
+            if (row) {
+                patch_row(row, fields)
+            }
+        }
+        update.removed.forEach((addr) => {
+            if (rows[addr]) {
+                rows[addr].setAttribute('_removed', 'true')
+            }
+        })
+    }
+
+    socket.onclose = () => setTimeout(() => live(servers_table, key), 5000)
+}
+
+function patch_row(server_row, fields) {
+    // Update the cells of `fields` that changed; flag the row as changed.
+
+    for (let [name, value] of Object.entries(fields)) {
+        let td = cell(server_row, name)
+        if (!td) {
+            continue
+        }
+        if (name == 'known_hackers') {
+            td.title = value.join('\n')
+            value = value.length
+        }
+        td.innerText = value
+    }
+
+    server_row.removeAttribute('_removed')
+    server_row.classList.remove('changed')
+    void server_row.offsetWidth  // restart the animation
+    server_row.classList.add('changed')
+}
+
+//------------------------------------------------------------------------------
+
 function url_for(server_row, path) {
 
     let addr = server_row.getAttribute('addr')
-    let map_name = server_row.cells[server_row.cells.length-2].innerText
-    let server_name = server_row.cells[server_row.cells.length-1].innerText
+    let map_name = cell(server_row, 'map_name').innerText
+    let server_name = cell(server_row, 'server_name').innerText
     let params = new URLSearchParams({map_name: map_name, server_name: server_name})
 
     return `${path}/${addr}?${params}`
@@ -185,6 +243,13 @@ function url_for(server_row, path) {
 
 //------------------------------------------------------------------------------
 
+function cell(server_row, name) {
+    // Return the <td> of column `name` (its `data-col`; see `ServerTable`), or null.
+    return server_row.querySelector(`td[data-col="${name}"]`)
+}
+
+//------------------------------------------------------------------------------
+
 function insertAfter(newNode, referenceNode) {
     // Return inserted node.
 	return referenceNode.parentNode.insertBefore(newNode, referenceNode.nextSibling);
@@ -0,0 +1,186 @@
+"""Machine-readable output formats.
+
+Writers that stream `GameServer` records to a binary file, usually
+`sys.stdout.buffer`, as servers complete. Records are encoded as they
+arrive and written in bulk, one `write` per batch.
+"""
+
+# -------------------------------------------------------------------------------
+
+import abc
+import csv
+import io
+import json
+import time
+
+import qvalve.gameserver
+
+# -------------------------------------------------------------------------------
+
+
+class _Writer(abc.ABC):
+    """Base class of streaming writers."""
+
+    # write a batch when it reaches this many records...
+    batch_size = 256
+    # ...or when its first record is this many seconds old.
+    batch_secs = 0.5
+
+    def __init__(self, file):
+        """Initialize writer to binary `file`."""
+
+        self._file = file
+        self._batch = []
+        self._batch_start = None
+        self.nrecords = 0
+
+    def write(self, server):
+        """Add `server` to the current batch; write the batch if it's due."""
+
+        self.write_record(server.to_dict())
+
+    def write_record(self, record):
+        """Add dict `record` to the current batch; write the batch if it's due."""
+
+        if not self._batch:
+            self._batch_start = time.monotonic()
+        self._batch.append(self._encode(record))
+        self.nrecords += 1
+
+        if (
+            len(self._batch) >= self.batch_size
+            or time.monotonic() - self._batch_start >= self.batch_secs
+        ):
+            self.flush()
+
+    def flush(self):
+        """Write the current batch."""
+
+        if self._batch:
+            self._write_batch(self._batch)
+            self._batch = []
+        self._file.flush()
+
+    def close(self):
+        """Write the current batch and any trailer."""
+
+        self.flush()
+
+    def _encode(self, record):
+        return record
+
+    @abc.abstractmethod
+    def _write_batch(self, batch):
+        """Write `batch`, a list of encoded records, to the file."""
+
+
+# -------------------------------------------------------------------------------
+
+
+class NdjsonWriter(_Writer):
+    """Newline-delimited JSON; one object per server."""
+
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def _encode(self, record):
+        return self._encoder.encode(record)
+
+    def _write_batch(self, batch):
+        batch.append("")
+        self._file.write("\n".join(batch).encode("utf-8"))
+
+
+# -------------------------------------------------------------------------------
+
+
+class CsvWriter(_Writer):
+    """Comma-separated values with a header row; lists are comma-joined."""
+
+    def __init__(self, file):
+        """Initialize writer to binary `file`, and write the header."""
+
+        super().__init__(file)
+        self._text = io.StringIO()
+        self._csv = csv.writer(self._text, lineterminator="\n")
+        self._write_batch([qvalve.gameserver.GameServer.FIELDS])
+
+    def _encode(self, record):
+        return [
+            ",".join(value) if isinstance(value, list) else value for value in record.values()
+        ]
+
+    def _write_batch(self, batch):
+        self._csv.writerows(batch)
+        self._file.write(self._text.getvalue().encode("utf-8"))
+        self._text.seek(0)
+        self._text.truncate()
+
+
+# -------------------------------------------------------------------------------
+
+
+class ArrowWriter(_Writer):
+    """Apache Arrow IPC stream; one record batch per batch of servers.
+
+    Requires `pyarrow`.
+    """
+
+    def __init__(self, file):
+        """Initialize writer to binary `file`, and write the schema."""
+
+        super().__init__(file)
+
+        # PLC0415: optional dependency; imported only when this format is used.
+        import pyarrow as pa  # noqa: PLC0415
+
+        self._pa = pa
+        string = pa.string()
+        uint = pa.int32()
+        self._schema = pa.schema(
+            [
+                ("region", uint),
+                ("addr", string),
+                ("app_id", uint),
+                ("server_type", string),
+                ("vac", uint),
+                ("visibility", uint),
+                ("n_imposters", uint),
+                ("ping", uint),
+                ("players", uint),
+                ("max_players", uint),
+                ("bots", uint),
+                ("gamebots", uint),
+                ("map_name", string),
+                ("server_name", string),
+                ("keywords", pa.list_(string)),
+                ("sv_tags", pa.list_(string)),
+                ("playernames", pa.list_(string)),
+            ]
+        )
+        self._stream = pa.ipc.new_stream(file, self._schema)
+
+    def _write_batch(self, batch):
+        self._stream.write_batch(self._pa.RecordBatch.from_pylist(batch, schema=self._schema))
+
+    def close(self):
+        """Write the current batch and the end-of-stream marker."""
+
+        self.flush()
+        self._stream.close()
+
+
+# -------------------------------------------------------------------------------
+
+
+def get_writer(name, file):
+    """Return writer for format `name` to binary `file`."""
+
+    writers = {
+        "ndjson": NdjsonWriter,
+        "csv": CsvWriter,
+        "arrow": ArrowWriter,
+    }
+    return writers[name](file)
+
+
+# -------------------------------------------------------------------------------
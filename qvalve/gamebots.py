@@ -0,0 +1,121 @@
+"""Gamebot name matcher.
+
+Gamebots (e.g., the bots that hijack casual servers) play under names
+from a known list, `data/gamebots.csv`; when several join the same
+server, the game prefixes duplicates with `(1)`, `(2)`, etc. The whole
+list is compiled, once, into a single regex, and a server's player list
+is matched against it in one pass.
+
+The literal names are compiled as a trie (`A(?:imBot|mNot)|...`), so
+matching a name costs about the same however long the list grows; a
+line of the form `/PATTERN/` adds regex `PATTERN` as an alternative.
+"""
+
+# -------------------------------------------------------------------------------
+
+import csv
+import re
+from pathlib import Path
+
+from loguru import logger
+
+# -------------------------------------------------------------------------------
+
+# added to names taken by another player on the same server.
+_DUPLICATE_PREFIX = r"(?:\(\d+\))?"
+
+# -------------------------------------------------------------------------------
+
+
+class GamebotMatcher:
+    """Recognize gamebots by player name."""
+
+    def __init__(self, names=(), patterns=()):
+        """Initialize matcher of literal `names` and regex `patterns`."""
+
+        self.names = frozenset(names)
+        self.patterns = tuple(patterns)
+        alternatives = list(self.patterns)
+        if self.names:
+            alternatives.insert(0, _trie_pattern(self.names))
+        self._regex = None
+        if alternatives:
+            # one player per line; `$` doesn't span lines.
+            self._regex = re.compile(
+                rf"^{_DUPLICATE_PREFIX}(?:{'|'.join(alternatives)})$", re.MULTILINE
+            )
+
+    # -------------------------------------------------------------------------------
+
+    @classmethod
+    def load(cls, path):
+        """Return matcher of the names in the first column of csv file `path`."""
+
+        names = []
+        patterns = []
+        try:
+            with Path(path).expanduser().open(encoding="utf-8", newline="") as file:
+                for row in csv.reader(file):
+                    if not row or not (name := row[0].strip()):
+                        continue
+                    if name.startswith("/") and name.endswith("/") and name[1:-1]:
+                        patterns.append(_checked(name[1:-1]))
+                    else:
+                        names.append(name)
+        except (OSError, re.error) as err:
+            logger.warning(f"ignoring gamebots {str(path)!r}: {err}")
+            return cls()
+
+        logger.debug(f"loaded {len(names)} gamebot names, {len(patterns)} patterns")
+        return cls(names, patterns)
+
+    # -------------------------------------------------------------------------------
+
+    def is_gamebot(self, name):
+        """Return True if `name` is a gamebot's."""
+
+        return self.count([name]) == 1
+
+    def count(self, names):
+        """Return how many of the players `names` are gamebots."""
+
+        if self._regex is None or not names:
+            return 0
+        return len(self._regex.findall("\n".join(x.replace("\n", " ") for x in names)))
+
+
+# -------------------------------------------------------------------------------
+
+
+def _trie_pattern(names):
+    """Return a regex matching exactly the strings `names`, factored as a trie."""
+
+    trie = {}
+    for name in names:
+        node = trie
+        for char in name:
+            node = node.setdefault(char, {})
+        # end of a name.
+        node[""] = {}
+
+    def _pattern(node):
+        ends = "" in node
+        branches = [re.escape(k) + _pattern(v) for k, v in sorted(node.items()) if k]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not ends:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if ends else group
+
+    return _pattern(trie)
+
+
+def _checked(pattern):
+    """Return regex `pattern`; raise `re.error` if it doesn't compile."""
+
+    re.compile(pattern)
+    return f"(?:{pattern})"
+
+
+# -------------------------------------------------------------------------------
@@ -10,6 +10,8 @@ from pprint import pprint as pp
 import steam.game_servers
 from loguru import logger
 
+import qvalve.players
+
 # -------------------------------------------------------------------------------
 
 
@@ -24,17 +26,48 @@ class GameServer:
 
     # -------------------------------------------------------------------------------
 
+    # attributes exported by `to_dict`, in column order.
+    FIELDS = (
+        "region",
+        "addr",
+        "app_id",
+        "server_type",
+        "vac",
+        "visibility",
+        "n_imposters",
+        "ping",
+        "players",
+        "max_players",
+        "bots",
+        "gamebots",
+        "map_name",
+        "server_name",
+        "keywords",
+        "sv_tags",
+        "playernames",
+    )
+
+    # -------------------------------------------------------------------------------
+
     _hackerdb = None
     _debug = None
     _rules = None
+    _gamebots = None
 
     @classmethod
-    def configure(cls, args, hackerdb):
-        """Configure interface."""
+    def configure(cls, args, hackerdb, gamebots=None):
+        """Configure interface.
+
+        Args:
+            args: command line options.
+            hackerdb: provider of `lookup_name`.
+            gamebots: `qvalve.gamebots.GamebotMatcher` to count gamebots with.
+        """
 
         cls._hackerdb = hackerdb
         cls._debug = args.debug
         cls._rules = args.show_tags
+        cls._gamebots = gamebots
 
     # -------------------------------------------------------------------------------
 
@@ -79,11 +112,11 @@ class GameServer:
         self.ping = None
 
         # from `steam.game_servers.a2s_player`
-        self.a2s_players = []
+        self.a2s_players = qvalve.players.Players()
         # our extensions
-        self.playernames = []
         self.known_hackers = []
         self.n_imposters = 0
+        self.gamebots = 0
 
         # from `steam.game_servers.a2s_rules`
         # <none; sv_tags comes as string; we split and store as list>
@@ -102,12 +135,28 @@ class GameServer:
 
     # -------------------------------------------------------------------------------
 
+    @property
+    def playernames(self):
+        """Return list of (non-blank) player names, sorted; legacy."""
+
+        return [x for x in self.a2s_players.names if x]
+
+    # -------------------------------------------------------------------------------
+
+    def to_dict(self):
+        """Return dict of `FIELDS`, for machine-readable output formats."""
+
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    # -------------------------------------------------------------------------------
+
     def to_json(self):
         """Return json repr of self."""
 
         serializable = {
             key: value for key, value in self.__dict__.items() if key not in ("known_hackers")
         }
+        serializable["a2s_players"] = self.a2s_players.to_list()
         try:
             return json.dumps(serializable)
         except Exception as err:
@@ -136,13 +185,29 @@ class GameServer:
 
     # -------------------------------------------------------------------------------
 
-    def query(self):
-        """Query Game Server."""
+    def query(self, a2s=steam.game_servers, cache=None):
+        """Query Game Server.
+
+        Args:
+            a2s: provider of `a2s_info`, `a2s_players` and `a2s_rules`; the
+                `steam.game_servers` module, or a `qvalve.transport.Transport`.
+            cache: `qvalve.fieldcache.FieldCache` to skip A2S_PLAYER and
+                A2S_RULES requests when their last responses are still fresh.
+        """
+
+        if not self._get_a2s_info(a2s=a2s):
+            return
 
-        if self._get_a2s_info():
-            self._get_a2s_players()
+        if cache is None:
+            self._get_a2s_players(a2s)
             if self._rules:
-                self._get_a2s_rules()
+                self._get_a2s_rules(a2s)
+            return
+
+        if not cache.restore_players(self) and self._get_a2s_players(a2s):
+            cache.store_players(self)
+        if self._rules and not cache.restore_rules(self) and self._get_a2s_rules(a2s):
+            cache.store_rules(self)
 
         # logger.trace(f'server={self}')
         # if self._debug:
@@ -150,19 +215,29 @@ class GameServer:
 
     # -------------------------------------------------------------------------------
 
-    def _get_a2s_info(self):
+    def probe(self, timeout=2, a2s=steam.game_servers):
+        """Query Game Server for A2S_INFO only; the cheapest way to get `ping`."""
+
+        return self._get_a2s_info(timeout, a2s)
+
+    # -------------------------------------------------------------------------------
+
+    def _get_a2s_info(self, timeout=2, a2s=steam.game_servers):
         """Get A2S_INFO data."""
 
         addr = self.server_addr
         try:
-            info = steam.game_servers.a2s_info(addr)
+            info = a2s.a2s_info(addr, timeout=timeout)
         except socket.timeout:
+            self.ping = None
             return False
         except RuntimeError:  # as err:
             # logger.error(f'{err} a2s_info({addr})')
+            self.ping = None
             return False
         except ConnectionRefusedError:  # as err:
             # logger.error(f'{err} a2s_info({addr})')
+            self.ping = None
             return False
 
         logger.debug(f"a2s_info({addr})")
@@ -187,12 +262,12 @@ class GameServer:
 
     # -------------------------------------------------------------------------------
 
-    def _get_a2s_players(self):
+    def _get_a2s_players(self, a2s=steam.game_servers):
         """Get A2S_PLAYER data."""
 
         addr = self.server_addr
         try:
-            players = steam.game_servers.a2s_players(addr)
+            players = a2s.a2s_players(addr)
         except socket.timeout:
             return False
         except RuntimeError as err:
@@ -203,22 +278,20 @@ class GameServer:
         if self._debug:
             pp({"players": players})
 
-        self.a2s_players = sorted(players, key=lambda x: x["name"].upper())
+        self.known_hackers = []
 
-        for player in self.a2s_players:
-            if hackers := self._hackerdb.lookup_name(player["name"]):
+        def _attributes(name):
+            if hackers := self._hackerdb.lookup_name(name):
                 hacker = hackers[0]
                 if not hacker.is_gamebot:
                     self.known_hackers.append(hacker)
                     logger.warning(f"hacker={hacker!r}")
-                player["attributes"] = hacker.attributes_to_str()
-            else:
-                player["attributes"] = ""
+                return hacker.attributes_to_str()
+            return ""
 
-        # legacy
-        self.playernames = sorted(
-            [x["name"] for x in self.a2s_players if len(x["name"]) > 0], key=lambda x: x.upper()
-        )
+        self.a2s_players = qvalve.players.Players.from_a2s(players, _attributes)
+        if self._gamebots is not None:
+            self.gamebots = self._gamebots.count(self.a2s_players.names)
 
         return True
 
@@ -265,12 +338,12 @@ class GameServer:
 
     # -------------------------------------------------------------------------------
 
-    def _get_a2s_rules(self):
+    def _get_a2s_rules(self, a2s=steam.game_servers):
         """Get A2S_RULES data."""
 
         addr = self.server_addr
         try:
-            rules = steam.game_servers.a2s_rules(addr)
+            rules = a2s.a2s_rules(addr)
         except socket.timeout:
             return False
         except RuntimeError as err:
@@ -0,0 +1,318 @@
+"""Indexes over the live set of queried game servers.
+
+Each index is updated incrementally, one `GameServer` at a time, as
+workers finish querying it, and is keyed by the server's `addr`.
+"""
+
+# -------------------------------------------------------------------------------
+
+import functools
+import re
+import threading
+from collections import defaultdict
+
+try:
+    from re import _parser as sre_parse  # python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+# -------------------------------------------------------------------------------
+
+
+class KeywordIndex:
+    """Inverted index from `keywords` and `sv_tags` to server addresses.
+
+    Also keeps running totals of servers and players per keyword, so the
+    keywords report is a readout rather than a rescan.
+    """
+
+    def __init__(self):
+        """Initialize empty index."""
+
+        self._lock = threading.Lock()
+        # keyword -> {addr}
+        self._servers = defaultdict(set)
+        # keyword -> sum of players
+        self._players = defaultdict(int)
+        # addr -> (keywords, players); what to undo when `addr` is updated.
+        self._entries = {}
+
+    # -------------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._entries)
+
+    # -------------------------------------------------------------------------------
+
+    def update(self, server):
+        """Index (or re-index) `server`."""
+
+        keywords = frozenset(x for x in (*server.keywords, *server.sv_tags) if x)
+        players = server.players or 0
+
+        with self._lock:
+            self._remove(server.addr)
+            self._entries[server.addr] = (keywords, players)
+            for keyword in keywords:
+                self._servers[keyword].add(server.addr)
+                self._players[keyword] += players
+
+    # -------------------------------------------------------------------------------
+
+    def remove(self, addr):
+        """Remove server at `addr` from the index."""
+
+        with self._lock:
+            self._remove(addr)
+
+    def _remove(self, addr):
+
+        if (entry := self._entries.pop(addr, None)) is None:
+            return
+
+        keywords, players = entry
+        for keyword in keywords:
+            addrs = self._servers[keyword]
+            addrs.discard(addr)
+            if addrs:
+                self._players[keyword] -= players
+            else:
+                del self._servers[keyword]
+                del self._players[keyword]
+
+    # -------------------------------------------------------------------------------
+
+    def select(self, include=(), exclude=()):
+        """Return set of addrs having all of `include` and none of `exclude`."""
+
+        with self._lock:
+            if include:
+                addrs = set.intersection(*[self._servers.get(x, set()) for x in include])
+            else:
+                addrs = set(self._entries)
+            for keyword in exclude:
+                addrs -= self._servers.get(keyword, set())
+            return addrs
+
+    # -------------------------------------------------------------------------------
+
+    def matches(self, addr, include=(), exclude=()):
+        """Return True if `addr` has all of `include` and none of `exclude`."""
+
+        with self._lock:
+            return all(addr in self._servers.get(x, ()) for x in include) and not any(
+                addr in self._servers.get(x, ()) for x in exclude
+            )
+
+    # -------------------------------------------------------------------------------
+
+    def top(self, count):
+        """Return top `count` `(keyword, n)` by number of players, and by servers."""
+
+        with self._lock:
+            nplayers = sorted(self._players.items(), key=lambda _: _[1], reverse=True)
+            nservers = sorted(
+                ((k, len(v)) for k, v in self._servers.items()),
+                key=lambda _: _[1],
+                reverse=True,
+            )
+        return nplayers[:count], nservers[:count]
+
+
+# -------------------------------------------------------------------------------
+
+
+class PlayerIndex:
+    """Index from normalized player name to where that player is playing.
+
+    Updated from each server's `a2s_players`; re-indexing a server drops
+    the players that have left it, so lookups are answered from the last
+    probe of each server, without a re-scan.
+    """
+
+    def __init__(self):
+        """Initialize empty index."""
+
+        self._lock = threading.Lock()
+        # normalized name -> {addr: (name, score, duration)}
+        self._players = defaultdict(dict)
+        # addr -> normalized names; what to undo when `addr` is updated.
+        self._entries = {}
+
+    # -------------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._players)
+
+    # -------------------------------------------------------------------------------
+
+    @staticmethod
+    def normalize(name):
+        """Return `name` casefolded, with whitespace collapsed."""
+
+        return " ".join(name.casefold().split())
+
+    # -------------------------------------------------------------------------------
+
+    def update(self, server):
+        """Index (or re-index) the players on `server`."""
+
+        players = {}
+        for player in server.a2s_players:
+            if key := self.normalize(player["name"]):
+                players[key] = (player["name"], player["score"], player["duration"])
+
+        with self._lock:
+            self._remove(server.addr)
+            self._entries[server.addr] = tuple(players)
+            for key, location in players.items():
+                self._players[key][server.addr] = location
+
+    # -------------------------------------------------------------------------------
+
+    def remove(self, addr):
+        """Remove the players on server at `addr` from the index."""
+
+        with self._lock:
+            self._remove(addr)
+
+    def _remove(self, addr):
+
+        for key in self._entries.pop(addr, ()):
+            locations = self._players[key]
+            locations.pop(addr, None)
+            if not locations:
+                del self._players[key]
+
+    # -------------------------------------------------------------------------------
+
+    def lookup(self, name):
+        """Return list of `(addr, name, score, duration)` where player `name` is playing."""
+
+        with self._lock:
+            locations = self._players.get(self.normalize(name), {})
+            return [(addr, *location) for addr, location in locations.items()]
+
+
+# -------------------------------------------------------------------------------
+
+
+class TrigramIndex:
+    """Index from the trigrams of a text attribute of servers to their addresses.
+
+    Answers case-insensitive regex (or plain substring) searches of the
+    attribute, e.g., `server_name` or `map_name`. A search only runs its
+    regex over the servers whose text has every trigram of the literal
+    runs the regex requires; other servers can't match. A regex with no
+    such run of 3 or more characters (e.g., `a|b`) is run over them all.
+    """
+
+    def __init__(self, attr):
+        """Initialize empty index over attribute `attr` of servers."""
+
+        self.attr = attr
+        self._lock = threading.Lock()
+        # trigram -> {addr}
+        self._addrs = defaultdict(set)
+        # addr -> text; what to search, and to undo when `addr` is updated.
+        self._entries = {}
+
+    # -------------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._entries)
+
+    # -------------------------------------------------------------------------------
+
+    def update(self, server):
+        """Index (or re-index) `server`."""
+
+        text = (getattr(server, self.attr) or "").lower()
+
+        with self._lock:
+            if self._entries.get(server.addr) == text:
+                return
+            self._remove(server.addr)
+            self._entries[server.addr] = text
+            for trigram in _trigrams(text):
+                self._addrs[trigram].add(server.addr)
+
+    # -------------------------------------------------------------------------------
+
+    def remove(self, addr):
+        """Remove server at `addr` from the index."""
+
+        with self._lock:
+            self._remove(addr)
+
+    def _remove(self, addr):
+
+        if (text := self._entries.pop(addr, None)) is None:
+            return
+
+        for trigram in _trigrams(text):
+            addrs = self._addrs[trigram]
+            addrs.discard(addr)
+            if not addrs:
+                del self._addrs[trigram]
+
+    # -------------------------------------------------------------------------------
+
+    def select(self, pattern):
+        """Return set of addrs whose text matches regex `pattern`."""
+
+        regex, required = _compile(pattern)
+
+        with self._lock:
+            if required:
+                candidates = set.intersection(
+                    *sorted((self._addrs.get(x, set()) for x in required), key=len)
+                )
+            else:
+                candidates = self._entries
+            return {x for x in candidates if regex.search(self._entries[x])}
+
+    # -------------------------------------------------------------------------------
+
+    def matches(self, addr, pattern):
+        """Return True if the text of `addr` matches regex `pattern`."""
+
+        regex, required = _compile(pattern)
+
+        with self._lock:
+            if (text := self._entries.get(addr)) is None:
+                return False
+            if not all(addr in self._addrs.get(x, ()) for x in required):
+                return False
+            return regex.search(text) is not None
+
+
+# -------------------------------------------------------------------------------
+
+
+def _trigrams(text):
+    """Return set of the 3-character substrings of `text`."""
+
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+@functools.lru_cache(maxsize=64)
+def _compile(pattern):
+    """Return `(regex, trigrams)` for `pattern`; any match has all the trigrams."""
+
+    regex = re.compile(pattern, re.IGNORECASE)
+
+    # runs of literal characters at the top level of the pattern must
+    # appear in any match; anything else (classes, repeats, groups,
+    # alternations) ends a run.
+    runs = [""]
+    for op, arg in sre_parse.parse(pattern):
+        if op is sre_parse.LITERAL:
+            runs[-1] += chr(arg)
+        else:
+            runs.append("")
+
+    return regex, frozenset().union(*(_trigrams(x.lower()) for x in runs))
+
+
+# -------------------------------------------------------------------------------
@@ -0,0 +1,151 @@
+"""Last-known state of Game servers.
+
+What each server answered when it was last queried (its ping, players
+and map, among others), persisted between runs like the rtt model, so
+that before probing a server again it can be told whether it's likely
+to pass the stage two filters; `MainServer.isearch(likely=)` ranks its
+probes by it. Entries not refreshed in `MAX_AGE` are dropped, and at
+most `MAX_ENTRIES`, the most recently queried, are kept.
+"""
+
+# -------------------------------------------------------------------------------
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from loguru import logger
+
+# -------------------------------------------------------------------------------
+
+# `GameServer` attributes kept; those the cheap stage two filters test.
+FIELDS = ("ping", "players", "max_players", "bots", "visibility", "map_name")
+
+# seconds to keep a server that hasn't been queried since.
+MAX_AGE = 7 * 86400
+
+MAX_ENTRIES = 50_000
+
+# -------------------------------------------------------------------------------
+
+
+class Known:
+    """Last-known state of one server; has the `FIELDS` of the `GameServer` it was."""
+
+    __slots__ = ("addr", "when", *FIELDS)
+
+    def __init__(self, addr, when, *values):
+        """Initialize state of server at `addr`, queried at `when` (epoch)."""
+
+        self.addr = addr
+        self.when = when
+        for name, value in zip(FIELDS, values, strict=True):
+            setattr(self, name, value)
+
+
+# -------------------------------------------------------------------------------
+
+
+class LastKnown:
+    """Last-known state of each server queried, by addr."""
+
+    def __init__(self, path=None, clock=time.time):
+        """Initialize empty state, to be persisted to `path`."""
+
+        self.path = Path(path).expanduser() if path else None
+        self._clock = clock
+        self._lock = threading.Lock()
+        # addr -> [when, *FIELDS]
+        self._known = {}
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._known)
+
+    # -------------------------------------------------------------------------------
+
+    @classmethod
+    def load(cls, path):
+        """Return state read from `path`, or empty state if there isn't any."""
+
+        known = cls(path)
+        try:
+            data = json.loads(known.path.read_text(encoding="utf-8"))
+            if not isinstance(data, dict):
+                raise ValueError("not an object")
+            known._known = {k: v for k, v in data.items() if len(v) == 1 + len(FIELDS)}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as err:
+            logger.warning(f"ignoring last-known {str(known.path)!r}: {err}")
+        return known
+
+    # -------------------------------------------------------------------------------
+
+    def save(self):
+        """Write the freshest entries to `path`, if they have changed."""
+
+        if not self.path or not self._dirty:
+            return
+
+        oldest = self._clock() - MAX_AGE
+        with self._lock:
+            fresh = sorted(
+                ((k, v) for k, v in self._known.items() if v[0] >= oldest),
+                key=lambda x: x[1][0],
+                reverse=True,
+            )
+            self._known = dict(fresh[:MAX_ENTRIES])
+            data = dict(self._known)
+            self._dirty = False
+
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+            tmp.replace(self.path)
+        except OSError as err:
+            logger.warning(f"can't save last-known {str(self.path)!r}: {err}")
+            self._dirty = True
+            return
+        logger.debug(f"saved {len(data)} last-known servers {str(self.path)!r}")
+
+    # -------------------------------------------------------------------------------
+
+    def observe(self, gameserver):
+        """Record the state of `gameserver`, just queried."""
+
+        values = [getattr(gameserver, x) for x in FIELDS]
+        with self._lock:
+            self._known[gameserver.addr] = [self._clock(), *values]
+            self._dirty = True
+
+    def forget(self, addr):
+        """Drop the state of the server at `addr`; e.g., it stopped answering."""
+
+        with self._lock:
+            if self._known.pop(addr, None) is not None:
+                self._dirty = True
+
+    def get(self, addr):
+        """Return `Known` state of the server at `addr`, or None if it hasn't been queried."""
+
+        if (entry := self._known.get(addr)) is None:
+            return None
+        return Known(addr, *entry)
+
+    # -------------------------------------------------------------------------------
+
+    def likely_maps(self, likely):
+        """Return the set of maps of the servers whose last-known state passes `likely`."""
+
+        with self._lock:
+            entries = list(self._known.items())
+        maps = set()
+        for addr, entry in entries:
+            if entry[-1] not in maps and likely(Known(addr, *entry)):
+                maps.add(entry[-1])
+        return maps
+
+
+# -------------------------------------------------------------------------------
@@ -2,13 +2,52 @@
 
 # -------------------------------------------------------------------------------
 
+import contextlib
+import heapq
+import itertools
 import queue
 import threading
+import time
+from collections import defaultdict
 
 from loguru import logger
 from steam import game_servers as gs
 
+import qvalve.fieldcache
 import qvalve.gameserver
+import qvalve.index
+import qvalve.lastknown
+import qvalve.profiling
+import qvalve.rollups
+import qvalve.rttmodel
+import qvalve.scheduler
+import qvalve.snapshot
+import qvalve.transport
+
+# -------------------------------------------------------------------------------
+
+# seconds to wait for an A2S response; `steam.game_servers` default.
+_A2S_TIMEOUT = 2
+
+# servers queued per worker thread, per region; when a region's queue is
+# full, its main server paging pauses until the workers catch up.
+_QUEUE_DEPTH = 4
+
+# seconds between checks for cancellation, while waiting for the consumer.
+_PUT_POLL = 0.1
+
+# seconds a worker waits for a scan's consumer to make room for a result;
+# if it doesn't, the scan is cancelled, to free the workers for others.
+_STALL_TIMEOUT = 30
+
+# main server filters that don't narrow a search's scope; a search with
+# any other (e.g., `map`, `empty`) is only part of the picture, and isn't
+# rolled up.
+_ROLLUP_FILTERS = frozenset({"appid"})
+
+# servers ranked together, as the main server lists them, when searching
+# with `likely`; about a main server page.
+_RANK_WINDOW = 256
 
 # -------------------------------------------------------------------------------
 
@@ -25,13 +64,69 @@ class MainServer:
 
     """
 
-    def __init__(self, max_threads=10, debug=False, rules=False):
-        """Initialize MainServer."""
+    # PLR0913: optional collaborators, each defaulted, and keyword-only.
+    def __init__(  # noqa: PLR0913
+        self,
+        max_threads=10,
+        debug=False,
+        rules=False,
+        rtt=None,
+        *,
+        profiler=None,
+        transport=None,
+        masters=None,
+        rollups=None,
+        field_cache=None,
+        snapshot=None,
+        last_known=None,
+    ):
+        """Initialize MainServer.
+
+        Args:
+            max_threads: number of worker threads.
+            debug: pretty-print raw response records.
+            rules: query A2S_RULES.
+            rtt: `RttModel` to learn pings into, and to schedule probes
+                by when searching with `max_ping`.
+            profiler: `qvalve.profiling.Profiler` to profile the feeder and
+                workers, and trace main server pages and server queries.
+            transport: `qvalve.transport.Transport` for main server and A2S
+                requests; e.g., one that records or replays them.
+            masters: list of main server `(host, port)`s to page through,
+                hedging and failing over from one to the next; default
+                `steam.game_servers.MSServer.Source`.
+            rollups: `qvalve.rollups.Rollups` to add each complete,
+                unfiltered search to; see `_rolled_up`.
+            field_cache: `qvalve.fieldcache.FieldCache` of players and tags,
+                so that re-queries only ask for them when they may have
+                changed.
+            snapshot: path to publish each complete search, and re-query,
+                to; see `qvalve.snapshot`.
+            last_known: `qvalve.lastknown.LastKnown` state of the servers
+                queried, to rank probes by when searching with `likely`.
+        """
 
         self._max_threads = int(max_threads)
         self._debug = bool(debug)
         self._rules = bool(rules)
         self._workq = None
+        self.rtt = rtt if rtt is not None else qvalve.rttmodel.RttModel()
+        # sockets for main server and A2S requests, reused by the threads.
+        self.transport = transport if transport is not None else qvalve.transport.Transport()
+        self.profiler = profiler if profiler is not None else qvalve.profiling.Profiler()
+        self.masters = list(masters) if masters else [gs.MSServer.Source]
+        self.rollups = rollups if rollups is not None else qvalve.rollups.Rollups()
+        self.field_cache = (
+            field_cache if field_cache is not None else qvalve.fieldcache.FieldCache()
+        )
+        self.snapshot = snapshot
+        self.last_known = last_known if last_known is not None else qvalve.lastknown.LastKnown()
+
+        # live indexes over servers queried by the workers.
+        self.keywords = qvalve.index.KeywordIndex()
+        self.players = qvalve.index.PlayerIndex()
+        self.names = qvalve.index.TrigramIndex("server_name")
+        self.maps = qvalve.index.TrigramIndex("map_name")
 
     # -------------------------------------------------------------------------------
     # query_master(
@@ -46,69 +141,692 @@ class MainServer:
 
         For each region in the list of `regions`, query the main server for
         a list of remote game servers that meet criteria in `filters`,
-        which may be a string or a dict. Return `list(dict)`.
+        which may be a string or a dict. Return `Servers`, a list of
+        `GameServer`.
         """
 
-        if self._workq is None:
-            threading.current_thread().name = "main"
-            self._workq = queue.Queue()
-            for _ in range(self._max_threads):
-                threading.Thread(target=self._a2s_worker, daemon=True).start()
+        servers = Servers()
+        gameservers = self.isearch(regions, **kwargs)
+        while True:
+            try:
+                servers.append(next(gameservers))
+            except StopIteration as stop:
+                servers.skipped = stop.value
+                return servers
+
+    # -------------------------------------------------------------------------------
+
+    # PLR0913: search options, each defaulted.
+    def isearch(  # noqa: PLR0913
+        self, regions, max_ping=None, likely=None, deadline=None, profiler=None, **kwargs
+    ):
+        """Query valve's main server, yielding results as they complete.
+
+        Same as `search`, but yield each `GameServer` as soon as a worker
+        has queried it, rather than waiting for all of them. Closing the
+        generator cancels the servers not yet queried.
+
+        Given `max_ping`, servers that `rtt` predicts are over it are
+        probed last, or not at all.
+
+        Given `likely(server)`, a predicate, the servers most likely to pass
+        it, by their `last_known` state, are probed first; see `_ranked`.
+        Use it with a consumer that stops after the first few matches, or
+        with a `deadline`.
+
+        Given `deadline`, seconds, the search stops when it expires: main
+        server paging and outstanding probes are cancelled, and only the
+        servers completed by then are yielded; how many weren't is the
+        generator's return value (0 if the deadline didn't expire).
+
+        Given `profiler`, this search is profiled by it rather than by
+        `self.profiler`; e.g., one search of many sharing this server.
+        """
+
+        scan = _Scan(self._query, max_ping, likely, deadline, profiler=profiler or self.profiler)
+        scan.rollup = max_ping is None and _unfiltered(kwargs)
+        yield from self._rolled_up(scan, self._isearch(regions, scan, kwargs))
+        return scan.skipped
+
+    # -------------------------------------------------------------------------------
+
+    def isearch_sets(self, query_sets, listed, max_ping=None, deadline=None):
+        """Search for several query sets in one pass, yielding results as they complete.
+
+        `query_sets` maps each name to a dict of `search` arguments:
+        `regions`, `filters` and `max_servers`. Identical main server
+        searches are sent once, and each server listed by any of them is
+        queried once. `listed` is filled in with the names of the query
+        sets that listed each addr; a server may be listed by another
+        query set after it has been yielded. Otherwise, the same as
+        `isearch`.
+        """
+
+        scan = _Scan(self._query, max_ping, deadline=deadline, profiler=self.profiler)
+        sources = self._query_sets(query_sets, listed, scan)
+        yield from self._rolled_up(scan, self._run(scan, *sources))
+        logger.info(
+            f"{len(query_sets)} query sets, {len(sources)} main server searches, "
+            f"listed {len(listed)} unique servers"
+        )
+
+    # -------------------------------------------------------------------------------
+
+    # PLR0913: search options, as for `isearch`.
+    def ping_sweep(  # noqa: PLR0913
+        self, regions, count, accept=None, max_ping=None, deadline=None, **kwargs
+    ):
+        """Return the `count` lowest-ping servers, sorted by `ping`.
+
+        Probe each server with a single A2S_INFO request (no players or
+        rules). Once `count` servers are in hand, a server can't place
+        unless it answers within the worst ping among them: later probes
+        time out then, and servers whose prefix the rtt model puts over it
+        aren't probed. Once the main server has been paged, and no server
+        left can place, the scan is stopped, abandoning the probes still
+        in flight. The cutoff shrinks as better servers are found.
+
+        Servers for which `accept(server)` is false are not considered.
+        Given `deadline`, the best of those probed when it expires are
+        returned.
+        """
+
+        # max-heap (by negated ping) of the best `count` servers so far.
+        best = []
+        seqno = itertools.count()
+        scan = _Scan(None, max_ping, deadline=deadline, profiler=self.profiler)
+        scan.pending = {}
+        # a probe, or its absence, says nothing about players or map.
+        scan.index = False
+
+        def _placeable(gameserver):
+            estimate = self.rtt.estimate(gameserver.server_host)
+            return estimate is None or estimate[1] <= scan.cutoff
+
+        def _probe(gameserver):
+            if scan.cutoff is None:
+                gameserver.probe(timeout=_A2S_TIMEOUT, a2s=self.transport)
+            elif _placeable(gameserver):
+                gameserver.probe(timeout=scan.cutoff / 1000, a2s=self.transport)
+            else:
+                scan.count_abandoned()
+
+        def _hopeless(pending):
+            # every server left is too far away, or has had its chance.
+            now = time.monotonic()
+            return scan.cutoff is not None and not any(
+                _placeable(x) if started is None else now - started <= scan.cutoff / 1000
+                for x, started in pending
+            )
+
+        scan.query = _probe
+        scan.stop_when = _hopeless
+        for server in self._isearch(regions, scan, kwargs):
+            if accept is not None and not accept(server):
+                continue
+            item = (-server.ping, next(seqno), server)
+            if len(best) < count:
+                heapq.heappush(best, item)
+            elif item > best[0]:
+                heapq.heapreplace(best, item)
+            else:
+                continue
+            if len(best) == count:
+                scan.cutoff = max(-best[0][0], 1)
+
+        if scan.nabandoned:
+            logger.info(f"abandoned {scan.nabandoned} probes that couldn't place")
+        return [x[2] for x in sorted(best, reverse=True)]
+
+    # -------------------------------------------------------------------------------
+
+    def iquery(self, addrs, deadline=None):
+        """Query Game servers at `addrs`, yielding results as they complete.
+
+        `addrs` may be any iterable of `IP:PORTNO`, such as lines streamed
+        from stdin; querying starts with the first. Each unique address is
+        queried once. Given `deadline`, as for `isearch`.
+        """
+
+        scan = _Scan(self._query, deadline=deadline, profiler=self.profiler)
+        yield from self._run(scan, self._unique_gameservers(addrs))
+
+    # -------------------------------------------------------------------------------
+
+    def requery(self, gameservers, deadline=None):
+        """Re-query existing `gameservers`, yielding results as they complete.
+
+        Given `deadline`, as for `isearch`.
+        """
+
+        scan = _Scan(self._query, deadline=deadline, profiler=self.profiler)
+        yield from self._rolled_up(scan, self._run(scan, iter(gameservers)))
+
+    # -------------------------------------------------------------------------------
+
+    def _rolled_up(self, scan, gameservers):
+        """Yield `gameservers`; once all have been, add them to `rollups` and `snapshot`.
+
+        A scan that's closed early (e.g., by `--limit`), whose deadline
+        expired, or whose consumer stalled, is incomplete, and isn't added,
+        nor published.
+
+        Only `scan.rollup` scans are added to `rollups`: each replaces
+        every series of its minute, so one that saw only some of the
+        servers (filtered, or a re-query) would wipe out the rest.
+        """
+
+        tally = qvalve.rollups.Tally()
+        snapshot = qvalve.snapshot.SnapshotWriter() if self.snapshot else None
+        with contextlib.closing(gameservers):
+            for gameserver in gameservers:
+                tally.add(gameserver)
+                if snapshot is not None:
+                    snapshot.add(gameserver)
+                yield gameserver
+        if scan.expired or scan.stalled:
+            return
+        if scan.rollup:
+            self.rollups.add_tally(tally)
+        if snapshot is not None:
+            self._publish(snapshot)
+
+    def _publish(self, snapshot):
+        """Publish `snapshot`, a `qvalve.snapshot.SnapshotWriter`, to `self.snapshot`."""
+
+        try:
+            snapshot.publish(self.snapshot)
+        except OSError as err:
+            logger.warning(f"can't publish snapshot {str(self.snapshot)!r}: {err}")
+            return
+        logger.debug(f"published {len(snapshot)} servers to {str(self.snapshot)!r}")
+
+    # -------------------------------------------------------------------------------
+
+    def _isearch(self, regions, scan, kwargs):
+        """Search regions; yield servers as `scan.query(gameserver)` completes on each."""
 
         # `query_master` wants `filter_text` as `type(str)`;
         # also accept `filters` as `type(dict)`.
 
         if (filters := kwargs.get("filters")) is not None and isinstance(filters, dict):
-            delim = "\\"
-            filters = delim.join([f"{k}{delim}{v}" for k, v in filters.items()])
-            kwargs["filter_text"] = filters
+            kwargs["filter_text"] = _filter_text(filters)
             del kwargs["filters"]
 
-        # build and return this list.
-        servers = []
+        # paged side by side, and queried region by region in turn.
+        sources = [self._query_regions([x], dict(kwargs), scan) for x in regions]
+        if scan.likely is not None:
+            sources = [self._ranked(x, scan.likely) for x in sources]
+
+        yield from self._run(scan, *sources)
+
+        if scan.nskipped or scan.ndeferred:
+            logger.info(
+                f"rtt model skipped {scan.nskipped} servers, deferred {scan.ndeferred}; "
+                f"max_ping {scan.max_ping}"
+            )
+
+    # -------------------------------------------------------------------------------
+
+    def _run(self, scan, *sources):
+        """Run `scan` over each of iterables `sources`; yield servers as they complete."""
+
+        self._start_workers()
+
+        # Feed the workers from a thread per source, so that results can be
+        # yielded while `sources` are still being produced (by paging the
+        # main server, or reading stdin). Workers take servers from each
+        # region in turn, and put every `GameServer` they finish into
+        # `scan.results`; each feeder puts the number it submitted when it's
+        # done, preceded by any unexpected exception, which is re-raised
+        # here. If the scan's deadline expires first, whatever is still
+        # being paged or probed is abandoned.
+        #
+        # The queues are bounded: when the consumer falls behind, the
+        # workers wait, and when they do, so does main server paging. The
+        # workers are shared by every scan; if the consumer stalls, they
+        # cancel its scan, and it ends with what it was given.
+
+        results = scan.results = queue.Queue(self._workq.maxsize)
+        for index, gameservers in enumerate(sources):
+            threading.Thread(
+                target=self._feed,
+                args=(scan, gameservers),
+                name=f"feeder-{index}",
+                daemon=True,
+            ).start()
+
+        nfeeding = len(sources)
+        submitted = 0
+        expected = None if nfeeding else 0
+        received = 0
+        try:
+            while expected is None or received < expected:
+                if scan.stalled and results.empty():
+                    logger.warning(f"stalled after {received} servers; the rest were dropped")
+                    break
+                if expected is not None and scan.should_stop():
+                    logger.info(f"stopped after {received} servers; the rest can't matter")
+                    break
+                try:
+                    item = results.get(timeout=scan.wait(expected is not None))
+                except queue.Empty:
+                    if scan.remaining() is not None and not scan.remaining():
+                        self._expire(scan, received, expected)
+                        break
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                if isinstance(item, int):
+                    submitted += item
+                    nfeeding -= 1
+                    if not nfeeding:
+                        expected = submitted
+                    continue
+                received += 1
+                # yield servers we were able to ping
+                if item.ping is not None:
+                    yield item
+        finally:
+            # stop feeding and querying, if the consumer stopped early.
+            if expected is None or received < expected:
+                scan.cancelled.set()
+                logger.info(f"cancelled after {received} servers")
+
+        logger.info(f"transport {self.transport.stats()}")
+        logger.info(f"field cache {self.field_cache.stats()}")
+        logger.debug(f"scheduler {self._workq.stats()}")
+
+    def _start_workers(self):
+        """Start the worker threads, and their work queue, if not yet started."""
+
+        if self._workq is None:
+            threading.current_thread().name = "main"
+            self._workq = qvalve.scheduler.FairQueue(
+                self._max_threads, self._max_threads * _QUEUE_DEPTH
+            )
+            for _ in range(self._max_threads):
+                threading.Thread(target=self._a2s_worker, daemon=True).start()
+
+    def _expire(self, scan, received, expected):
+        """Record that `scan`'s deadline expired after `received` servers."""
+
+        scan.expired = True
+        if expected is None:
+            # still paging the main server; those not yet listed aren't counted.
+            scan.skipped = scan.nsubmitted - received
+            logger.warning(
+                f"deadline expired after {received} servers; skipped {scan.skipped} "
+                "listed so far, and cancelled main server paging"
+            )
+        else:
+            scan.skipped = expected - received
+            logger.warning(f"deadline expired after {received} servers; skipped {scan.skipped}")
+
+    # -------------------------------------------------------------------------------
+
+    def _feed(self, scan, gameservers):
+
+        nservers = 0
+        try:
+            with scan.profiler.thread():
+                for gameserver in gameservers:
+                    if scan.cancelled.is_set():
+                        break
+                    scan.add_pending(gameserver)
+                    self._workq.put((scan, gameserver), gameserver.region)
+                    nservers += 1
+                    scan.count_submitted()
+        except Exception as err:
+            # hand any failure to the consuming thread, which re-raises it.
+            scan.put(err)
+        finally:
+            scan.put(nservers)
+
+    # -------------------------------------------------------------------------------
+
+    def _query_regions(self, regions, kwargs, scan):
+        """Yield a `GameServer` for each server the main server lists in `regions`."""
+
+        deferred = []
 
         for region in regions:
             if not isinstance(region, gs.MSRegion):
                 # PLW2901: region is coerced from raw input to MSRegion enum if not already one.
                 region = gs.MSRegion(int(region))  # noqa: PLW2901
             kwargs["region"] = region
+            kwargs["master"] = self.masters
             logger.debug(kwargs)
 
             # Search Valve's Main Server for list of Remote Game Servers
             # with matching criteria.
             #
             # Create a `GameServer` for each item returned, but don't query
-            # them from here (main thread); send them through the workq to
-            # workers to perform.
+            # them from here; they're sent through the workq to workers to
+            # perform.
 
             try:
-                for addr in gs.query_master(**kwargs):
-                    gameserver = qvalve.gameserver.GameServer(addr, region.value)
-                    servers.append(gameserver)
-                    self._workq.put(gameserver)
+                with scan.profiler.span("query_master", region=region.name) as span:
+                    span["nservers"] = 0
+                    for addr in self.transport.query_master(**kwargs):
+                        span["nservers"] += 1
+                        gameserver = qvalve.gameserver.GameServer(addr, region.value)
+                        if scan.max_ping is not None:
+                            action = self.rtt.classify(gameserver.server_host, scan.max_ping)
+                            if action == "skip":
+                                scan.nskipped += 1
+                                continue
+                            if action == "defer":
+                                scan.ndeferred += 1
+                                deferred.append(gameserver)
+                                continue
+                        yield gameserver
+
+            except (OSError, RuntimeError) as err:
+                # every main server failed the same page; keep what was listed.
+                logger.error(f"{err!r} query_master({kwargs}")
+
+        # probably too far away; probe after everything else.
+        yield from deferred
 
-            except RuntimeError as err:
-                logger.error(f"{err} query_master({kwargs}")
+    # -------------------------------------------------------------------------------
+
+    def _query_sets(self, query_sets, listed, scan):
+        """Return a generator per main server search needed by `query_sets`.
+
+        Together, they yield a `GameServer` for each server listed for any
+        of `query_sets`, once.
+        """
+
+        # (region, filter_text, max_servers) -> names of the query sets that search it.
+        searches = defaultdict(list)
+        for name, query in query_sets.items():
+            filter_text = _filter_text(query.get("filters") or {})
+            for region in query["regions"]:
+                key = (int(region), filter_text, query.get("max_servers", 20))
+                searches[key].append(name)
+
+        # the searches are paged side by side.
+        lock = threading.Lock()
 
-        # wait for all threads to drain the queue
-        self._workq.join()
+        def _search(region, kwargs, names):
+            for gameserver in self._query_regions([region], kwargs, scan):
+                with lock:
+                    if (seen := listed.get(gameserver.addr)) is not None:
+                        seen.update(names)
+                        continue
+                    listed[gameserver.addr] = set(names)
+                yield gameserver
 
-        # return servers we were able to ping
-        return [x for x in servers if x.ping is not None]
+        return [
+            _search(region, {"filter_text": filter_text, "max_servers": max_servers}, names)
+            for (region, filter_text, max_servers), names in searches.items()
+        ]
+
+    # -------------------------------------------------------------------------------
+
+    def _ranked(self, gameservers, likely):
+        """Yield all of `gameservers`, those most likely to pass `likely` first.
+
+        Servers are ranked within a window of `_RANK_WINDOW` as they're
+        listed, so probing starts with the first page, and paging still
+        waits for the workers. First come servers whose last-known state
+        passes `likely`, then those last seen on a map that any passing
+        server was on, then servers never queried, then the rest; within
+        each, by last-known or predicted ping, and then by most players.
+        """
+
+        maps = self.last_known.likely_maps(likely)
+
+        def _rank(gameserver):
+            if (last := self.last_known.get(gameserver.addr)) is not None:
+                tier = 0 if likely(last) else 1 if last.map_name in maps else 3
+                return (tier, last.ping, -(last.players or 0))
+            estimate = self.rtt.estimate(gameserver.server_host)
+            return (2, estimate[0] if estimate else _A2S_TIMEOUT * 1000, 0)
+
+        window = []
+        seqno = itertools.count()
+        for gameserver in gameservers:
+            heapq.heappush(window, (_rank(gameserver), next(seqno), gameserver))
+            if len(window) >= _RANK_WINDOW:
+                yield heapq.heappop(window)[2]
+        while window:
+            yield heapq.heappop(window)[2]
+
+    # -------------------------------------------------------------------------------
+
+    @staticmethod
+    def _unique_gameservers(addrs):
+        """Yield a `GameServer` for each unique, valid addr in `addrs`."""
+
+        seen = set()
+        for addr in addrs:
+            try:
+                gameserver = qvalve.gameserver.GameServer(addr)
+            except (ValueError, SyntaxError) as err:
+                logger.error(f"{err}; addr={addr!r}")
+                continue
+            if gameserver.addr not in seen:
+                seen.add(gameserver.addr)
+                yield gameserver
+
+    # -------------------------------------------------------------------------------
+
+    def _query(self, gameserver):
+        gameserver.query(self.transport, self.field_cache)
 
     # -------------------------------------------------------------------------------
 
     def _a2s_worker(self):
         while True:
-            try:
-                gameserver = self._workq.get()
-            except queue.Empty:
-                return
+            (scan, gameserver), region = self._workq.get()
+            skipped = scan.cancelled.is_set()
 
             try:
-                gameserver.query()
+                if skipped:
+                    continue
+                scan.start_pending(gameserver)
+                with (
+                    scan.profiler.thread(),
+                    scan.profiler.span("query", addr=gameserver.addr) as span,
+                ):
+                    scan.query(gameserver)
+                    if scan.index:
+                        self._index(gameserver)
+                    elif gameserver.ping is not None:
+                        self.rtt.observe(gameserver.server_host, gameserver.ping)
+                    span["ping"] = gameserver.ping
             finally:
-                self._workq.task_done()
+                scan.drop_pending(gameserver)
+                scan.put(gameserver)
+                self._workq.task_done(region, failed=not skipped and gameserver.ping is None)
+
+    # -------------------------------------------------------------------------------
+
+    def _index(self, gameserver):
+        """Add `gameserver` to, or remove it from, the live indexes."""
+
+        if gameserver.ping is not None:
+            self.keywords.update(gameserver)
+            self.players.update(gameserver)
+            self.names.update(gameserver)
+            self.maps.update(gameserver)
+            self.rtt.observe(gameserver.server_host, gameserver.ping)
+            self.last_known.observe(gameserver)
+        else:
+            self.keywords.remove(gameserver.addr)
+            self.players.remove(gameserver.addr)
+            self.names.remove(gameserver.addr)
+            self.maps.remove(gameserver.addr)
+            self.last_known.forget(gameserver.addr)
+            self.field_cache.forget(gameserver.addr)
+
+
+# -------------------------------------------------------------------------------
+
+
+def _filter_text(filters):
+    """Return dict `filters` as a main server `filter_text`."""
+
+    delim = "\\"
+    return delim.join([f"{k}{delim}{v}" for k, v in filters.items()])
+
+
+def _unfiltered(kwargs):
+    """Return True if the `search` arguments `kwargs` filter by nothing but `_ROLLUP_FILTERS`."""
+
+    filters = kwargs.get("filters")
+    if filters is None:
+        filters = kwargs.get("filter_text") or {}
+    if isinstance(filters, str):
+        filters = filters.strip("\\").split("\\")[::2] if filters else []
+    return set(filters) <= _ROLLUP_FILTERS
+
+
+# -------------------------------------------------------------------------------
+
+
+class Servers(list):
+    """`GameServer`s found by `MainServer.search`."""
+
+    # servers the search's deadline skipped; 0 if it didn't expire.
+    skipped = 0
+
+
+# -------------------------------------------------------------------------------
+
+
+class _Scan:
+    """State of one search, shared by its pager, workers and consumer."""
+
+    # PLR0913: scan options, each defaulted; the profiler keyword-only.
+    def __init__(  # noqa: PLR0913
+        self, query, max_ping=None, likely=None, deadline=None, *, profiler=None
+    ):
+        """Initialize scan that runs `query(gameserver)` on each server, under `profiler`."""
+
+        self.query = query
+        self.profiler = profiler if profiler is not None else qvalve.profiling.Profiler()
+        self.max_ping = max_ping
+        self.likely = likely
+        # `time.monotonic` by which the scan must end; None if unbounded.
+        self.deadline = None if deadline is None else time.monotonic() + deadline
+        # set to add (or remove) each server queried to the live indexes,
+        # and `last_known`; unset, its ping is only given to the rtt model.
+        self.index = True
+        # set to add the scan, once complete, to `MainServer.rollups`.
+        self.rollup = False
+        # set when the deadline expires before every server was queried,
+        # with the number of servers that weren't.
+        self.expired = False
+        self.skipped = 0
+        # set when the consumer stops early; outstanding work is skipped.
+        self.cancelled = threading.Event()
+        # set, with `cancelled`, when the consumer didn't make room for a
+        # result within `_STALL_TIMEOUT`.
+        self.stalled = False
+        # completed `GameServer`s, then the number submitted; bounded, and
+        # created by `MainServer._run`.
+        self.results = None
+        # servers the rtt model skipped, and deferred.
+        self.nskipped = 0
+        self.ndeferred = 0
+        # servers handed to the workers, so far, by all feeders.
+        self.nsubmitted = 0
+        # servers not probed, or given up on, because they couldn't place.
+        self.nabandoned = 0
+        # ping (ms) a server must beat to place; set by `ping_sweep`.
+        self.cutoff = None
+        # addr -> (`GameServer`, `time.monotonic` its query started, or None
+        # while queued), of the servers handed to the workers and not yet
+        # finished; kept only if not None.
+        self.pending = None
+        # `stop_when(pending)`, polled once the main server has been paged;
+        # True to stop the scan, abandoning the servers still pending.
+        self.stop_when = None
+        self._lock = threading.Lock()
+
+    def count_submitted(self):
+        """Count a server handed to the workers."""
+
+        with self._lock:
+            self.nsubmitted += 1
+
+    def count_abandoned(self, n=1):
+        """Count `n` servers given up on."""
+
+        with self._lock:
+            self.nabandoned += n
+
+    # -------------------------------------------------------------------------------
+
+    def add_pending(self, gameserver):
+        """Track `gameserver`, about to be handed to the workers, as pending."""
+
+        if self.pending is not None:
+            with self._lock:
+                self.pending[gameserver.addr] = (gameserver, None)
+
+    def start_pending(self, gameserver):
+        """Record that the query of pending `gameserver` has started."""
+
+        if self.pending is not None:
+            with self._lock:
+                self.pending[gameserver.addr] = (gameserver, time.monotonic())
+
+    def drop_pending(self, gameserver):
+        """Stop tracking `gameserver`; it's finished."""
+
+        if self.pending is not None:
+            with self._lock:
+                self.pending.pop(gameserver.addr, None)
+
+    def should_stop(self):
+        """Return True if `stop_when` says the pending servers aren't worth waiting for."""
+
+        if self.stop_when is None:
+            return False
+        with self._lock:
+            pending = list(self.pending.values())
+        if not self.stop_when(pending):
+            return False
+        self.count_abandoned(len(pending))
+        return True
+
+    def wait(self, paged):
+        """Return seconds for the consumer to wait for a result; None if forever."""
+
+        remaining = self.remaining()
+        if self.stop_when is None or not paged:
+            return remaining
+        # poll `stop_when`.
+        return _PUT_POLL if remaining is None else min(remaining, _PUT_POLL)
+
+    def put(self, item):
+        """Put `item` in `results`, waiting for room; drop it if the scan is cancelled.
+
+        Cancel the scan if the consumer doesn't make room within
+        `_STALL_TIMEOUT`, rather than hold the worker any longer.
+        """
+
+        stall = time.monotonic() + _STALL_TIMEOUT
+        while not self.cancelled.is_set():
+            try:
+                self.results.put(item, timeout=_PUT_POLL)
+                return
+            except queue.Full:
+                if time.monotonic() >= stall:
+                    logger.warning(f"consumer stalled for {_STALL_TIMEOUT}s; cancelling scan")
+                    self.stalled = True
+                    self.cancelled.set()
+
+    def remaining(self):
+        """Return seconds until the deadline, or None if there isn't one."""
+
+        if self.deadline is None:
+            return None
+        return max(0, self.deadline - time.monotonic())
 
 
 # -------------------------------------------------------------------------------
@@ -0,0 +1,71 @@
+"""Compact storage of the players on a game server."""
+
+# -------------------------------------------------------------------------------
+
+import sys
+from array import array
+
+# -------------------------------------------------------------------------------
+
+
+class Players:
+    """Players on a game server, stored column-wise and sorted by name.
+
+    Instead of one dict per player (as from `steam.game_servers.a2s_players`),
+    keep one tuple or array per field. Names are interned, so a name seen on
+    many servers, or scan after scan, is stored once.
+    """
+
+    __slots__ = ("names", "scores", "durations", "attributes")
+
+    def __init__(self, names=(), scores=(), durations=(), attributes=()):
+        """Initialize from parallel sequences of per-player fields."""
+
+        self.names = tuple(names)
+        self.scores = array("l", scores)
+        self.durations = array("f", durations)
+        self.attributes = tuple(attributes)
+
+    # -------------------------------------------------------------------------------
+
+    @classmethod
+    def from_a2s(cls, players, attributes=None):
+        """Return `Players` from a list of `a2s_players` dicts.
+
+        Args:
+            players: list of dicts with "name", "score" and "duration".
+            attributes: optional function returning a string of attributes
+                for a player's name.
+        """
+
+        players = sorted(players, key=lambda x: x["name"].upper())
+        names = [sys.intern(x["name"]) for x in players]
+        return cls(
+            names,
+            [x["score"] for x in players],
+            [x["duration"] for x in players],
+            [sys.intern(attributes(x)) for x in names] if attributes else [""] * len(names),
+        )
+
+    # -------------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        """Yield a dict per player, as `steam.game_servers.a2s_players` would."""
+
+        for name, score, duration, attributes in zip(
+            self.names, self.scores, self.durations, self.attributes, strict=True
+        ):
+            yield {"name": name, "score": score, "duration": duration, "attributes": attributes}
+
+    # -------------------------------------------------------------------------------
+
+    def to_list(self):
+        """Return list of dicts, one per player; for JSON."""
+
+        return list(self)
+
+
+# -------------------------------------------------------------------------------
@@ -0,0 +1,158 @@
+"""Scan profiling.
+
+A `Profiler` collects a cProfile of every thread that takes part in a
+scan (the main thread, the feeder paging the main server, and the
+workers), and trace spans for each main server page and game server
+query. `save` writes the merged profile as a `pstats` dump, and the
+spans as Chrome-trace JSON (load it in `chrome://tracing` or Perfetto).
+
+A `Profiler` without a path is disabled, and costs a branch per call.
+"""
+
+# -------------------------------------------------------------------------------
+
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from pathlib import Path
+
+from loguru import logger
+
+# -------------------------------------------------------------------------------
+
+
+class Profiler:
+    """cProfile and trace spans across threads."""
+
+    # functions to list, by cumulative time, after saving.
+    TOP = 25
+
+    def __init__(self, path=None):
+        """Initialize profiler to write to `path`; disabled if None."""
+
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles = []
+        # Chrome-trace events; complete ("X") spans and thread names ("M").
+        self._events = []
+        self._start = time.perf_counter()
+
+    # -------------------------------------------------------------------------------
+
+    @property
+    def enabled(self):
+        """Return True if profiling."""
+
+        return self.path is not None
+
+    @property
+    def trace_path(self):
+        """Return path of the Chrome-trace file."""
+
+        return self.path.with_name(self.path.name + ".trace.json")
+
+    # -------------------------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def thread(self):
+        """Profile the calling thread for the duration; may be nested."""
+
+        if not self.enabled:
+            yield
+            return
+
+        local = self._local
+        if (profile := getattr(local, "profile", None)) is None:
+            profile = local.profile = cProfile.Profile()
+            local.depth = 0
+            thread = threading.current_thread()
+            with self._lock:
+                self._profiles.append(profile)
+                self._events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": 0,
+                        "tid": thread.ident,
+                        "args": {"name": thread.name},
+                    }
+                )
+
+        enabled = False
+        if local.depth == 0:
+            try:
+                profile.enable()
+                enabled = True
+            except ValueError:
+                # python 3.12+: a profile is already active, and it's
+                # process-wide; this thread is in it.
+                pass
+        local.depth += 1
+        try:
+            yield
+        finally:
+            local.depth -= 1
+            if enabled:
+                profile.disable()
+
+    # -------------------------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Record a trace span named `name`; yield its `args`, to add to."""
+
+        if not self.enabled:
+            yield args
+            return
+
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            event = {
+                "name": name,
+                "ph": "X",
+                "pid": 0,
+                "tid": threading.get_ident(),
+                "ts": (start - self._start) * 1e6,
+                "dur": (end - start) * 1e6,
+                "args": args,
+            }
+            with self._lock:
+                self._events.append(event)
+
+    # -------------------------------------------------------------------------------
+
+    def save(self):
+        """Write the merged profile to `path`, and the spans to `trace_path`."""
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            # skip the profiles of threads that ran under another's.
+            profiles = [x for x in self._profiles if x.getstats()]
+            events = list(self._events)
+
+        if profiles:
+            output = io.StringIO()
+            stats = pstats.Stats(profiles[0], stream=output)
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(self.path)
+            stats.sort_stats("cumulative").print_stats(self.TOP)
+            logger.info(f"profile of {len(profiles)} threads\n{output.getvalue()}")
+
+        self.trace_path.write_text(
+            json.dumps({"traceEvents": events}, default=str), encoding="utf-8"
+        )
+        logger.success(f"wrote {str(self.path)!r} and {str(self.trace_path)!r}")
+
+
+# -------------------------------------------------------------------------------
@@ -1,61 +1,550 @@
 """Reports.
 
-Functions to print text reports to stdout.
+Functions to print text reports, or stream machine-readable records, to stdout.
 """
 
 # -------------------------------------------------------------------------------
 
+import contextlib
+import functools
+import sys
+import time
 from collections import defaultdict
 
 from loguru import logger
 
-import qvalve.gameserver
+import qvalve.capture
+import qvalve.formats
+import qvalve.index
+import qvalve.lastknown
 import qvalve.mainserver
+import qvalve.profiling
+import qvalve.rollups
+import qvalve.rttmodel
+import qvalve.watch
 
 # -------------------------------------------------------------------------------
 
 
-def search_mainserver(args):
+def _with_mainserver(report):
+    """Call `report(args, mainserver)` with a `MainServer` configured from `args`.
+
+    Under `--profile`, the whole report is profiled, and saved when done.
+    The transport is closed when done; under `--record`, that completes
+    the capture file.
+    """
+
+    @functools.wraps(report)
+    def wrapper(args):
+        mainserver = _get_mainserver(args)
+        try:
+            with mainserver.profiler.thread():
+                report(args, mainserver)
+            mainserver.profiler.save()
+            mainserver.rollups.save()
+            mainserver.last_known.save()
+        finally:
+            mainserver.transport.close()
+
+    return wrapper
+
+
+# -------------------------------------------------------------------------------
+
+
+@_with_mainserver
+def search_mainserver(args, mainserver):
     """Search Valve's Main server for Game servers."""
 
-    mainserver = qvalve.mainserver.MainServer(
-        max_threads=args.max_threads,
-        debug=args.debug,
-        rules=args.show_tags,
+    filters = _get_filters_stage1(args)
+    stage2 = _get_filters_stage2(args, mainserver)
+    removed = defaultdict(int)
+
+    if args.ping_sweep:
+        servers = mainserver.ping_sweep(
+            regions=args.regions,
+            count=args.ping_sweep,
+            accept=lambda x: _passes_stage2(stage2, x, removed),
+            max_ping=args.max_ping,
+            deadline=args.deadline,
+            filters=filters,
+            max_servers=args.max_servers,
+        )
+        for name, count in removed.items():
+            logger.info(f"removed {count} servers; {name}")
+        logger.success(f"mainserver.ping_sweep returned {len(servers)} servers")
+        mainserver.rtt.save()
+        _output_gameservers(args, servers, by_map=False)
+        return
+
+    # Keywords of servers that pass, tallied as they arrive.
+    report = qvalve.index.KeywordIndex() if args.report_keywords else None
+
+    nservers, npassed = _output_stream(
+        args,
+        mainserver.isearch(
+            regions=args.regions,
+            max_ping=args.max_ping,
+            # with a `--limit` or `--deadline`, probe the servers likely to pass
+            # first; by the filters that don't need this run's indexes.
+            likely=(
+                functools.partial(_passes_stage2, _get_filters_stage2(args))
+                if args.limit or args.deadline
+                else None
+            ),
+            deadline=args.deadline,
+            filters=filters,
+            max_servers=args.max_servers,
+        ),
+        stage2,
+        removed,
+        report,
     )
 
+    logger.success(f"mainserver.isearch returned {nservers} servers")
+    for name, count in removed.items():
+        logger.info(f"removed {count} servers; {name}")
+    logger.success(f"_filter_stage2 passed {npassed} servers")
+    mainserver.rtt.save()
+
+    if report is not None:
+        _print_keywords_report(report, file=sys.stdout if args.format == "text" else sys.stderr)
+
+
+# -------------------------------------------------------------------------------
+
+
+@_with_mainserver
+def watch_mainserver(args, mainserver):
+    """Search Valve's Main server every `--watch` seconds; print what changed.
+
+    The `MainServer` and the `GameServer`s it found are kept between scans.
+    Most scans only re-query the servers already known; every
+    `qvalve.watch.MASTER_EVERY` scans the main server is searched again
+    to discover new ones.
+    """
+
     filters = _get_filters_stage1(args)
+    stage2 = _get_filters_stage2(args, mainserver)
+
+    writer = None
+    if args.format != "text":
+        writer = qvalve.formats.get_writer(args.format, sys.stdout.buffer)
+
+    differ = qvalve.watch.Differ()
+    known = {}
+    scanno = 0
+
+    try:
+        while True:
+            start = time.monotonic()
+
+            if scanno % qvalve.watch.MASTER_EVERY == 0:
+                servers = mainserver.isearch(
+                    regions=args.regions,
+                    max_ping=args.max_ping,
+                    filters=filters,
+                    max_servers=args.max_servers,
+                )
+            else:
+                servers = mainserver.requery(list(known.values()))
+
+            known = {x.addr: x for x in servers}
+            passed = {k: v for k, v in known.items() if _passes_stage2(stage2, v)}
+            events = differ.update(passed)
+            _output_events(events, writer)
+            mainserver.rtt.save()
+            mainserver.rollups.save()
+            mainserver.last_known.save()
+
+            elapsed = time.monotonic() - start
+            logger.info(
+                f"scan {scanno} queried {len(known)} servers, {len(passed)} passed, "
+                f"{len(events)} changed in {elapsed:.1f} secs"
+            )
 
-    servers = mainserver.search(
-        regions=args.regions, filters=filters, max_servers=args.max_servers
-    )
-    logger.success(f"mainserver.search returned {len(servers)} servers")
+            scanno += 1
+            time.sleep(max(0, args.watch - elapsed))
 
-    servers = _filter_stage2(args, servers)
-    logger.success(f"_filter_stage2 returned {len(servers)} servers")
+    except KeyboardInterrupt:
+        pass
 
-    # key = lambda x: (-x['players'], x['mapname'])  # noqa: E731
-    # key = lambda x: (x['mapname'], -x['players'])  # noqa: E731
+    finally:
+        if writer is not None:
+            writer.close()
 
-    _print_gameservers(
-        args,
-        sorted(servers, key=lambda x: (x.map_name, x.ping, x.addr)),
-    )
 
-    if args.report_keywords:
-        _print_keywords_report(servers)
+# -------------------------------------------------------------------------------
+
+
+def _output_events(events, writer=None):
+    """Output `qvalve.watch.Differ` events as text, or records to `writer`."""
+
+    for event, addr, server, changes in events:
+        if writer is not None:
+            record = {"event": event, "addr": addr}
+            if event == "added":
+                record.update(server.to_dict())
+            elif event == "changed":
+                record["changes"] = changes
+            writer.write_record(record)
+
+        elif event == "added":
+            print(f"+ {_format_gameserver(server)}")
+
+        elif event == "removed":
+            print(f"- a={addr}")
+
+        else:
+            print(
+                f"~ a={addr:21} "
+                + " ".join(f"{k}={old!r}->{new!r}" for k, (old, new) in changes.items())
+            )
+
+    if writer is not None:
+        writer.flush()
+    else:
+        sys.stdout.flush()
 
 
 # -------------------------------------------------------------------------------
 
 
-def query_gameservers(args):
+@_with_mainserver
+def query_gameservers(args, mainserver):
     """Query list of Game server addresses."""
 
+    servers = mainserver.iquery(_read_addrs(args), deadline=args.deadline)
+    nservers, _ = _output_stream(args, servers)
+
+    logger.success(f"mainserver.iquery returned {nservers} servers")
+    mainserver.rtt.save()
+
+
+# -------------------------------------------------------------------------------
+
+
+@_with_mainserver
+def search_query_sets(args, mainserver):
+    """Search for each `--query-set` in one pass; output each set's servers.
+
+    Each server is queried once, however many sets list it, and passed
+    through the stage two filters of each set that listed it. In `ndjson`,
+    each record names its `query_set`; a server in several sets is
+    written once for each.
+    """
+
+    query_sets = args.query_sets
+    stage2 = {k: _get_filters_stage2(v, mainserver) for k, v in query_sets.items()}
+    pings = [x.max_ping for x in query_sets.values()]
+
+    writer = None
+    if args.format != "text":
+        writer = qvalve.formats.get_writer(args.format, sys.stdout.buffer)
+    collected = defaultdict(list)
+
+    def _fan_out(server, names):
+        for name in sorted(names):
+            if not _passes_stage2(stage2[name], server):
+                continue
+            if writer is not None:
+                writer.write_record({"query_set": name, **server.to_dict()})
+            else:
+                collected[name].append(server)
+
+    # addr -> names of the query sets that listed it; filled in as the main
+    # server is paged, so a server may be listed again after it's queried.
+    listed = {}
+    servers = {}
+    fanned_out = {}
+    for server in mainserver.isearch_sets(
+        {
+            name: {
+                "regions": x.regions,
+                "filters": _get_filters_stage1(x),
+                "max_servers": x.max_servers,
+            }
+            for name, x in query_sets.items()
+        },
+        listed,
+        # probes can only be skipped for being too far away for every set.
+        max_ping=None if None in pings else max(pings),
+        deadline=args.deadline,
+    ):
+        servers[server.addr] = server
+        fanned_out[server.addr] = set(listed[server.addr])
+        _fan_out(server, fanned_out[server.addr])
+
+    for addr, server in servers.items():
+        if late := listed[addr] - fanned_out[addr]:
+            _fan_out(server, late)
+
+    logger.success(
+        f"mainserver.isearch_sets returned {len(servers)} servers "
+        f"for {len(query_sets)} query sets"
+    )
+    mainserver.rtt.save()
+
+    if writer is not None:
+        writer.close()
+        return
+
+    for name in query_sets:
+        print(f"{'=' * 20} query set {name!r}: {len(collected[name])} servers")
+        _print_gameservers(
+            args, sorted(collected[name], key=lambda x: (x.map_name, x.ping, x.addr))
+        )
+
+
+# -------------------------------------------------------------------------------
+
+
+@_with_mainserver
+def find_players(args, mainserver):
+    """Search Valve's Main server for Game servers; print where `--find-player`s are."""
+
+    servers = {
+        x.addr: x
+        for x in mainserver.isearch(
+            regions=args.regions,
+            max_ping=args.max_ping,
+            deadline=args.deadline,
+            filters=_get_filters_stage1(args),
+            max_servers=args.max_servers,
+        )
+    }
+
+    logger.success(f"mainserver.isearch returned {len(servers)} servers")
+    logger.info(f"indexed {len(mainserver.players)} players")
+    mainserver.rtt.save()
+
+    writer = None
+    if args.format != "text":
+        writer = qvalve.formats.get_writer(args.format, sys.stdout.buffer)
+
+    for find in args.find_player:
+        # probes still in flight when `--deadline` expired may have indexed others.
+        locations = [x for x in mainserver.players.lookup(find) if x[0] in servers]
+        if not locations:
+            logger.warning(f"player {find!r} not found")
+
+        for addr, name, score, duration in locations:
+            server = servers[addr]
+            if writer is not None:
+                record = {"find": find, "name": name, "score": score, "duration": duration}
+                record.update(server.to_dict())
+                writer.write_record(record)
+            else:
+                print(_format_gameserver(server))
+                print(f"    {name!r} score={score} time={duration / 60:.0f}m")
+
+    if writer is not None:
+        writer.close()
+
+
+# -------------------------------------------------------------------------------
+
+
+def print_trends(args):
+    """Print players, servers and ping per map and region, by `--trends` resolution."""
+
+    rollups = qvalve.rollups.Rollups.load(args.rollups)
+    starts, series = rollups.series(args.trends)
+    if not starts:
+        logger.warning(f"no {args.trends}s rolled up in {str(args.rollups)!r} yet")
+        return
+
+    for line in format_trends(starts, series):
+        print(line)
+
+
+def format_trends(starts, series, count=30, width=48):
+    """Yield lines of a trends report of `qvalve.rollups.Rollups.series`.
+
+    The `count` maps with the most players on average, then each region;
+    the last `width` buckets of players are drawn as a sparkline.
+    """
+
+    first = time.strftime("%Y-%m-%d %H:%M", time.localtime(starts[-width:][0]))
+    last = time.strftime("%Y-%m-%d %H:%M", time.localtime(starts[-1]))
+    yield f"{len(starts)} buckets; sparklines {first} to {last}"
+
+    for dimension, limit in (("map", count), ("region", None)):
+        yield ""
+        yield (
+            f"{dimension:30} {'now':>5} {'mean':>6} {'peak':>5} {'srvs':>5} {'ping':>5}  players"
+        )
+        for name, now, mean, peak, nservers, ping, spark in trend_rows(
+            series, dimension, limit, width
+        ):
+            yield (
+                f"{name[:30]:30} {now:5.0f} {mean:6.1f} {peak:5.0f} {nservers:5.0f} "
+                f"{ping or 0:5.0f}  {spark}"
+            )
+
+
+def trend_rows(series, dimension, limit=None, width=48):
+    """Return the `limit` series of `dimension` with the most players on average.
+
+    Each row is `(name, now, mean, peak, servers, ping, sparkline)`; `ping`
+    is the latest known, or None.
+    """
+
+    rows = []
+    for (dim, name), metrics in series.items():
+        if dim != dimension:
+            continue
+        players = metrics["players"]
+        pings = [x for x in metrics["ping"] if x is not None]
+        rows.append(
+            (
+                name,
+                players[-1],
+                sum(players) / len(players),
+                max(players),
+                metrics["servers"][-1],
+                pings[-1] if pings else None,
+                _sparkline(players[-width:]),
+            )
+        )
+    rows.sort(key=lambda x: x[2], reverse=True)
+    return rows[:limit]
+
+
+def _sparkline(values):
+    """Return `values` drawn as a string of block characters."""
+
+    blocks = " ▁▂▃▄▅▆▇█"
+    peak = max(values) or 1
+    return "".join(blocks[round(x / peak * (len(blocks) - 1))] for x in values)
+
+
+# -------------------------------------------------------------------------------
+
+
+def _get_mainserver(args):
+    """Return `MainServer` configured from `args`."""
+
+    transport = None
+    if args.record:
+        transport = qvalve.capture.RecordingTransport(args.record)
+    elif args.replay:
+        transport = qvalve.capture.ReplayTransport(args.replay, args.replay_speed)
+
+    # a replay learns, and rolls up, in memory only; its pings and scans
+    # aren't real, nor are they happening now.
+    live = not args.replay
+
+    return qvalve.mainserver.MainServer(
+        max_threads=args.max_threads,
+        debug=args.debug,
+        rules=args.show_tags,
+        rtt=qvalve.rttmodel.RttModel.load(args.rtt_model) if live and args.rtt_model else None,
+        profiler=qvalve.profiling.Profiler(args.profile),
+        transport=transport,
+        masters=args.master,
+        rollups=qvalve.rollups.Rollups.load(args.rollups) if live and args.rollups else None,
+        last_known=(
+            qvalve.lastknown.LastKnown.load(args.last_known)
+            if live and args.last_known
+            else None
+        ),
+        snapshot=args.snapshot,
+    )
+
+
+# -------------------------------------------------------------------------------
+
+
+def _read_addrs(args):
+    """Yield `ADDR`s from the command line, `--addr-file`, and stdin (`-`).
+
+    Files are read lazily, a line at a time, so that querying can start
+    while stdin is still being written.
+    """
+
+    files = [args.addr_file] if args.addr_file else []
+
     for addr in args.addrs:
-        server = qvalve.gameserver.GameServer(addr)
-        server.query()
-        _print_gameservers(args, [server])
+        if addr == "-":
+            files.append("-")
+        else:
+            yield addr
+
+    for path in files:
+        with (
+            contextlib.nullcontext(sys.stdin) if path == "-" else open(path, encoding="utf-8")
+        ) as file:
+            for line in file:
+                # one or more addrs per line; `#` starts a comment.
+                yield from line.split("#", 1)[0].split()
+
+
+# -------------------------------------------------------------------------------
+
+
+def _output_stream(args, servers, stage2=(), removed=None, report=None):
+    """Output `servers` in `--format` as they arrive; return `(nservers, npassed)`.
+
+    Servers that fail the `stage2` filters are counted in `removed`;
+    servers that pass are tallied in the keywords `report`. Text is
+    printed sorted once all servers have arrived, unless `--as-completed`.
+    Once `--limit` servers have passed, the `servers` generator is closed,
+    cancelling the rest.
+    """
+
+    writer = None
+    if args.format != "text":
+        writer = qvalve.formats.get_writer(args.format, sys.stdout.buffer)
+    collected = []
+
+    nservers = npassed = 0
+    for server in servers:
+        nservers += 1
+        if not _passes_stage2(stage2, server, removed):
+            continue
+        npassed += 1
+        if report is not None:
+            report.update(server)
+        if writer is not None:
+            writer.write(server)
+        elif args.as_completed:
+            _print_gameservers(args, [server], by_map=False)
+        else:
+            collected.append(server)
+        if npassed == args.limit:
+            servers.close()
+            logger.success(f"reached --limit {args.limit}")
+            break
+
+    if writer is not None:
+        writer.close()
+    elif collected:
+        # key = lambda x: (-x['players'], x['mapname'])  # noqa: E731
+        # key = lambda x: (x['mapname'], -x['players'])  # noqa: E731
+
+        _print_gameservers(
+            args,
+            sorted(collected, key=lambda x: (x.map_name, x.ping, x.addr)),
+        )
+
+    return nservers, npassed
+
+
+# -------------------------------------------------------------------------------
+
+
+def _output_gameservers(args, servers, by_map=True):
+    """Print `servers` in `--format`."""
+
+    if args.format == "text":
+        _print_gameservers(args, servers, by_map)
+        return
+
+    writer = qvalve.formats.get_writer(args.format, sys.stdout.buffer)
+    for server in servers:
+        writer.write(server)
+    writer.close()
 
 
 # -------------------------------------------------------------------------------
@@ -89,72 +578,101 @@ def _get_filters_stage1(args):
 # -------------------------------------------------------------------------------
 
 
-def _filter_stage2(args, servers):
-    """Applied after querying valve."""
+def _get_filters_stage2(args, mainserver=None):
+    """Applied after querying valve; return list of `(name, predicate)`.
+
+    The `--keyword` and `--no-keyword` filters look up servers in the
+    `mainserver.keywords` index, and `--name-match` and `--map-match` in
+    the `mainserver.names` and `mainserver.maps` indexes.
+    """
+
+    filters = []
 
     if args.map_prefix is not None:
-        _ = [x for x in servers if x.map_name.startswith(args.map_prefix)]
-        count = len(_)
-        logger.info(f"removed {len(servers) - count} servers leaving {count}; map_prefix")
-        servers = _
+        filters.append(("map_prefix", lambda x: x.map_name.startswith(args.map_prefix)))
+
+    if mainserver is not None and args.name_match is not None:
+        filters.append(
+            ("name_match", lambda x: mainserver.names.matches(x.addr, args.name_match))
+        )
+
+    if mainserver is not None and args.map_match is not None:
+        filters.append(("map_match", lambda x: mainserver.maps.matches(x.addr, args.map_match)))
 
     if args.min_players is not None:  # int
-        _ = [x for x in servers if x.players >= args.min_players]
-        count = len(_)
-        logger.info(f"removed {len(servers) - count} servers leaving {count}; min_players")
-        servers = _
+        filters.append(("min_players", lambda x: x.players >= args.min_players))
 
     if args.no_max_players:  # bool
-        _ = [x for x in servers if x.players < x.max_players]
-        count = len(_)
-        logger.info(f"removed {len(servers) - count} servers leaving {count}; no_max_players")
-        servers = _
+        filters.append(("no_max_players", lambda x: x.players < x.max_players))
 
     if args.no_mm_strict_1:  # bool
-        _ = [x for x in servers if x.visibility != 1]
-        count = len(_)
-        logger.info(f"removed {len(servers) - count} servers leaving {count}; no_mm_strict_1")
-        servers = _
+        filters.append(("no_mm_strict_1", lambda x: x.visibility != 1))
 
     if args.max_ping is not None:  # int
-        _ = [x for x in servers if x.ping <= args.max_ping]
-        count = len(_)
-        logger.info(f"removed {len(servers) - count} servers leaving {count}; max_ping")
-        servers = _
+        filters.append(("max_ping", lambda x: x.ping <= args.max_ping))
+
+    if mainserver is not None and (args.keyword or args.no_keyword):  # list
+        keywords = mainserver.keywords
+        filters.append(
+            ("keyword", lambda x: keywords.matches(x.addr, args.keyword, args.no_keyword))
+        )
+
+    return filters
+
+
+# -------------------------------------------------------------------------------
+
+
+def _passes_stage2(filters, server, removed=None):
+    """Return True if `server` passes all of the stage two `filters`.
+
+    Count the first filter that `server` fails in `removed`.
+    """
+
+    for name, predicate in filters:
+        if not predicate(server):
+            if removed is not None:
+                removed[name] += 1
+            return False
+    return True
+
+
+# -------------------------------------------------------------------------------
 
-    return servers
+
+def _format_gameserver(server):
+    return " ".join(
+        [
+            f"r={server.region:1}",
+            f"app_id={server.app_id:3}",
+            f"typ={server.server_type:1}",
+            f"vac={server.vac:1}",
+            f"vis={server.visibility:1}",
+            f"imp={server.n_imposters:2}",
+            f"a={server.addr:21}",
+            f"ping={server.ping:3}",
+            f"p={server.players:2}",
+            f"m={server.max_players:2}",
+            f"b={server.bots:2}",
+            f"gb={server.gamebots:2}",
+            f"{server.map_name:35}",
+            f"{server.server_name!r}",
+        ]
+    )
 
 
 # -------------------------------------------------------------------------------
 
 
-def _print_gameservers(args, servers):
+def _print_gameservers(args, servers, by_map=True):
     lastmap = None
 
     for server in [x for x in servers if x.map_name]:
-        if lastmap and lastmap != server.map_name:
+        if by_map and lastmap and lastmap != server.map_name:
             print("-" * 150)
         lastmap = server.map_name
 
-        print(
-            " ".join(
-                [
-                    f"r={server.region:1}",
-                    f"app_id={server.app_id:3}",
-                    f"typ={server.server_type:1}",
-                    f"vac={server.vac:1}",
-                    f"vis={server.visibility:1}",
-                    f"imp={server.n_imposters:2}",
-                    f"a={server.addr:21}",
-                    f"ping={server.ping:3}",
-                    f"p={server.players:2}",
-                    f"m={server.max_players:2}",
-                    f"b={server.bots:2}",
-                    f"{server.map_name:35}",
-                    f"{server.server_name!r}",
-                ]
-            )
-        )
+        print(_format_gameserver(server))
 
         if args.show_keywords:
             print(f"keywords={server.keywords!r}")
@@ -181,29 +699,13 @@ def _print_gameservers(args, servers):
 # -------------------------------------------------------------------------------
 
 
-def _print_keywords_report(servers):
-    nplayers = defaultdict(int)
-    nservers = defaultdict(int)
-
-    for server in [x for x in servers if x.keywords]:
-        for k in server.keywords:
-            nservers[k] += 1
-            nplayers[k] += server.players
-
-    # print('Keywords by number of players:')
-    # for key, count in sorted(nplayers.items(), key=lambda _: _[1], reverse=True):
-    #    print(f'{count:3} {key}')
-
-    # print('Keywords by number of servers:')
-    # for key, count in sorted(nservers.items(), key=lambda _: _[1], reverse=True):
-    #    print(f'{count:3} {key}')
+def _print_keywords_report(report, file=None):
 
     count = 30
-    print(f"Top {count} nplayers, nservers")
-    _a = sorted(nplayers.items(), key=lambda _: _[1], reverse=True)[:count]
-    _b = sorted(nservers.items(), key=lambda _: _[1], reverse=True)[:count]
+    print(f"Top {count} nplayers, nservers", file=file)
+    _a, _b = report.top(count)
     for _ in zip(_a, _b, strict=False):
-        print(f"{str(_[0]):30} {str(_[1]):30}")
+        print(f"{str(_[0]):30} {str(_[1]):30}", file=file)
 
 
 # -------------------------------------------------------------------------------
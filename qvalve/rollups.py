@@ -0,0 +1,342 @@
+"""Time-series rollups of scans.
+
+`Rollups` keeps, for each map and each region, the number of players,
+the number of servers and the median ping seen by each scan, in
+fixed-size ring buffers at three resolutions: minutes, hours and days.
+A scan is written into the current minute (the last scan in a minute
+wins); as each hour closes, its minutes are downsampled into it, and as
+each day closes, its hours. Memory is fixed by `RESOLUTIONS` and
+`MAX_SERIES`, however long the process runs. Persisted between runs,
+like the rtt model.
+"""
+
+# -------------------------------------------------------------------------------
+
+import base64
+import json
+import math
+import statistics
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from itertools import compress
+from pathlib import Path
+
+from loguru import logger
+
+# -------------------------------------------------------------------------------
+
+# (name, seconds per bucket, number of buckets kept), finest first; each
+# bucket of one is a whole number of buckets of the one before, and each
+# is kept long enough to close a bucket of the next.
+RESOLUTIONS = (("minute", 60, 120), ("hour", 3600, 168), ("day", 86400, 90))
+
+METRICS = ("players", "servers", "ping")
+
+# series (maps and regions) kept; servers on any more maps are added to
+# the `OTHER` map.
+MAX_SERIES = 256
+OTHER = "(other)"
+
+# -------------------------------------------------------------------------------
+
+
+class _Ring:
+    """Buckets of one resolution, for all series; a slot per bucket."""
+
+    def __init__(self, name, width, nslots):
+
+        self.name = name
+        self.width = width
+        self.nslots = nslots
+        # bucket number held in each slot; -1 if none.
+        self.stamps = array("q", [-1]) * nslots
+        # (dimension, key) -> one array per metric; ping is NaN where there
+        # were no servers.
+        self.series = {}
+
+    def values(self, series):
+        """Return the arrays of `series`, created empty if new."""
+
+        if (values := self.series.get(series)) is None:
+            values = self.series[series] = tuple(
+                array("f", [math.nan if x == "ping" else 0]) * self.nslots for x in METRICS
+            )
+        return values
+
+    def reset(self, bucket):
+        """Return the slot for `bucket`, cleared in every series."""
+
+        slot = bucket % self.nslots
+        self.stamps[slot] = bucket
+        for players, servers, ping in self.series.values():
+            players[slot] = servers[slot] = 0
+            ping[slot] = math.nan
+        return slot
+
+
+# -------------------------------------------------------------------------------
+
+
+class Rollups:
+    """Players, servers and ping per map and region, over time."""
+
+    def __init__(self, path=None):
+        """Initialize empty rollups, to be persisted to `path`."""
+
+        self.path = Path(path).expanduser() if path else None
+        self._lock = threading.Lock()
+        self._rings = [_Ring(*x) for x in RESOLUTIONS]
+        # resolution name -> last bucket downsampled into it.
+        self._closed = {}
+        self._dirty = False
+
+    # -------------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._rings[0].series)
+
+    # -------------------------------------------------------------------------------
+
+    @classmethod
+    def load(cls, path):
+        """Return rollups read from `path`, or empty rollups if there aren't any."""
+
+        rollups = cls(path)
+        try:
+            data = json.loads(rollups.path.read_text(encoding="utf-8"))
+            for ring in rollups._rings:
+                saved = data["rings"][ring.name]
+                stamps = _unpack("q", saved["stamps"])
+                if len(stamps) != ring.nslots:
+                    raise ValueError(f"{ring.name} has {len(stamps)} slots")
+                ring.stamps = stamps
+                for series, packed in saved["series"]:
+                    values = _unpack("f", packed)
+                    ring.series[tuple(series)] = tuple(
+                        values[i * ring.nslots : (i + 1) * ring.nslots]
+                        for i in range(len(METRICS))
+                    )
+            rollups._closed = data["closed"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            logger.warning(f"ignoring rollups {str(rollups.path)!r}: {err}")
+            rollups = cls(path)
+        return rollups
+
+    # -------------------------------------------------------------------------------
+
+    def save(self):
+        """Write rollups to `path`, if they have changed."""
+
+        if not self.path or not self._dirty:
+            return
+
+        with self._lock:
+            data = {
+                "closed": self._closed,
+                "rings": {
+                    x.name: {
+                        "stamps": _pack(x.stamps),
+                        "series": [[k, _pack(sum(v, array("f")))] for k, v in x.series.items()],
+                    }
+                    for x in self._rings
+                },
+            }
+            self._dirty = False
+
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+            tmp.replace(self.path)
+        except OSError as err:
+            logger.warning(f"can't save rollups {str(self.path)!r}: {err}")
+            self._dirty = True
+            return
+        logger.debug(f"saved rollups {str(self.path)!r}")
+
+    # -------------------------------------------------------------------------------
+
+    def add_scan(self, servers, when=None):
+        """Add a scan that found `servers`, a list of `GameServer`, at `when` (epoch)."""
+
+        tally = Tally()
+        for server in servers:
+            tally.add(server)
+        self.add_tally(tally, when)
+
+    def add_tally(self, tally, when=None):
+        """Add a scan, totalled as it ran by `tally`, at `when` (epoch).
+
+        The scan replaces every series of its minute; it should be of all
+        the servers, not a filtered few.
+        """
+
+        when = time.time() if when is None else when
+
+        with self._lock:
+            minutes = self._rings[0]
+            nseries = len(minutes.series)
+
+            totals = defaultdict(lambda: [0, 0, Counter()])
+            for series, (nplayers, nservers, pings) in tally.totals.items():
+                if series not in minutes.series:
+                    if nseries >= MAX_SERIES:
+                        # PLW2901: series folds into its dimension's `OTHER` when full.
+                        series = (series[0], OTHER)  # noqa: PLW2901
+                    else:
+                        nseries += 1
+                total = totals[series]
+                total[0] += nplayers
+                total[1] += nservers
+                total[2].update(pings)
+
+            self._close(when)
+            slot = minutes.reset(int(when // minutes.width))
+            for series, (nplayers, nservers, pings) in totals.items():
+                players, servers, ping = minutes.values(series)
+                players[slot] = nplayers
+                servers[slot] = nservers
+                ping[slot] = _median(pings) if pings else math.nan
+            self._dirty = True
+
+    # -------------------------------------------------------------------------------
+
+    def _close(self, when):
+        """Downsample each bucket that has closed by `when` into the next resolution."""
+
+        for fine, coarse in zip(self._rings, self._rings[1:], strict=False):
+            current = int(when // coarse.width)
+            ratio = coarse.width // fine.width
+            # anything older has already left the finer ring.
+            first = max(self._closed.get(coarse.name, -1) + 1, current - fine.nslots // ratio)
+            for bucket in range(first, current):
+                self._downsample(fine, coarse, bucket, ratio)
+            if first < current and coarse is self._rings[-1]:
+                self._prune()
+            self._closed[coarse.name] = current - 1
+
+    def _prune(self):
+        """Forget series that have no servers in any bucket of any resolution."""
+
+        for series in list(self._rings[0].series):
+            if not any(any(x.series[series][1]) for x in self._rings if series in x.series):
+                for ring in self._rings:
+                    ring.series.pop(series, None)
+
+    @staticmethod
+    def _downsample(fine, coarse, bucket, ratio):
+        """Set `bucket` of `coarse` from the `ratio` buckets of `fine` it covers."""
+
+        # the buckets are contiguous in `fine`, as its `nslots` is a multiple of `ratio`.
+        first = bucket * ratio
+        start = first % fine.nslots
+        stamps = fine.stamps[start : start + ratio]
+        mask = [x == first + i for i, x in enumerate(stamps)]
+        if not any(mask):
+            return
+
+        nvalid = sum(mask)
+        slot = coarse.reset(bucket)
+        for series, (players, servers, ping) in fine.series.items():
+            cplayers, cservers, cping = coarse.values(series)
+            cplayers[slot] = sum(compress(players[start : start + ratio], mask)) / nvalid
+            cservers[slot] = sum(compress(servers[start : start + ratio], mask)) / nvalid
+            if pings := [
+                x for x in compress(ping[start : start + ratio], mask) if not math.isnan(x)
+            ]:
+                cping[slot] = statistics.median(pings)
+
+    # -------------------------------------------------------------------------------
+
+    def series(self, resolution, dimension=None):
+        """Return `(starts, series)` at `resolution`, oldest first.
+
+        Args:
+            resolution: "minute", "hour" or "day".
+            dimension: "map" or "region"; default both.
+
+        Returns:
+            starts: epoch of the start of each bucket with data.
+            series: `{(dimension, key): {metric: [value per bucket]}}`,
+                where ping is None where there were no servers.
+        """
+
+        ring = {x.name: x for x in self._rings}[resolution]
+        with self._lock:
+            slots = sorted((x, i) for i, x in enumerate(ring.stamps) if x >= 0)
+            starts = [x * ring.width for x, _ in slots]
+            series = {
+                key: {
+                    metric: [
+                        None if math.isnan(v := values[m][i]) else round(v, 1) for _, i in slots
+                    ]
+                    for m, metric in enumerate(METRICS)
+                }
+                for key, values in ring.series.items()
+                if dimension is None or key[0] == dimension
+            }
+        return starts, series
+
+
+# -------------------------------------------------------------------------------
+
+
+class Tally:
+    """Totals of one scan, per series, added up as its servers arrive.
+
+    Its size depends on the number of maps and regions, and of distinct
+    pings, not on the number of servers.
+    """
+
+    def __init__(self):
+        """Initialize empty tally."""
+
+        # (dimension, key) -> [players, servers, Counter of pings].
+        self.totals = defaultdict(lambda: [0, 0, Counter()])
+
+    def add(self, server):
+        """Add `server`, a `GameServer`, to its map and region."""
+
+        for series in (("map", server.map_name or ""), ("region", str(server.region))):
+            total = self.totals[series]
+            total[0] += server.players or 0
+            total[1] += 1
+            if server.ping is not None:
+                total[2][server.ping] += 1
+
+
+# -------------------------------------------------------------------------------
+
+
+def _median(counts):
+    """Return the median of the values counted in Counter `counts`."""
+
+    values = sorted(counts)
+    n = counts.total()
+    # the middle value, or the two either side of the middle.
+    lo, hi = (n - 1) // 2, n // 2
+    seen = 0
+    low = None
+    for value in values:
+        seen += counts[value]
+        if low is None and seen > lo:
+            low = value
+        if seen > hi:
+            return (low + value) / 2
+    raise ValueError("no values")
+
+
+def _pack(values):
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _unpack(typecode, text):
+    values = array(typecode)
+    values.frombytes(base64.b64decode(text))
+    return values
+
+
+# -------------------------------------------------------------------------------
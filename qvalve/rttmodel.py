@@ -0,0 +1,149 @@
+"""Round-trip time model.
+
+Learn `GameServer.ping` by IP prefix, persisted between runs, so that
+servers that are confidently too far away for `--max-ping` can be skipped
+(or probed last) instead of costing a full query, or a full timeout.
+"""
+
+# -------------------------------------------------------------------------------
+
+import json
+import random
+import threading
+from pathlib import Path
+
+from loguru import logger
+
+# -------------------------------------------------------------------------------
+
+
+class RttModel:
+    """Round-trip times aggregated by IP prefix.
+
+    Each /24 (a hosting site), and each /16 (a rough stand-in for the
+    hosting network's ASN), keeps a count, a running mean and the minimum
+    of the pings observed in it. The minimum is the prefix's floor; no
+    server in it is expected to answer faster.
+    """
+
+    # prefix lengths, most specific first, and the number of samples each
+    # needs before it's trusted.
+    PREFIXES = ((24, 3), (16, 10))
+
+    # weight of a new sample in the running mean, once past the first few.
+    ALPHA = 0.2
+
+    # fraction of skipped servers to probe anyway, to keep the model honest.
+    VERIFY_FRACTION = 0.1
+
+    # -------------------------------------------------------------------------------
+
+    def __init__(self, path=None):
+        """Initialize empty model, to be persisted to `path`."""
+
+        self.path = Path(path).expanduser() if path else None
+        self._lock = threading.Lock()
+        # {prefixlen: {prefix: [n, mean, min]}}
+        self._stats = {x: {} for x, _ in self.PREFIXES}
+        self._dirty = False
+
+    # -------------------------------------------------------------------------------
+
+    @classmethod
+    def load(cls, path):
+        """Return model read from `path`, or an empty model if there isn't one."""
+
+        model = cls(path)
+        try:
+            data = json.loads(model.path.read_text(encoding="utf-8"))
+            for prefixlen, _ in cls.PREFIXES:
+                model._stats[prefixlen] = data.get(str(prefixlen), {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as err:
+            logger.warning(f"ignoring rtt model {str(model.path)!r}: {err}")
+        return model
+
+    # -------------------------------------------------------------------------------
+
+    def save(self):
+        """Write model to `path`, if it has changed."""
+
+        if not self.path or not self._dirty:
+            return
+
+        with self._lock:
+            data = {str(k): v for k, v in self._stats.items()}
+            self._dirty = False
+
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+            tmp.replace(self.path)
+        except OSError as err:
+            # e.g., unwritable, or full; the search is done, so carry on, and retry later.
+            logger.warning(f"can't save rtt model {str(self.path)!r}: {err}")
+            self._dirty = True
+            return
+        logger.debug(f"saved rtt model {str(self.path)!r}")
+
+    # -------------------------------------------------------------------------------
+
+    @staticmethod
+    def _prefix(host, prefixlen):
+        return ".".join(host.split(".")[: prefixlen // 8])
+
+    # -------------------------------------------------------------------------------
+
+    def observe(self, host, ping):
+        """Learn that `host` answered in `ping` milliseconds."""
+
+        with self._lock:
+            for prefixlen, _ in self.PREFIXES:
+                prefixes = self._stats[prefixlen]
+                key = self._prefix(host, prefixlen)
+                if (stats := prefixes.get(key)) is None:
+                    prefixes[key] = [1, float(ping), ping]
+                    continue
+                stats[0] += 1
+                stats[1] += max(self.ALPHA, 1 / stats[0]) * (ping - stats[1])
+                stats[2] = min(stats[2], ping)
+            self._dirty = True
+
+    # -------------------------------------------------------------------------------
+
+    def estimate(self, host):
+        """Return `(mean, min)` ping of `host`'s most specific trusted prefix, or None."""
+
+        with self._lock:
+            for prefixlen, min_samples in self.PREFIXES:
+                stats = self._stats[prefixlen].get(self._prefix(host, prefixlen))
+                if stats and stats[0] >= min_samples:
+                    return stats[1], stats[2]
+        return None
+
+    # -------------------------------------------------------------------------------
+
+    def classify(self, host, max_ping):
+        """Return how to schedule a probe of `host`, given `max_ping`.
+
+        Returns:
+            "skip":  confidently over `max_ping`, because even the floor of
+                     its prefix is; don't probe.
+            "defer": probably over `max_ping`, or a sample of "skip" to
+                     verify; probe after everything else.
+            "probe": probe now.
+        """
+
+        if (estimate := self.estimate(host)) is None:
+            return "probe"
+
+        mean, floor = estimate
+        if floor > max_ping:
+            return "defer" if random.random() < self.VERIFY_FRACTION else "skip"
+        if mean > max_ping:
+            return "defer"
+        return "probe"
+
+
+# -------------------------------------------------------------------------------
@@ -0,0 +1,156 @@
+"""Fair scheduling of work across keys (regions).
+
+A `FairQueue` keeps a bounded queue per key, and hands items to the
+workers by weighted round-robin between them, so that a key with a lot
+of slow work can't hold every worker while others wait. Each key's
+weight (items per turn) and concurrency limit (items in progress at
+once) shrink with its observed failure (timeout) rate: a region whose
+servers mostly time out gets fewer workers, and fewer turns, while a
+nearby one is still waiting. A key never has more than its limit in
+progress: when every key with work waiting is at its limit, workers wait
+for a slot to free up.
+"""
+
+# -------------------------------------------------------------------------------
+
+import math
+import threading
+from collections import deque
+
+# -------------------------------------------------------------------------------
+
+# items a key with no failures gets per turn.
+QUANTUM = 4
+
+# weight of each outcome in a key's running failure rate.
+ALPHA = 0.1
+
+# -------------------------------------------------------------------------------
+
+
+class _Key:
+    """Queue, and scheduling state, of one key."""
+
+    def __init__(self):
+
+        self.items = deque()
+        self.running = 0
+        self.failure_rate = 0.0
+        # items left in this key's current turn.
+        self.credits = 0
+
+    def weight(self):
+        return max(1, round(QUANTUM * (1 - self.failure_rate)))
+
+    def limit(self, nworkers):
+        return max(1, math.ceil(nworkers * (1 - self.failure_rate)))
+
+
+# -------------------------------------------------------------------------------
+
+
+class FairQueue:
+    """Bounded per-key queues, served by weighted round-robin.
+
+    Like `queue.Queue`, except that `put` takes the item's key, and
+    `task_done` the key and whether the item failed.
+    """
+
+    def __init__(self, nworkers, maxsize):
+        """Initialize for `nworkers` workers, and up to `maxsize` items queued per key."""
+
+        self.nworkers = nworkers
+        self.maxsize = maxsize
+        self._cond = threading.Condition()
+        # key -> `_Key`; in turn order.
+        self._keys = {}
+        self._turns = deque()
+        self._unfinished = 0
+
+    # -------------------------------------------------------------------------------
+
+    def put(self, item, key):
+        """Add `item` to the queue of `key`; wait while that queue is full."""
+
+        with self._cond:
+            if (state := self._keys.get(key)) is None:
+                state = self._keys[key] = _Key()
+                self._turns.append(key)
+            self._cond.wait_for(lambda: len(state.items) < self.maxsize)
+            state.items.append(item)
+            self._unfinished += 1
+            self._cond.notify_all()
+
+    # -------------------------------------------------------------------------------
+
+    def get(self):
+        """Remove and return the next item, and its key; wait until there is one."""
+
+        with self._cond:
+            while (key := self._next()) is None:
+                self._cond.wait()
+            state = self._keys[key]
+            state.running += 1
+            state.credits -= 1
+            item = state.items.popleft()
+            self._cond.notify_all()
+            return item, key
+
+    def _next(self):
+        """Return the key to take the next item from, or None if all are empty.
+
+        Keys take turns, each taking up to its weight in items; keys at
+        their concurrency limit are passed over. None, too, if every key
+        with work waiting is at its limit.
+        """
+
+        if not any(x.items for x in self._keys.values()):
+            return None
+
+        for _ in range(2 * len(self._turns)):
+            key = self._turns[0]
+            state = self._keys[key]
+            if state.items and state.credits > 0 and state.running < state.limit(self.nworkers):
+                return key
+            # turn over; the next key starts its turn with its weight.
+            self._turns.rotate(-1)
+            nxt = self._keys[self._turns[0]]
+            nxt.credits = nxt.weight()
+
+        return None
+
+    # -------------------------------------------------------------------------------
+
+    def task_done(self, key, failed=False):
+        """Record that an item of `key` from `get` is finished, and whether it `failed`."""
+
+        with self._cond:
+            state = self._keys[key]
+            state.running -= 1
+            state.failure_rate += ALPHA * (float(failed) - state.failure_rate)
+            self._unfinished -= 1
+            self._cond.notify_all()
+
+    def join(self):
+        """Wait until every item put has been finished."""
+
+        with self._cond:
+            self._cond.wait_for(lambda: self._unfinished == 0)
+
+    # -------------------------------------------------------------------------------
+
+    def stats(self):
+        """Return dict of the failure rate, weight and limit of each key."""
+
+        with self._cond:
+            return {
+                k: {
+                    "failure_rate": round(v.failure_rate, 2),
+                    "weight": v.weight(),
+                    "limit": v.limit(self.nworkers),
+                }
+                for k, v in self._keys.items()
+            }
+
+
+# -------------------------------------------------------------------------------
@@ -0,0 +1,291 @@
+"""Shared, memory-mapped snapshot of the latest scan.
+
+A scanner publishes the servers found by each scan (`--snapshot FILE`)
+into a file with a fixed layout, replacing the previous one atomically;
+any number of reader processes (scripts, web workers) `Snapshot.open`
+it and read it in place, through `mmap`, without scanning or parsing.
+
+Layout, little-endian, each section 8-byte aligned:
+
+    header      `HEADER`: magic, version, number of records, number of
+                columns, time of the scan, and offset and size of the
+                string table.
+    directory   `DIRENT` per column: name, and offset of its data.
+    columns     per `INT_COLUMNS`, an int32 per record; per
+                `STR_COLUMNS`, a (offset, length) uint32 pair per record,
+                into the string table.
+    strings     UTF-8; each distinct string stored once.
+
+A reader keeps reading the file it opened until it calls `refresh`,
+even if a newer one has replaced it since.
+"""
+
+# -------------------------------------------------------------------------------
+
+import mmap
+import os
+import struct
+import tempfile
+import time
+from array import array
+from pathlib import Path
+
+# -------------------------------------------------------------------------------
+
+MAGIC = b"QVSNAP\x00\x01"
+VERSION = 1
+
+# magic, version, nrecords, ncolumns, created, strings offset, strings size.
+HEADER = struct.Struct("<8sIIIdQQ")
+# column name, data offset.
+DIRENT = struct.Struct("<16sQ")
+
+# `GameServer` attributes stored as int32; None is stored as -1.
+INT_COLUMNS = (
+    "region",
+    "app_id",
+    "vac",
+    "visibility",
+    "n_imposters",
+    "ping",
+    "players",
+    "max_players",
+    "bots",
+    "gamebots",
+)
+
+# `GameServer` attributes stored as strings; lists are joined with ",".
+STR_COLUMNS = ("addr", "server_type", "map_name", "server_name", "keywords", "sv_tags")
+
+_ALIGN = 8
+
+# -------------------------------------------------------------------------------
+
+
+class SnapshotWriter:
+    """Build a snapshot, server by server, in compact columns; then publish it."""
+
+    def __init__(self):
+        """Initialize empty snapshot."""
+
+        self._ints = {x: array("i") for x in INT_COLUMNS}
+        self._strs = {x: array("I") for x in STR_COLUMNS}
+        self._table = bytearray()
+        # string -> (offset, length) in `_table`.
+        self._interned = {}
+
+    def __len__(self):
+        return len(self._ints["region"])
+
+    # -------------------------------------------------------------------------------
+
+    def add(self, server):
+        """Add `server`, a `GameServer`."""
+
+        for name, column in self._ints.items():
+            value = getattr(server, name)
+            column.append(-1 if value is None else int(value))
+
+        for name, column in self._strs.items():
+            value = getattr(server, name)
+            if isinstance(value, (list, tuple)):
+                value = ",".join(value)
+            column.extend(self._intern(value or ""))
+
+    def _intern(self, string):
+
+        if (location := self._interned.get(string)) is None:
+            encoded = string.encode("utf-8", "replace")
+            location = self._interned[string] = (len(self._table), len(encoded))
+            self._table += encoded
+        return location
+
+    # -------------------------------------------------------------------------------
+
+    def publish(self, path, when=None):
+        """Write the snapshot to `path`, replacing any there atomically."""
+
+        path = Path(path).expanduser()
+        columns = [*self._ints.items(), *self._strs.items()]
+        offset = _aligned(HEADER.size + DIRENT.size * len(columns))
+        directory = []
+        for name, column in columns:
+            directory.append(DIRENT.pack(name.encode("ascii"), offset))
+            offset = _aligned(offset + len(column) * column.itemsize)
+
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            len(self),
+            len(columns),
+            time.time() if when is None else when,
+            offset,
+            len(self._table),
+        )
+
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+        try:
+            # `mkstemp` makes it private; readers may run as other users.
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, "wb") as file:
+                _write_aligned(file, header + b"".join(directory))
+                for _, column in columns:
+                    _write_aligned(file, column.tobytes())
+                file.write(self._table)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+
+# -------------------------------------------------------------------------------
+
+
+class Snapshot:
+    """Read-only, zero-copy view of a published snapshot."""
+
+    def __init__(self, path):
+        """Map snapshot at `path`; raise `ValueError` if it isn't one."""
+
+        self.path = Path(path).expanduser()
+        with self.path.open("rb") as file:
+            self._stat = os.fstat(file.fileno())
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        try:
+            magic, version, nrecords, ncolumns, created, strings, size = HEADER.unpack_from(
+                self._view
+            )
+        except struct.error as err:
+            self.close()
+            raise ValueError(f"{str(self.path)!r} is not a snapshot: {err}") from err
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{str(self.path)!r} is not a version {VERSION} snapshot")
+
+        self.created = created
+        self._nrecords = nrecords
+        self._strings = self._view[strings : strings + size]
+        # column name -> memoryview of its data.
+        self._columns = {}
+        for index in range(ncolumns):
+            name, offset = DIRENT.unpack_from(self._view, HEADER.size + DIRENT.size * index)
+            name = name.rstrip(b"\x00").decode("ascii")
+            width = 2 * nrecords if name in STR_COLUMNS else nrecords
+            typecode = "I" if name in STR_COLUMNS else "i"
+            self._columns[name] = self._view[offset : offset + 4 * width].cast(typecode)
+
+    @classmethod
+    def open(cls, path):
+        """Return snapshot at `path`."""
+
+        return cls(path)
+
+    # -------------------------------------------------------------------------------
+
+    def __len__(self):
+        return self._nrecords
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Unmap the snapshot."""
+
+        self._columns = {}
+        self._strings = None
+        self._view.release()
+        self._mmap.close()
+
+    # -------------------------------------------------------------------------------
+
+    def is_stale(self):
+        """Return True if a newer snapshot has been published since this one was opened."""
+
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns) != (self._stat.st_ino, self._stat.st_mtime_ns)
+
+    def refresh(self):
+        """Return the latest snapshot; this one, if it still is, else a newly opened one."""
+
+        if not self.is_stale():
+            return self
+        latest = type(self)(self.path)
+        self.close()
+        return latest
+
+    # -------------------------------------------------------------------------------
+
+    def column(self, name):
+        """Return memoryview of int32 column `name`, one per record; -1 for None."""
+
+        if name not in INT_COLUMNS:
+            raise KeyError(name)
+        return self._columns[name]
+
+    def string(self, name, index):
+        """Return string column `name` of record `index`."""
+
+        pairs = self._columns[name]
+        offset, length = pairs[2 * index], pairs[2 * index + 1]
+        return str(self._strings[offset : offset + length], "utf-8")
+
+    def select(self, map_prefix=None, min_players=None, max_ping=None):
+        """Return indexes of the records that match; compared in place, nothing decoded."""
+
+        indexes = range(self._nrecords)
+        if min_players is not None:
+            players = self._columns["players"]
+            indexes = [i for i in indexes if players[i] >= min_players]
+        if max_ping is not None:
+            ping = self._columns["ping"]
+            indexes = [i for i in indexes if 0 <= ping[i] <= max_ping]
+        if map_prefix:
+            prefix = map_prefix.encode("utf-8")
+            pairs = self._columns["map_name"]
+            indexes = [
+                i
+                for i in indexes
+                if pairs[2 * i + 1] >= len(prefix)
+                and self._strings[pairs[2 * i] : pairs[2 * i] + len(prefix)] == prefix
+            ]
+        return list(indexes)
+
+    def record(self, index):
+        """Return dict of record `index`."""
+
+        record = {}
+        for name in INT_COLUMNS:
+            value = self._columns[name][index]
+            record[name] = None if value == -1 else value
+        for name in STR_COLUMNS:
+            record[name] = self.string(name, index)
+        for name in ("keywords", "sv_tags"):
+            record[name] = record[name].split(",") if record[name] else []
+        return record
+
+    def __iter__(self):
+        for index in range(self._nrecords):
+            yield self.record(index)
+
+
+# -------------------------------------------------------------------------------
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _write_aligned(file, data):
+    file.write(data)
+    file.write(b"\x00" * (_aligned(len(data)) - len(data)))
+
+
+# -------------------------------------------------------------------------------
@@ -0,0 +1,489 @@
+"""A2S transport over reused UDP sockets.
+
+`steam.game_servers.query_master`, `a2s_info`, `a2s_players` and
+`a2s_rules` each open, connect and close a UDP socket per request.
+`Transport` provides the same four functions, with the same arguments,
+results and exceptions, but sends every request from a long-lived socket
+owned by the calling thread.
+Responses are matched to requests by source address; anything else that
+arrives (e.g., the late answer to a request that already timed out) is
+counted and dropped.
+
+Main server pages are requested from a small pool of threads, so that a
+page that's slow to arrive can be hedged: requested again, from the next
+main server, with the first response used.
+"""
+
+# -------------------------------------------------------------------------------
+
+import socket
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from struct import pack, unpack_from
+
+from loguru import logger
+
+# not public, but the response framing (multi-packet, bz2) and the
+# reader are exactly what's needed to parse responses.
+from steam.game_servers import MSRegion, MSServer, StructReader, _handle_a2s_response
+
+# app_id whose A2S_INFO has extra fields.
+_THE_SHIP = 2400
+
+# -------------------------------------------------------------------------------
+
+
+class Transport:
+    """Pool of UDP sockets, one per thread, for A2S requests."""
+
+    # receive buffer for each socket; room for many late and multi-packet responses.
+    RCVBUF = 1 << 20
+
+    # seconds to wait for a main server page before hedging it, until
+    # there are `HEDGE_SAMPLES` page latencies to take the 95th percentile of.
+    HEDGE_AFTER = 0.5
+    HEDGE_SAMPLES = 8
+    # no sooner than this.
+    HEDGE_MIN = 0.05
+
+    def __init__(self):
+        """Initialize pool with no sockets."""
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sockets = []
+        # counters; see `stats`.
+        self._stats = dict.fromkeys(
+            ("sockets", "requests", "timeouts", "stale", "hedges", "failovers"), 0
+        )
+        # for main server pages; created on first use.
+        self._executor = None
+        # seconds taken by recent main server pages.
+        self._page_latencies = deque(maxlen=64)
+        # main server addr -> when it last failed, or was slow, to answer a page.
+        self._master_failures = {}
+
+    # -------------------------------------------------------------------------------
+
+    def stats(self):
+        """Return dict of counters.
+
+        Returns:
+            sockets:  sockets opened.
+            requests: datagrams sent.
+            timeouts: requests that timed out.
+            stale:    datagrams received from other than the expected server.
+            hedges:   main server pages requested again because they were slow.
+            failovers: main server pages requested again because they failed.
+        """
+
+        with self._lock:
+            return dict(self._stats)
+
+    def count(self, name, n=1):
+        """Add `n` to counter `name`."""
+
+        with self._lock:
+            self._stats[name] += n
+
+    # -------------------------------------------------------------------------------
+
+    def close(self):
+        """Close all sockets; threads that use the pool again get new ones."""
+
+        with self._lock:
+            sockets, self._sockets = self._sockets, []
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for sock in sockets:
+            sock.close()
+        self._local = threading.local()
+
+    # -------------------------------------------------------------------------------
+
+    def _socket(self):
+        """Return the calling thread's socket."""
+
+        if (sock := getattr(self._local, "socket", None)) is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.RCVBUF)
+            except OSError as err:
+                logger.warning(f"SO_RCVBUF {self.RCVBUF}: {err}")
+            self._local.socket = sock
+            with self._lock:
+                self._sockets.append(sock)
+                self._stats["sockets"] += 1
+        return sock
+
+    # -------------------------------------------------------------------------------
+
+    def _channel(self, server_addr, timeout):
+        return _Channel(self, self._socket(), server_addr, timeout)
+
+    # hooks, called by channels for each datagram sent, each received from
+    # the server, and each receive that timed out.
+
+    def on_send(self, name, data):
+        """Datagram `data` was sent to server `name`, "IP:PORTNO"."""
+
+        self.count("requests")
+
+    def on_recv(self, name, data):
+        """Datagram `data` was received from server `name`."""
+
+    def on_timeout(self, name):
+        """A receive from server `name` timed out."""
+
+        self.count("timeouts")
+
+    # -------------------------------------------------------------------------------
+
+    def query_master(
+        self,
+        filter_text=r"\nappid\500",
+        max_servers=20,
+        region=MSRegion.World,
+        master=MSServer.Source,
+        timeout=2,
+    ):
+        """Yield `(ip, port)` of servers listed by the main server.
+
+        Same as `steam.game_servers.query_master`, except that `master` may
+        also be a list of main server addresses. Each page is requested
+        from the one that has gone longest without failing; if it's slow,
+        the page is hedged to the next (or, given just one, to the same
+        one again), and if it fails, the next is asked for the same page,
+        picking up from the last server received.
+        """
+
+        if not isinstance(region, MSRegion):
+            raise TypeError("region_code is not of type MSRegion")
+
+        masters = [master] if isinstance(master, tuple) else list(master)
+        next_ip = b"0.0.0.0:0"
+        prefix = b"1" + pack(">B", region)
+        suffix = b"\x00" + filter_text.encode("utf-8") + b"\x00"
+        # the same server may be listed again after a failover.
+        seen = set()
+
+        while True:
+            data = StructReader(self._page(masters, prefix + next_ip + suffix, timeout))
+            data.skip(6)
+
+            while data.rlen():
+                ip = ".".join(map(str, data.unpack(">BBBB")))
+                (port,) = data.unpack(">H")
+                if ip == "0.0.0.0" and port == 0:
+                    return  # end of list
+                if (ip, port) in seen:
+                    continue
+                seen.add((ip, port))
+                yield ip, port
+                if len(seen) >= max_servers:
+                    return
+
+            next_ip = f"{ip}:{port}".encode()
+
+    # -------------------------------------------------------------------------------
+
+    def _page(self, masters, request, timeout):
+        """Return the response to main server page `request`, hedged and failed over."""
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=len(masters) + 1, thread_name_prefix="master"
+                )
+            executor = self._executor
+            # ones that failed, or were slow, most recently last.
+            untried = deque(sorted(masters, key=lambda x: self._master_failures.get(x, 0)))
+        if len(untried) == 1:
+            untried.append(untried[0])
+
+        pending = {}
+        error = None
+        while True:
+            master = untried.popleft()
+            started = threading.Event()
+            future = executor.submit(self._fetch_started, started, master, request, timeout)
+            # cancelled, if the pool is closed before it starts.
+            future.add_done_callback(lambda _, started=started: started.set())
+            pending[future] = master
+
+            while pending:
+                hedge_after = None
+                if untried:
+                    # other pagers may have every thread of the pool; the
+                    # page is only slow once it has been requested.
+                    started.wait()
+                    hedge_after = self._hedge_after(timeout)
+                done, _ = wait(pending, timeout=hedge_after, return_when=FIRST_COMPLETED)
+                if not done:
+                    self.count("hedges")
+                    logger.debug(f"hedging main server page to {untried[0]}")
+                    self._demote(*pending.values())
+                    break
+
+                for future in done:
+                    master = pending.pop(future)
+                    try:
+                        data, latency = future.result()
+                    except (OSError, RuntimeError) as err:
+                        error = err
+                        logger.warning(f"main server {master[0]}:{master[1]}: {err!r}")
+                        continue
+                    with self._lock:
+                        self._page_latencies.append(latency)
+                    return data
+
+                if untried:
+                    self.count("failovers")
+                    break
+
+            if not pending and not untried:
+                raise error
+
+    def _fetch_started(self, started, master, request, timeout):
+        """Set Event `started`; return `_fetch_page(master, request, timeout)`."""
+
+        started.set()
+        return self._fetch_page(master, request, timeout)
+
+    def _fetch_page(self, master, request, timeout):
+        """Return `(response, seconds)` to page `request` from main server `master`."""
+
+        try:
+            channel = self._channel(master, timeout)
+            start = time.monotonic()
+            channel.send(request)
+            data = channel.recv(8196)
+            if data[:6] != b"\xff\xff\xff\xff\x66\x0a":
+                raise RuntimeError("Invalid response from master server")
+        except (OSError, RuntimeError):
+            # even if the page was hedged, and answered by another.
+            self._demote(master)
+            raise
+        return data, time.monotonic() - start
+
+    def _demote(self, *masters):
+        """Ask `masters` for pages after the others, for now."""
+
+        now = time.monotonic()
+        with self._lock:
+            for master in masters:
+                self._master_failures[master] = now
+
+    def _hedge_after(self, timeout):
+        """Return seconds to wait for a main server page before hedging it."""
+
+        with self._lock:
+            latencies = list(self._page_latencies)
+        if len(latencies) < self.HEDGE_SAMPLES:
+            return min(self.HEDGE_AFTER, timeout)
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        return min(max(p95, self.HEDGE_MIN), timeout)
+
+    # -------------------------------------------------------------------------------
+
+    def a2s_info(self, server_addr, timeout=2):
+        """Get A2S_INFO from server; Source format only.
+
+        Same as `steam.game_servers.a2s_info`.
+        """
+
+        channel = self._channel(server_addr, timeout)
+        payload = pack("<lc", -1, b"T") + b"Source Engine Query\x00"
+        channel.send(payload)
+        start = time.monotonic()
+        data = StructReader(_handle_a2s_response(channel))
+
+        (header,) = data.unpack("<4xc")
+        if header == b"A":
+            # challenge; repeat the request with it.
+            channel.send(payload + data.read(4))
+            start = time.monotonic()
+            data = StructReader(_handle_a2s_response(channel))
+            (header,) = data.unpack("<4xc")
+
+        ping = max(0.0, time.monotonic() - start) * 1000
+
+        if header != b"I":
+            raise RuntimeError(f"Invalid response header - {header!r}")
+
+        info = {
+            "_ping": ping,
+            "_type": "source",
+            "protocol": data.unpack("<b")[0],
+            "name": data.read_cstring(),
+            "map": data.read_cstring(),
+            "folder": data.read_cstring(),
+            "game": data.read_cstring(),
+        }
+        (
+            info["app_id"],
+            info["players"],
+            info["max_players"],
+            info["bots"],
+            info["server_type"],
+            info["environment"],
+            info["visibility"],
+            info["vac"],
+        ) = data.unpack("<HBBBccBB")
+        info["server_type"] = info["server_type"].decode("utf-8", "replace")
+        info["environment"] = info["environment"].decode("utf-8", "replace")
+
+        if info["app_id"] == _THE_SHIP:
+            info["mode"], info["witnesses"], info["duration"] = data.unpack("<BBB")
+
+        info["version"] = data.read_cstring()
+
+        if data.rlen():
+            (edf,) = data.unpack("<B")
+            info["edf"] = edf
+            if edf & 0x80:
+                (info["port"],) = data.unpack("<H")
+            if edf & 0x10:
+                (info["steam_id"],) = data.unpack("<Q")
+            if edf & 0x40:
+                (info["sourcetv_port"],) = data.unpack("<H")
+                info["sourcetv_name"] = data.read_cstring()
+            if edf & 0x20:
+                info["keywords"] = data.read_cstring()
+            if edf & 0x01:
+                (info["game_id"],) = data.unpack("<Q")
+                info["app_id"] = info["game_id"] & 0xFFFFFF
+
+        return info
+
+    # -------------------------------------------------------------------------------
+
+    def a2s_players(self, server_addr, timeout=2):
+        """Get list of players from server.
+
+        Same as `steam.game_servers.a2s_players`.
+        """
+
+        channel = self._channel(server_addr, timeout)
+        data = StructReader(self._challenge(channel, b"U", b"AD"))
+
+        header, num_players = data.unpack("<4xcB")
+        if header != b"D":
+            raise RuntimeError(f"Invalid response header - {header!r}")
+
+        players = []
+        while len(players) < num_players:
+            player = {"index": data.unpack("<B")[0], "name": data.read_cstring()}
+            player["score"], player["duration"] = data.unpack("<lf")
+            players.append(player)
+
+        return players
+
+    # -------------------------------------------------------------------------------
+
+    def a2s_rules(self, server_addr, timeout=2):
+        """Get rules from server.
+
+        Same as `steam.game_servers.a2s_rules`, but values are always strings.
+        """
+
+        channel = self._channel(server_addr, timeout)
+        data = StructReader(self._challenge(channel, b"V", b"A"))
+
+        header, num_rules = data.unpack("<4xcH")
+        if header != b"E":
+            raise RuntimeError(f"Invalid response header - {header!r}")
+
+        rules = {}
+        while len(rules) != num_rules:
+            name = data.read_cstring()
+            rules[name] = data.read_cstring()
+
+        return rules
+
+    # -------------------------------------------------------------------------------
+
+    @staticmethod
+    def _challenge(channel, request, expected):
+        """Send `request` with a challenge from the server; return the response.
+
+        Some servers answer the challenge request with the response itself;
+        `expected` lists the headers accepted in answer to it.
+        """
+
+        channel.send(pack("<lci", -1, request, -1))
+        data = _handle_a2s_response(channel)
+        (header,) = unpack_from("<4xc", data)
+        if header not in expected:
+            raise RuntimeError(f"Unexpected challenge response - {header!r}")
+        if header != b"A":
+            return data
+
+        channel.send(pack("<lc", -1, request) + data[5:9])
+        return _handle_a2s_response(channel)
+
+
+# -------------------------------------------------------------------------------
+
+
+class _Channel:
+    """Socket-like view of a `Transport` socket, for exchanges with one server.
+
+    Has just what `steam.game_servers._handle_a2s_response` uses.
+    """
+
+    def __init__(self, transport, sock, server_addr, timeout):
+
+        self._transport = transport
+        self._sock = sock
+        self._name = f"{server_addr[0]}:{server_addr[1]}"
+        self._addr = (socket.gethostbyname(server_addr[0]), server_addr[1])
+        self._timeout = timeout
+        self._drain()
+
+    def _drain(self):
+        """Drop anything already queued on the socket; it's all stale."""
+
+        self._sock.setblocking(False)
+        try:
+            while True:
+                self._sock.recv(65535)
+                self._transport.count("stale")
+        except BlockingIOError:
+            pass
+
+    def settimeout(self, timeout):
+        """Wait up to `timeout` seconds for each subsequent `recv`."""
+
+        self._timeout = timeout
+
+    def send(self, data):
+        """Send `data` to the server."""
+
+        self._sock.sendto(data, self._addr)
+        self._transport.on_send(self._name, data)
+
+    def recv(self, bufsize):
+        """Return the next datagram from the server."""
+
+        deadline = time.monotonic() + self._timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            self._sock.settimeout(remaining)
+            try:
+                data, addr = self._sock.recvfrom(max(bufsize, 65535))
+            except TimeoutError:
+                break
+            if addr[:2] == self._addr:
+                self._transport.on_recv(self._name, data)
+                return data
+            self._transport.count("stale")
+
+        self._transport.on_timeout(self._name)
+        raise TimeoutError("time out")
+
+
+# -------------------------------------------------------------------------------
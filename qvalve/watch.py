@@ -0,0 +1,82 @@
+"""Watch mode.
+
+Compare each re-scan with what was last reported, so that only servers
+that were added, removed or changed need to be output.
+"""
+
+# -------------------------------------------------------------------------------
+
+# `GameServer` attributes compared between scans.
+WATCHED = ("players", "map_name", "ping", "known_hackers")
+
+# ping changes smaller than this many milliseconds are jitter, not news.
+PING_TOLERANCE = 10
+
+# re-query the main server (to discover new servers) every this many scans;
+# other scans only re-query the servers already known.
+MASTER_EVERY = 10
+
+# -------------------------------------------------------------------------------
+
+
+def snapshot(server):
+    """Return dict of the `WATCHED` attributes of `server`."""
+
+    return {
+        "players": server.players,
+        "map_name": server.map_name,
+        "ping": server.ping,
+        "known_hackers": tuple(str(x) for x in server.known_hackers),
+    }
+
+
+# -------------------------------------------------------------------------------
+
+
+class Differ:
+    """Remember what was last reported about each server; report what changed."""
+
+    def __init__(self, ping_tolerance=PING_TOLERANCE):
+        """Initialize with nothing reported."""
+
+        self.ping_tolerance = ping_tolerance
+        # addr -> snapshot, as last reported.
+        self._reported = {}
+
+    # -------------------------------------------------------------------------------
+
+    def update(self, servers):
+        """Compare `servers`, a dict of `{addr: GameServer}`, with the last report.
+
+        Return list of events `(event, addr, server, changes)`, where
+        `event` is "added", "removed" or "changed", `server` is None when
+        removed, and `changes` is a dict of `{attr: (old, new)}` when
+        changed, else None.
+        """
+
+        events = []
+
+        for addr in self._reported.keys() - servers.keys():
+            del self._reported[addr]
+            events.append(("removed", addr, None, None))
+
+        for addr, server in servers.items():
+            new = snapshot(server)
+            if (old := self._reported.get(addr)) is None:
+                self._reported[addr] = new
+                events.append(("added", addr, server, None))
+                continue
+
+            changes = {k: (old[k], new[k]) for k in WATCHED if old[k] != new[k]}
+            if "ping" in changes and abs(new["ping"] - old["ping"]) < self.ping_tolerance:
+                # let small changes accumulate against the last reported ping.
+                del changes["ping"]
+                new["ping"] = old["ping"]
+            if changes:
+                self._reported[addr] = new
+                events.append(("changed", addr, server, changes))
+
+        return events
+
+
+# -------------------------------------------------------------------------------
@@ -0,0 +1,62 @@
+"""Fixtures; a stand-in game server."""
+
+import socket
+import struct
+import threading
+
+import pytest
+
+CHALLENGE = struct.pack("<l", 12345)
+
+
+def response(header: bytes, body: bytes) -> bytes:
+    return b"\xff\xff\xff\xff" + header + body
+
+
+def info_response() -> bytes:
+    return response(
+        b"I",
+        b"\x11server\x00cp_dustbowl\x00tf\x00Team Fortress\x00"
+        + struct.pack("<HBBBccBB", 440, 5, 24, 1, b"d", b"l", 0, 1)
+        + b"1.0\x00"
+        + b"\x20payload,nocrits\x00",
+    )
+
+
+def players_response() -> bytes:
+    body = struct.pack("<B", 2)
+    for index, name in enumerate([b"bob", b"alice"]):
+        body += struct.pack("<B", index) + name + b"\x00" + struct.pack("<lf", index, 60.0)
+    return response(b"D", body)
+
+
+def rules_response() -> bytes:
+    return response(b"E", struct.pack("<H", 1) + b"sv_tags\x00payload\x00")
+
+
+def _serve(sock: socket.socket) -> None:
+    """Answer A2S requests as a Source server that wants a challenge."""
+
+    while True:
+        try:
+            data, addr = sock.recvfrom(2048)
+        except OSError:
+            return
+        kind = data[4:5]
+        if not data.endswith(CHALLENGE):
+            sock.sendto(response(b"A", CHALLENGE), addr)
+        elif kind == b"T":
+            sock.sendto(info_response(), addr)
+        elif kind == b"U":
+            sock.sendto(players_response(), addr)
+        elif kind == b"V":
+            sock.sendto(rules_response(), addr)
+
+
+@pytest.fixture
+def a2s_server():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    threading.Thread(target=_serve, args=(sock,), daemon=True).start()
+    yield sock.getsockname()
+    sock.close()
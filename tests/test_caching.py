@@ -0,0 +1,51 @@
+import gzip
+
+import pytest
+from flask import Flask
+
+from qvalve.flaskapp.caching import MIN_SIZE, init_app
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    init_app(app)
+
+    @app.route("/big")
+    def big():
+        return {"servers": ["x" * 10] * MIN_SIZE}
+
+    @app.route("/small")
+    def small():
+        return {"servers": []}
+
+    return app.test_client()
+
+
+def test_conditional_get(client) -> None:
+    response = client.get("/big")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+    etag = response.headers["ETag"]
+
+    response = client.get("/big", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_compression(client) -> None:
+    plain = client.get("/big")
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == plain.data
+    assert response.headers["ETag"] != plain.headers["ETag"]
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+    # the tag of the other encoding doesn't match.
+    headers = {"Accept-Encoding": "gzip", "If-None-Match": plain.headers["ETag"]}
+    assert client.get("/big", headers=headers).status_code == 200
+
+
+def test_small_not_compressed(client) -> None:
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
@@ -0,0 +1,82 @@
+import socket
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from qvalve.capture import RECV, SEND, TIMEOUT, RecordingTransport, ReplayTransport, read_capture
+from qvalve.reports import _get_mainserver
+
+
+def test_record_replay(a2s_server: tuple[str, int], tmp_path: Path) -> None:
+    path = tmp_path / "capture.gz"
+    silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    silent.bind(("127.0.0.1", 0))
+    silent_addr = silent.getsockname()
+
+    transport = RecordingTransport(path)
+    info = transport.a2s_info(a2s_server)
+    players = transport.a2s_players(a2s_server)
+    with pytest.raises(TimeoutError):
+        transport.a2s_info(silent_addr, timeout=0.1)
+    transport.close()
+    silent.close()
+
+    kinds = [x[0] for x in read_capture(path)]
+    assert kinds == [SEND, RECV, SEND, RECV, SEND, RECV, SEND, RECV, SEND, TIMEOUT]
+
+    replay = ReplayTransport(path, speed=0)
+    assert replay.a2s_info(a2s_server)["map"] == info["map"]
+    assert replay.a2s_players(a2s_server) == players
+    with pytest.raises(TimeoutError):
+        replay.a2s_info(silent_addr)
+    # not recorded.
+    with pytest.raises(TimeoutError):
+        replay.a2s_info(a2s_server)
+
+    assert replay.stats() == {
+        "sockets": 0,
+        "requests": 6,
+        "timeouts": 2,
+        "stale": 0,
+        "hedges": 0,
+        "failovers": 0,
+    }
+
+
+def test_not_a_capture(tmp_path: Path) -> None:
+    path = tmp_path / "capture.gz"
+    path.write_bytes(b"")
+    with pytest.raises((ValueError, OSError)):
+        ReplayTransport(path)
+
+
+def test_replay_learns_in_memory(a2s_server: tuple[str, int], tmp_path: Path) -> None:
+    path = tmp_path / "capture.gz"
+    transport = RecordingTransport(path)
+    transport.a2s_info(a2s_server)
+    transport.close()
+
+    args = SimpleNamespace(
+        record=None,
+        replay=path,
+        replay_speed=0,
+        max_threads=1,
+        debug=False,
+        show_tags=False,
+        rtt_model=tmp_path / "rtt.json",
+        profile=None,
+        master=[],
+        rollups=tmp_path / "rollups.json",
+        last_known=tmp_path / "last-known.json",
+        snapshot=None,
+    )
+    mainserver = _get_mainserver(args)
+    mainserver.rtt.observe("10.0.0.1", 50)
+    mainserver.rollups.add_scan([])
+    mainserver.rtt.save()
+    mainserver.rollups.save()
+    assert mainserver.last_known.path is None
+    mainserver.transport.close()
+    # replayed pings and scans aren't persisted.
+    assert sorted(tmp_path.iterdir()) == [path]
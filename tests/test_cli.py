@@ -1,5 +1,5 @@
 import sys
-from subprocess import run
+from subprocess import PIPE, run
 
 import pytest
 
@@ -46,6 +46,13 @@ def test_bogus_option() -> None:
     assert err.value.code == 2
 
 
+def test_addr_file_not_found(capsys: pytest.CaptureFixture) -> None:
+    with pytest.raises(SystemExit) as err:
+        main(["--addr-file", "/nonexistent"])
+    assert err.value.code == 2
+    assert "`--addr-file` file '/nonexistent' not found" in capsys.readouterr().err
+
+
 def test_print_config() -> None:
     with pytest.raises(SystemExit) as err:
         main(["--print-config"])
@@ -56,3 +63,34 @@ def test_print_url() -> None:
     with pytest.raises(SystemExit) as err:
         main(["--print-url"])
     assert err.value.code == 0
+
+
+# Modules that only the web server (usage 3) needs; importing any of them
+# when not running the web server is a startup regression.
+WEB_ONLY_MODULES = {"flask", "flask_babel", "flask_bootstrap", "flask_table", "pandas"}
+
+
+def _importtime(*args: str) -> dict[str, int]:
+    """Return `{module: cumulative_usec}` from `python -X importtime`."""
+
+    proc = run([sys.executable, "-X", "importtime", *args], stderr=PIPE, text=True, check=False)
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def test_startup_import_cli() -> None:
+    modules = _importtime("-c", "import qvalve.cli")
+    assert "qvalve.cli" in modules
+    assert not WEB_ONLY_MODULES & modules.keys()
+
+
+def test_startup_version() -> None:
+    modules = _importtime("-m", "qvalve", "--version")
+    assert not WEB_ONLY_MODULES & modules.keys()
+    assert "qvalve.reports" not in modules
+    assert not {"qvalve.formats", "qvalve.gameserver"} & modules.keys()
@@ -0,0 +1,73 @@
+from collections import Counter
+from types import SimpleNamespace
+
+from qvalve.fieldcache import FieldCache
+from qvalve.gameserver import GameServer
+
+
+class _A2s:
+    """Stand-in for `steam.game_servers`; counts requests."""
+
+    def __init__(self) -> None:
+        self.requests = Counter()
+        self.players = 2
+        self.map_name = "pl_upward"
+
+    def a2s_info(self, addr: tuple, timeout: float = 2) -> dict:
+        self.requests["info"] += 1
+        return {
+            "app_id": 440,
+            "server_type": "d",
+            "vac": 1,
+            "visibility": 0,
+            "players": self.players,
+            "max_players": 24,
+            "bots": 0,
+            "map": self.map_name,
+            "keywords": "payload",
+            "_ping": 50.0,
+            "name": "server",
+        }
+
+    def a2s_players(self, addr: tuple) -> list[dict]:
+        self.requests["players"] += 1
+        return [{"name": f"p{x}", "score": x, "duration": 60.0} for x in range(self.players)]
+
+    def a2s_rules(self, addr: tuple) -> dict:
+        self.requests["rules"] += 1
+        return {"sv_tags": "payload,nocrits"}
+
+
+def test_field_cache() -> None:
+    hackerdb = SimpleNamespace(lookup_name=lambda x: [])
+    GameServer.configure(SimpleNamespace(debug=False, show_tags=True), hackerdb)
+    now = [0.0]
+    cache = FieldCache(rules_ttl=600, players_ttl=60, clock=lambda: now[0])
+    a2s = _A2s()
+
+    def _query() -> GameServer:
+        server = GameServer("10.0.0.1:27015")
+        server.query(a2s, cache)
+        return server
+
+    _query()
+    server = _query()
+    # nothing changed; info only, and the rest from the cache.
+    assert a2s.requests == {"info": 2, "players": 1, "rules": 1}
+    assert server.playernames == ["p0", "p1"]
+    assert server.sv_tags == ["payload", "nocrits"]
+
+    a2s.players = 3
+    assert _query().playernames == ["p0", "p1", "p2"]
+    a2s.map_name = "pl_badwater"
+    _query()
+    assert a2s.requests == {"info": 4, "players": 3, "rules": 1}
+
+    now[0] = 61
+    _query()
+    assert a2s.requests == {"info": 5, "players": 4, "rules": 1}
+
+    now[0] = 700
+    _query()
+    assert a2s.requests == {"info": 6, "players": 5, "rules": 2}
+    assert cache.stats()["rules_hits"] == 4
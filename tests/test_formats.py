@@ -0,0 +1,42 @@
+import csv
+import io
+import json
+from types import SimpleNamespace
+
+from qvalve.formats import CsvWriter, NdjsonWriter
+from qvalve.gameserver import GameServer
+
+
+def _server(addr: str) -> GameServer:
+    GameServer.configure(SimpleNamespace(debug=False, show_tags=False), hackerdb=object())
+    server = GameServer(addr, region=1)
+    server.map_name = "pl_upward"
+    server.ping = 42
+    server.keywords = ["payload", "nocrits"]
+    return server
+
+
+def test_ndjson() -> None:
+    file = io.BytesIO()
+    writer = NdjsonWriter(file)
+    writer.write(_server("1.2.3.4:27015"))
+    writer.write(_server("1.2.3.5:27015"))
+    writer.close()
+
+    lines = file.getvalue().decode().splitlines()
+    assert len(lines) == 2
+    record = json.loads(lines[1])
+    assert record["addr"] == "1.2.3.5:27015"
+    assert record["keywords"] == ["payload", "nocrits"]
+
+
+def test_csv() -> None:
+    file = io.BytesIO()
+    writer = CsvWriter(file)
+    writer.write(_server("1.2.3.4:27015"))
+    writer.close()
+
+    rows = list(csv.DictReader(io.StringIO(file.getvalue().decode())))
+    assert len(rows) == 1
+    assert rows[0]["ping"] == "42"
+    assert rows[0]["keywords"] == "payload,nocrits"
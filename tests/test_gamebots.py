@@ -0,0 +1,33 @@
+import re
+from pathlib import Path
+
+from qvalve.gamebots import GamebotMatcher, _trie_pattern
+
+
+def test_trie_pattern() -> None:
+    names = ["Chell", "Chucklenuts", "C++", "Crow", "Crowbar"]
+    regex = re.compile(_trie_pattern(names))
+    for name in names:
+        assert regex.fullmatch(name)
+    for name in ["Che", "Crowb", "Chells", "C+", ""]:
+        assert not regex.fullmatch(name)
+
+
+def test_count(tmp_path: Path) -> None:
+    path = tmp_path / "gamebots.csv"
+    path.write_text("Chell\nAimBot\n/MYG\\)T[0-9]+/\n\n", encoding="utf-8")
+    matcher = GamebotMatcher.load(path)
+    assert matcher.patterns
+
+    players = ["Chell", "(1)Chell", "(2)AimBot", "MYG)T42", "Chellsea", "bob", "x\nChell"]
+    assert matcher.count(players) == 4
+    assert matcher.is_gamebot("(12)Chell")
+    assert not matcher.is_gamebot("aimbot")
+
+
+def test_shipped_list() -> None:
+    path = Path(__file__).parents[1] / "qvalve/data/gamebots.csv"
+    matcher = GamebotMatcher.load(path)
+    assert all(matcher.is_gamebot(x) for x in matcher.names)
+    assert GamebotMatcher().count(["Chell"]) == 0
+    assert GamebotMatcher.load(path.with_name("missing.csv")).count(["Chell"]) == 0
@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+from qvalve.index import KeywordIndex, PlayerIndex, TrigramIndex
+
+
+def _server(addr: str, keywords: list[str], players: int = 1) -> SimpleNamespace:
+    return SimpleNamespace(addr=addr, keywords=keywords, sv_tags=[], players=players)
+
+
+def test_keyword_index() -> None:
+    index = KeywordIndex()
+    index.update(_server("a:1", ["payload", "nocrits"], 10))
+    index.update(_server("b:1", ["payload"], 5))
+    index.update(_server("c:1", ["cp"], 1))
+
+    assert index.select(["payload"]) == {"a:1", "b:1"}
+    assert index.select(["payload"], ["nocrits"]) == {"b:1"}
+    assert index.select(exclude=["payload"]) == {"c:1"}
+    assert index.matches("b:1", ["payload"], ["nocrits"])
+    assert not index.matches("a:1", ["payload"], ["nocrits"])
+
+    nplayers, nservers = index.top(1)
+    assert nplayers == [("payload", 15)]
+    assert nservers == [("payload", 2)]
+
+
+def test_keyword_index_reindex() -> None:
+    index = KeywordIndex()
+    index.update(_server("a:1", ["payload"], 10))
+    index.update(_server("a:1", ["cp"], 3))
+    assert index.select(["payload"]) == set()
+    assert index.top(5) == ([("cp", 3)], [("cp", 1)])
+
+    index.remove("a:1")
+    assert len(index) == 0
+    assert index.top(5) == ([], [])
+
+
+def _players_server(addr: str, names: list[str]) -> SimpleNamespace:
+    return SimpleNamespace(
+        addr=addr,
+        a2s_players=[{"name": x, "score": i, "duration": 60.0 * i} for i, x in enumerate(names)],
+    )
+
+
+def test_player_index() -> None:
+    index = PlayerIndex()
+    index.update(_players_server("a:1", ["Alice", "bob"]))
+    index.update(_players_server("b:1", ["alice ", ""]))
+
+    assert sorted(index.lookup("ALICE")) == [("a:1", "Alice", 0, 0.0), ("b:1", "alice ", 0, 0.0)]
+    assert index.lookup("bob") == [("a:1", "bob", 1, 60.0)]
+    assert index.lookup("carol") == []
+    assert len(index) == 2
+
+
+def test_player_index_expires() -> None:
+    index = PlayerIndex()
+    index.update(_players_server("a:1", ["alice", "bob"]))
+    index.update(_players_server("a:1", ["bob"]))
+    assert index.lookup("alice") == []
+    assert index.lookup("bob") == [("a:1", "bob", 0, 0.0)]
+
+    index.remove("a:1")
+    assert index.lookup("bob") == []
+    assert len(index) == 0
+
+
+def _named(addr: str, server_name: str) -> SimpleNamespace:
+    return SimpleNamespace(addr=addr, server_name=server_name)
+
+
+def test_trigram_index() -> None:
+    index = TrigramIndex("server_name")
+    index.update(_named("a:1", "Uncletopia | Chicago 1"))
+    index.update(_named("b:1", "Uncletopia | Seattle"))
+    index.update(_named("c:1", "Skial Payload"))
+    index.update(_named("d:1", None))
+
+    assert index.select("uncletopia") == {"a:1", "b:1"}
+    assert index.select(r"topia \| (chi|sea)") == {"a:1", "b:1"}
+    assert index.select(r"chicago \d") == {"a:1"}
+    assert index.select("^skial") == {"c:1"}
+    # no required trigram; every server is searched.
+    assert index.select("a|z") == {"a:1", "b:1", "c:1"}
+    assert index.select("zz") == set()
+    assert index.matches("b:1", "SEATTLE")
+    assert not index.matches("a:1", "seattle")
+    assert not index.matches("x:1", "seattle")
+
+
+def test_trigram_index_reindex() -> None:
+    index = TrigramIndex("server_name")
+    index.update(_named("a:1", "Uncletopia"))
+    index.update(_named("a:1", "Skial"))
+    assert index.select("uncletopia") == set()
+    assert index.select("skial") == {"a:1"}
+
+    index.remove("a:1")
+    assert len(index) == 0
+    assert index.select("skial") == set()
@@ -0,0 +1,56 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+from qvalve.lastknown import MAX_AGE, LastKnown
+
+
+def _server(n: int, map_name: str, players: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        addr=f"10.0.0.{n}:27015",
+        ping=10 * n,
+        players=players,
+        max_players=24,
+        bots=0,
+        visibility=0,
+        map_name=map_name,
+    )
+
+
+def test_last_known(tmp_path: Path) -> None:
+    path = tmp_path / "last-known.json"
+    now = [1000.0 * MAX_AGE]
+    known = LastKnown(path, clock=lambda: now[0])
+    known.observe(_server(1, "pl_upward", 20))
+    known.observe(_server(2, "pl_upward", 2))
+    known.observe(_server(3, "cp_dustbowl", 2))
+    now[0] += MAX_AGE / 2
+    known.observe(_server(4, "koth_harvest", 12))
+    known.forget("10.0.0.3:27015")
+    known.save()
+
+    loaded = LastKnown.load(path)
+    assert len(loaded) == 3
+    last = loaded.get("10.0.0.1:27015")
+    assert (last.ping, last.players, last.map_name) == (10, 20, "pl_upward")
+    assert loaded.get("10.0.0.3:27015") is None
+    # maps that a busy server was last seen on.
+    assert loaded.likely_maps(lambda x: x.players >= 10) == {"pl_upward", "koth_harvest"}
+
+    # too old to keep.
+    now[0] += MAX_AGE
+    known.observe(_server(5, "pl_badwater", 0))
+    known.save()
+    assert len(LastKnown.load(path)) == 2
+
+
+def test_last_known_not_json(tmp_path: Path) -> None:
+    path = tmp_path / "last-known.json"
+    path.write_text("[1, 2")
+    assert len(LastKnown.load(path)) == 0
+
+
+def test_last_known_unwritable(tmp_path: Path) -> None:
+    known = LastKnown(tmp_path / "missing" / "last-known.json")
+    known.observe(_server(1, "pl_upward", 20))
+    known.save()
+    assert known._dirty
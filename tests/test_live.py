@@ -0,0 +1,92 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from qvalve.flaskapp.live import BACKLOG, IDLE, LiveFeed, LiveFeeds
+
+
+def _server(addr: str, players: int, ping: int = 50) -> SimpleNamespace:
+    return SimpleNamespace(
+        addr=addr, players=players, map_name="pl_upward", ping=ping, known_hackers=[]
+    )
+
+
+class _MainServer:
+    """Answers requery with whichever of its servers are `up`."""
+
+    def __init__(self, servers: list[SimpleNamespace]) -> None:
+        self.up = {x.addr for x in servers}
+
+    def requery(self, servers: list[SimpleNamespace]) -> list[SimpleNamespace]:
+        return [x for x in servers if x.addr in self.up]
+
+
+def test_live_feed() -> None:
+    servers = [_server("a:1", 5), _server("b:1", 10)]
+    mainserver = _MainServer(servers)
+    feed = LiveFeed()
+    feed.watch(mainserver, servers)
+    subscriber = feed.subscribe()
+
+    sync = json.loads(feed.sync())
+    assert sync["changed"]["a:1"]["players"] == 5
+    assert set(sync["changed"]) == {"a:1", "b:1"}
+
+    # nothing changed, nothing sent.
+    feed.refresh()
+    assert subscriber.empty()
+
+    servers[0].players = 6
+    servers[1].ping = 51  # jitter
+    mainserver.up.discard("b:1")
+    feed.refresh()
+    update = json.loads(subscriber.get_nowait())
+    assert update["changed"] == {"a:1": {"players": 6}}
+    assert update["removed"] == ["b:1"]
+
+    mainserver.up.add("b:1")
+    feed.refresh()
+    update = json.loads(subscriber.get_nowait())
+    assert update["changed"]["b:1"]["players"] == 10
+
+
+def test_live_feed_drops_slow_subscriber() -> None:
+    servers = [_server("a:1", 0)]
+    feed = LiveFeed()
+    feed.watch(_MainServer(servers), servers)
+    subscriber = feed.subscribe()
+
+    for players in range(1, BACKLOG + 2):
+        servers[0].players = players
+        feed.refresh()
+
+    assert subscriber.get_nowait() is None
+    # no longer subscribed; no longer re-queried.
+    feed.refresh()
+    assert subscriber.empty()
+
+
+def test_live_feeds_by_search(monkeypatch: pytest.MonkeyPatch) -> None:
+    feeds = LiveFeeds(every=3600)
+    payload = [_server("a:1", 5)]
+    koth = [_server("b:1", 10)]
+    feeds.watch("payload", _MainServer(payload), payload)
+    feeds.watch("koth", _MainServer(koth), koth)
+
+    # each browser gets the rows of its own search.
+    assert set(json.loads(feeds.get("payload").sync())["changed"]) == {"a:1"}
+    assert set(json.loads(feeds.get("koth").sync())["changed"]) == {"b:1"}
+    subscriber = feeds.get("koth").subscribe()
+    payload[0].players = 6
+    koth[0].players = 11
+    feeds.refresh()
+    assert json.loads(subscriber.get_nowait())["changed"] == {"b:1": {"players": 11}}
+
+    # one nobody is watching is dropped, in time.
+    now = time.monotonic() + IDLE
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    feeds.refresh()
+    assert feeds.get("payload") is None
+    assert feeds.get("koth") is not None
@@ -0,0 +1,307 @@
+import json
+import socket
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from qvalve.gameserver import GameServer
+from qvalve.mainserver import MainServer
+from qvalve.profiling import Profiler
+from qvalve.snapshot import Snapshot
+from qvalve.transport import Transport
+
+ADDRS = [(f"10.0.0.{x}", 27015) for x in range(20)]
+
+
+class _Listing(Transport):
+    """Main server that lists `ADDRS`."""
+
+    def query_master(self, **kwargs):
+        yield from ADDRS
+
+
+@pytest.fixture
+def mainserver() -> MainServer:
+    GameServer.configure(
+        SimpleNamespace(debug=False, show_tags=False), SimpleNamespace(lookup_name=lambda x: [])
+    )
+    mainserver = MainServer(max_threads=1, transport=_Listing())
+    queried = mainserver.queried = []
+
+    def _query(gameserver: GameServer) -> None:
+        # server N has ping 100-N and N players; one worker, so in order.
+        queried.append(gameserver.addr)
+        n = int(gameserver.server_host.split(".")[-1])
+        gameserver.ping = 100 - n
+        gameserver.players = n
+
+    mainserver._query = _query
+    return mainserver
+
+
+def test_isearch_ranks_by_last_known(mainserver: MainServer) -> None:
+    assert len(mainserver.search([1])) == len(ADDRS)
+    mainserver.queried.clear()
+
+    def likely(x: GameServer) -> bool:
+        return x.players >= 15
+
+    servers = mainserver.search([1], likely=likely)
+    assert len(servers) == len(ADDRS)
+    # passing last time, lowest ping first; then the rest.
+    assert mainserver.queried[:5] == [f"10.0.0.{x}:27015" for x in range(19, 14, -1)]
+    assert mainserver.queried[5] == "10.0.0.14:27015"
+
+
+def test_isearch_ranks_by_map(mainserver: MainServer) -> None:
+    query = mainserver._query
+
+    def _query(gameserver: GameServer) -> None:
+        query(gameserver)
+        gameserver.map_name = "cp_b" if gameserver.players % 2 else "pl_a"
+
+    mainserver._query = _query
+    mainserver.search([1])
+    mainserver.queried.clear()
+
+    def likely(x: GameServer) -> bool:
+        return x.players >= 18 and x.map_name.startswith("pl_")
+
+    mainserver.search([1], likely=likely)
+    # passing last time; then on the map of one that passed; then the rest.
+    assert mainserver.queried[0] == "10.0.0.18:27015"
+    assert mainserver.queried[1:10] == [f"10.0.0.{x}:27015" for x in range(16, -1, -2)]
+
+
+def test_isearch_ranks_as_listed(mainserver: MainServer) -> None:
+    listed = []
+
+    def query_master(**kwargs: object) -> Iterator[tuple[str, int]]:
+        for n in range(100_000):
+            listed.append(n)
+            yield (f"10.{n // 65536}.{n // 256 % 256}.{n % 256}", 27015)
+
+    mainserver.transport.query_master = query_master
+    servers = mainserver.isearch([1], likely=lambda x: True)
+    next(servers)
+    # ranked a window at a time; not the whole listing first.
+    assert len(listed) < 1000
+    servers.close()
+
+
+def test_isearch_close_cancels(mainserver: MainServer) -> None:
+    gate = threading.Event()
+    query = mainserver._query
+
+    def _query(gameserver: GameServer) -> None:
+        query(gameserver)
+        gate.wait(1)
+
+    mainserver._query = _query
+    servers = mainserver.isearch([1])
+    next(servers)
+    servers.close()
+    gate.set()
+    # the worker finishes what it has, and skips the rest.
+    mainserver._workq.join()
+    assert len(mainserver.queried) < len(ADDRS)
+
+
+def test_isearch_deadline(mainserver: MainServer) -> None:
+    query = mainserver._query
+
+    def _query(gameserver: GameServer) -> None:
+        query(gameserver)
+        time.sleep(0.05)
+
+    mainserver._query = _query
+    start = time.monotonic()
+    servers = mainserver.search([1], deadline=0.3)
+    assert time.monotonic() - start < 1
+    # partial results, and how many of those listed so far were skipped; not rolled up.
+    assert 0 < len(servers) < len(ADDRS)
+    assert 0 < servers.skipped <= len(ADDRS) - len(servers)
+    assert len(mainserver.rollups) == 0
+
+    # counted per search; not left over for the next.
+    assert mainserver.search([1]).skipped == 0
+
+
+def test_filtered_not_rolled_up(mainserver: MainServer) -> None:
+    servers = mainserver.search([1], filters={"appid": 440})
+    full = mainserver.rollups.series("minute")
+    assert full[1][("region", "1")]["servers"] == [len(ADDRS)]
+
+    def query_master(**kwargs: object) -> Iterator[tuple[str, int]]:
+        yield from ADDRS[:5] if kwargs.get("filter_text") != "appid\\440" else ADDRS
+
+    # of only some servers; it would replace the full scan's minute.
+    mainserver.transport.query_master = query_master
+    mainserver.search([1], filters={"appid": 440, "map": "pl_upward"})
+    mainserver.search([1], filter_text="appid\\440\\empty\\1")
+    mainserver.search([1], max_ping=50)
+    list(mainserver.requery(servers[:5]))
+    assert mainserver.rollups.series("minute") == full
+
+
+def test_isearch_profiler(mainserver: MainServer, tmp_path: Path) -> None:
+    profiler = Profiler(tmp_path / "search.pstats")
+    mainserver.search([1], profiler=profiler)
+    profiler.save()
+    # traced by the search's own profiler; the shared server's is untouched.
+    events = json.loads(profiler.trace_path.read_text())["traceEvents"]
+    assert sum(x["name"] == "query" for x in events if x["ph"] == "X") == len(ADDRS)
+    assert not mainserver.profiler.enabled
+
+
+class _Sweep(Transport):
+    """Lists servers in 10.0.0/24, that answer in 10ms, and 10.1.0/24, that never do."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.probed = []
+
+    def query_master(self, **kwargs):
+        # a far server first, to be in flight when the near ones place.
+        yield ("10.1.0.0", 27015)
+        yield from [(f"10.0.0.{x}", 27015) for x in range(4)]
+        yield from [(f"10.1.0.{x}", 27015) for x in range(1, 40)]
+
+    def a2s_info(self, server_addr, timeout=2):
+        self.probed.append(server_addr[0])
+        if server_addr[0].startswith("10.1."):
+            time.sleep(timeout)
+            raise socket.timeout
+        info = {"app_id": 440, "server_type": "d", "vac": 1, "visibility": 0, "map": "pl_x"}
+        info.update(players=1, max_players=24, bots=0, keywords="", name="near", _ping=10.0)
+        return info
+
+
+def test_ping_sweep_abandons(mainserver: MainServer) -> None:
+    # configured by the fixture; this one needs several workers.
+    transport = _Sweep()
+    mainserver = MainServer(max_threads=8, transport=transport)
+    for _ in range(3):
+        mainserver.rtt.observe("10.1.0.200", 500)
+
+    start = time.monotonic()
+    servers = mainserver.ping_sweep([1], count=3)
+    # placed without waiting out the far servers in flight, or probing the rest.
+    assert time.monotonic() - start < 1
+    assert [x.ping for x in servers] == [10, 10, 10]
+    assert len([x for x in transport.probed if x.startswith("10.1.")]) < 10
+
+
+def test_ping_sweep_keeps_state(mainserver: MainServer) -> None:
+    mainserver.search([1])
+
+    def a2s_info(server_addr: tuple[str, int], timeout: float = 2) -> dict:
+        raise socket.timeout
+
+    # nothing answers the probes; what the full scan learned is kept.
+    mainserver.transport.a2s_info = a2s_info
+    assert mainserver.ping_sweep([1], count=3) == []
+    assert len(mainserver.last_known) == len(ADDRS)
+    assert mainserver.last_known.get("10.0.0.7:27015").players == 7
+
+
+def test_isearch_publishes_snapshot(mainserver: MainServer, tmp_path: Path) -> None:
+    mainserver.snapshot = tmp_path / "snapshot"
+    servers = mainserver.isearch([1])
+    next(servers)
+    servers.close()
+    # incomplete; not published.
+    assert not mainserver.snapshot.exists()
+
+    mainserver.search([1])
+    with Snapshot.open(mainserver.snapshot) as snapshot:
+        assert sorted(snapshot.column("players")) == list(range(len(ADDRS)))
+        assert snapshot.select(min_players=18) == [
+            i for i, x in enumerate(snapshot.column("players")) if x >= 18
+        ]
+
+
+def test_backpressure(mainserver: MainServer) -> None:
+    listed = []
+
+    def query_master(**kwargs: object) -> Iterator[tuple[str, int]]:
+        for n in range(100_000):
+            listed.append(n)
+            yield (f"10.{n // 65536}.{n // 256 % 256}.{n % 256}", 27015)
+
+    mainserver.transport.query_master = query_master
+    servers = mainserver.isearch([1])
+    next(servers)
+    time.sleep(0.3)
+    # paging waits for the workers, and they for the consumer.
+    assert len(listed) < 20
+    servers.close()
+
+
+def test_stalled_consumer(mainserver: MainServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("qvalve.mainserver._STALL_TIMEOUT", 0.2)
+    stalled = mainserver.isearch([1])
+    next(stalled)
+    time.sleep(0.5)
+    # the workers gave up on it, and are free for the next scan.
+    start = time.monotonic()
+    assert len(mainserver.search([1])) == len(ADDRS)
+    assert time.monotonic() - start < 1
+    tallies = []
+    monkeypatch.setattr(mainserver.rollups, "add_tally", tallies.append)
+    # when it resumes, it ends with what it was given; not rolled up.
+    assert len(list(stalled)) < len(ADDRS) - 1
+    assert not tallies
+
+
+def test_isearch_sets(mainserver: MainServer) -> None:
+    requests = []
+
+    def query_master(**kwargs: object) -> Iterator[tuple[str, int]]:
+        # appid 440 lists servers 0-9; 500, 5-14.
+        requests.append(kwargs["filter_text"])
+        first = 0 if kwargs["filter_text"] == "appid\\440" else 5
+        yield from ADDRS[first : first + 10]
+
+    mainserver.transport.query_master = query_master
+    listed = {}
+    servers = mainserver.isearch_sets(
+        {
+            "tf2": {"regions": [1], "filters": {"appid": 440}},
+            "busy": {"regions": [1], "filters": {"appid": 440}},
+            "other": {"regions": [1], "filters": {"appid": 500}},
+        },
+        listed,
+    )
+
+    # identical searches are sent once; each server is queried once.
+    assert len(list(servers)) == 15
+    assert sorted(requests) == ["appid\\440", "appid\\500"]
+    assert sorted(mainserver.queried) == sorted(set(mainserver.queried))
+    assert listed["10.0.0.0:27015"] == {"tf2", "busy"}
+    assert listed["10.0.0.7:27015"] == {"tf2", "busy", "other"}
+    assert listed["10.0.0.14:27015"] == {"other"}
+
+
+def test_isearch_regions_take_turns(mainserver: MainServer) -> None:
+    def query_master(**kwargs: object) -> Iterator[tuple[str, int]]:
+        region = int(kwargs["region"])
+        yield from [(f"10.{region}.0.{x}", 27015) for x in range(20)]
+
+    def _query(gameserver: GameServer) -> None:
+        # region 0 is far away; its servers time out.
+        mainserver.queried.append(gameserver.region)
+        if gameserver.region == 0:
+            time.sleep(0.01)
+        else:
+            gameserver.ping = 10
+
+    mainserver.transport.query_master = query_master
+    mainserver._query = _query
+    assert len(mainserver.search([0, 1])) == 20
+    # region 1 doesn't wait for region 0.
+    assert mainserver.queried[:20].count(1) >= 10
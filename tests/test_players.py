@@ -0,0 +1,85 @@
+import os
+import random
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+import steam.game_servers
+from loguru import logger
+
+from qvalve.gameserver import GameServer
+from qvalve.players import Players
+
+
+def _a2s_players(names):
+    return [
+        {"index": 0, "name": x, "score": i, "duration": 1.5 * i} for i, x in enumerate(names)
+    ]
+
+
+def test_from_a2s_sorts_once() -> None:
+    players = Players.from_a2s(_a2s_players(["bob", "Alice", "", "carol"]))
+    assert players.names == ("", "Alice", "bob", "carol")
+    assert list(players.scores) == [2, 1, 0, 3]
+    assert len(players) == 4
+
+
+def test_from_a2s_attributes() -> None:
+    players = Players.from_a2s(_a2s_players(["bob", "alice"]), lambda x: x.upper())
+    assert [x["attributes"] for x in players] == ["ALICE", "BOB"]
+
+
+def test_names_are_interned() -> None:
+    one = Players.from_a2s(_a2s_players(["".join(["pl", "ayer"])]))
+    two = Players.from_a2s(_a2s_players(["".join(["play", "er"])]))
+    assert one.names[0] is two.names[0]
+
+
+def test_to_list() -> None:
+    players = Players.from_a2s(_a2s_players(["bob"]))
+    assert players.to_list() == [
+        {"name": "bob", "score": 0, "duration": 0.0, "attributes": ""},
+    ]
+
+
+def test_empty() -> None:
+    players = Players()
+    assert len(players) == 0
+    assert players.to_list() == []
+
+
+bench = pytest.mark.skipif(not os.environ.get("BENCH"), reason="bench")
+
+
+@bench
+def test_bench_memory(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Scan 50k simulated servers, each full of players; report memory per server."""
+
+    nservers = 50_000
+    pool = [f"player{x}" for x in range(20_000)]
+    rng = random.Random(0)
+
+    monkeypatch.setattr(
+        steam.game_servers,
+        "a2s_players",
+        # decode names afresh, as each response would be.
+        lambda addr: _a2s_players([x.encode().decode() for x in rng.sample(pool, 24)]),
+    )
+    hackerdb = SimpleNamespace(lookup_name=lambda name: [])
+    GameServer.configure(SimpleNamespace(debug=False, show_tags=False), hackerdb)
+
+    logger.disable("qvalve")
+    tracemalloc.start()
+    servers = [GameServer(f"10.{x >> 8 & 255}.{x & 255}.1:27015") for x in range(nservers)]
+    baseline, _ = tracemalloc.get_traced_memory()
+    for server in servers:
+        server._get_a2s_players()  # noqa: SLF001
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    logger.enable("qvalve")
+
+    per_server = (current - baseline) / nservers
+    print(f"\n{nservers} servers: {per_server:,.0f} bytes/server for players, peak {peak:,}")
+    assert all(len(x.playernames) == 24 for x in servers)
+    # 24 full dicts plus a sorted copy of the names was ~5.5KB per server.
+    assert per_server < 2_000
@@ -0,0 +1,42 @@
+import json
+import pstats
+import threading
+from pathlib import Path
+
+from qvalve.profiling import Profiler
+
+
+def _work() -> int:
+    return sum(x * x for x in range(1000))
+
+
+def test_profiler_disabled() -> None:
+    profiler = Profiler()
+    with profiler.thread(), profiler.span("work", n=1) as span:
+        span["result"] = _work()
+    assert span == {"n": 1, "result": 332833500}
+    profiler.save()
+
+
+def test_profiler(tmp_path: Path) -> None:
+    profiler = Profiler(tmp_path / "scan.pstats")
+
+    def worker() -> None:
+        with profiler.thread(), profiler.span("work", addr="a:1") as span:
+            span["result"] = _work()
+
+    with profiler.thread():
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    profiler.save()
+
+    stats = pstats.Stats(str(profiler.path))
+    assert any(x[2] == "_work" for x in stats.stats)
+
+    events = json.loads(profiler.trace_path.read_text())["traceEvents"]
+    spans = [x for x in events if x["ph"] == "X"]
+    assert len(spans) == 3
+    assert all(x["name"] == "work" and x["args"]["addr"] == "a:1" for x in spans)
@@ -47,6 +47,11 @@ def test_report_keywords() -> None:
     main(["--regions", "1", "-v", "--report-keywords"])
 
 
+@slow
+def test_ping_sweep() -> None:
+    main(["--regions", "1", "-v", "--ping-sweep", "5"])
+
+
 # def test_web():
 #    os.environ['FLASK_APP'] = 'qvalve.web'
 #    os.environ['FLASK_ENV'] = 'development'
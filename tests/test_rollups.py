@@ -0,0 +1,88 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+from qvalve.rollups import MAX_SERIES, OTHER, RESOLUTIONS, Rollups
+
+HOUR = 3600
+DAY = 86400
+
+
+def _server(map_name: str, players: int, ping: int = 50, region: int = 1) -> SimpleNamespace:
+    return SimpleNamespace(map_name=map_name, players=players, ping=ping, region=region)
+
+
+def test_add_scan() -> None:
+    rollups = Rollups()
+    rollups.add_scan([_server("pl_upward", 10, 40), _server("pl_upward", 20, 60)], when=DAY)
+    # the last scan in a minute wins.
+    rollups.add_scan([_server("pl_upward", 12, 40), _server("cp_dustbowl", 3)], when=DAY + 30)
+
+    starts, series = rollups.series("minute")
+    assert starts == [DAY]
+    assert series[("map", "pl_upward")] == {"players": [12], "servers": [1], "ping": [40]}
+    assert series[("region", "1")]["players"] == [15]
+    assert series[("region", "1")]["servers"] == [2]
+
+
+def test_downsample() -> None:
+    rollups = Rollups()
+    for minute in range(60):
+        rollups.add_scan(
+            [_server("pl_upward", minute % 2 * 10, 40 + minute)], when=DAY + minute * 60
+        )
+    assert rollups.series("hour") == ([], {})
+
+    # the first scan of the next hour closes this one.
+    rollups.add_scan([], when=DAY + HOUR)
+    starts, series = rollups.series("hour", "map")
+    assert starts == [DAY]
+    assert series == {("map", "pl_upward"): {"players": [5.0], "servers": [1.0], "ping": [69.5]}}
+
+    # and of the next day, the day; from the hours that had scans.
+    rollups.add_scan([], when=2 * DAY)
+    starts, series = rollups.series("day")
+    assert starts == [DAY]
+    assert series[("map", "pl_upward")]["players"] == [5.0]
+
+
+def test_other() -> None:
+    rollups = Rollups()
+    rollups.add_scan([_server(f"map{x}", 1) for x in range(MAX_SERIES + 10)], when=DAY)
+
+    _, series = rollups.series("minute", "map")
+    assert len(series) == MAX_SERIES
+    assert series[("map", OTHER)]["players"] == [11]
+
+
+def test_constant_memory() -> None:
+    rollups = Rollups()
+    for minute in range(0, 200 * 24 * 60, 7):
+        rollups.add_scan([_server("pl_upward", 5)], when=minute * 60)
+
+    for name, _, nslots in RESOLUTIONS:
+        starts, series = rollups.series(name)
+        assert len(starts) <= nslots
+        assert all(len(x["players"]) == len(starts) for x in series.values())
+    assert len(rollups.series("day")[0]) == RESOLUTIONS[-1][2]
+
+
+def test_save_load(tmp_path: Path) -> None:
+    path = tmp_path / "rollups.json"
+    rollups = Rollups(path)
+    rollups.add_scan([_server("pl_upward", 10)], when=DAY)
+    rollups.add_scan([_server("pl_upward", 20)], when=DAY + HOUR)
+    rollups.save()
+
+    loaded = Rollups.load(path)
+    for name, _, _ in RESOLUTIONS:
+        assert loaded.series(name) == rollups.series(name)
+
+    path.write_text("{", encoding="utf-8")
+    assert len(Rollups.load(path)) == 0
+
+
+def test_save_unwritable(tmp_path: Path) -> None:
+    rollups = Rollups(tmp_path / "missing" / "rollups.json")
+    rollups.add_scan([_server("pl_upward", 10)], when=DAY)
+    rollups.save()
+    assert rollups._dirty
@@ -0,0 +1,28 @@
+from pathlib import Path
+
+from qvalve.rttmodel import RttModel
+
+
+def test_classify(tmp_path: Path) -> None:
+    model = RttModel(tmp_path / "rtt.json")
+    for i in range(20):
+        model.observe(f"1.2.3.{i}", 200 + i)
+        model.observe(f"1.2.4.{i}", 40 + i)
+
+    model.VERIFY_FRACTION = 0
+    assert model.classify("1.2.3.99", max_ping=100) == "skip"
+    assert model.classify("1.2.4.99", max_ping=100) == "probe"
+    # unseen /24; falls back to the /16, whose floor is under the limit.
+    assert model.classify("1.2.5.1", max_ping=100) == "defer"
+    assert model.classify("9.9.9.9", max_ping=100) == "probe"
+
+    model.save()
+    assert RttModel.load(model.path).estimate("1.2.3.99") == model.estimate("1.2.3.99")
+
+
+def test_save_unwritable(tmp_path: Path) -> None:
+    model = RttModel(tmp_path / "missing" / "rtt.json")
+    model.observe("1.2.3.4", 50)
+    # warned, not raised; kept, to save again later.
+    model.save()
+    assert model._dirty
@@ -0,0 +1,88 @@
+import threading
+
+from qvalve.scheduler import QUANTUM, FairQueue
+
+
+def _drain(queue: FairQueue, count: int) -> list[str]:
+    keys = []
+    for _ in range(count):
+        item, key = queue.get()
+        keys.append(key)
+        queue.task_done(key)
+    return keys
+
+
+def test_round_robin() -> None:
+    queue = FairQueue(nworkers=4, maxsize=100)
+    for n in range(20):
+        queue.put(n, "far")
+    for n in range(3):
+        queue.put(n, "near")
+
+    keys = _drain(queue, 23)
+    # near doesn't wait for far to finish.
+    assert keys[: 2 * QUANTUM].count("near") == 3
+    queue.join()
+
+
+def test_failures_limit_concurrency() -> None:
+    queue = FairQueue(nworkers=8, maxsize=100)
+    for n in range(50):
+        queue.put(n, "far")
+        _, key = queue.get()
+        queue.task_done(key, failed=True)
+    assert queue.stats()["far"]["limit"] == 1
+    assert queue.stats()["far"]["weight"] == 1
+
+    for n in range(8):
+        queue.put(n, "far")
+        queue.put(n, "near")
+    # far is held to one in progress, while near has work waiting.
+    got = [queue.get()[1] for _ in range(8)]
+    assert got.count("far") == 1
+    for key in got:
+        queue.task_done(key)
+
+    _drain(queue, 8)
+    queue.join()
+
+
+def test_limit_waits_when_saturated() -> None:
+    queue = FairQueue(nworkers=2, maxsize=100)
+    for n in range(30):
+        queue.put(n, "far")
+        queue.put(n, "near")
+        for _ in range(2):
+            _, key = queue.get()
+            queue.task_done(key, failed=True)
+
+    for n in range(4):
+        queue.put(n, "far")
+        queue.put(n, "near")
+    # each is held to one in progress; a third worker waits for a slot.
+    assert {queue.get()[1], queue.get()[1]} == {"far", "near"}
+    waiter = threading.Thread(target=queue.get, daemon=True)
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+
+    queue.task_done("near")
+    waiter.join(1)
+    assert not waiter.is_alive()
+
+
+def test_put_waits_per_key() -> None:
+    queue = FairQueue(nworkers=1, maxsize=2)
+    queue.put(0, "far")
+    queue.put(1, "far")
+    blocked = threading.Thread(target=queue.put, args=(2, "far"), daemon=True)
+    blocked.start()
+    blocked.join(0.1)
+    assert blocked.is_alive()
+
+    # a full key doesn't hold up another.
+    queue.put(0, "near")
+    while queue.get()[1] != "far":
+        pass
+    blocked.join(1)
+    assert not blocked.is_alive()
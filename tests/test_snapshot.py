@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import pytest
+
+from qvalve.gameserver import GameServer
+from qvalve.snapshot import Snapshot, SnapshotWriter
+
+
+def _server(n: int, map_name: str) -> GameServer:
+    server = GameServer(f"10.0.0.{n}:27015", region=n % 2)
+    server.map_name = map_name
+    server.server_name = f"server ☃ {n}"
+    server.players = n
+    server.ping = None if n == 0 else 10 * n
+    server.keywords = ["payload", "nocrits"] if n % 2 else []
+    return server
+
+
+def _publish(path: Path, maps: list[str], when: float = 1000.0) -> None:
+    writer = SnapshotWriter()
+    for n, map_name in enumerate(maps):
+        writer.add(_server(n, map_name))
+    writer.publish(path, when)
+
+
+def test_snapshot(tmp_path: Path) -> None:
+    path = tmp_path / "snapshot"
+    _publish(path, ["pl_upward", "cp_dustbowl", "pl_upward", "pl_badwater"])
+
+    with Snapshot.open(path) as snapshot:
+        assert len(snapshot) == 4
+        assert snapshot.created == 1000.0
+        assert list(snapshot.column("players")) == [0, 1, 2, 3]
+        record = snapshot.record(1)
+        assert record["addr"] == "10.0.0.1:27015"
+        assert record["region"] == 1
+        assert record["map_name"] == "cp_dustbowl"
+        assert record["server_name"] == "server ☃ 1"
+        assert record["keywords"] == ["payload", "nocrits"]
+        assert record["app_id"] is None
+        assert snapshot.record(0)["ping"] is None
+        assert snapshot.record(0)["keywords"] == []
+
+        assert snapshot.select(map_prefix="pl_") == [0, 2, 3]
+        assert snapshot.select(map_prefix="pl_", min_players=2, max_ping=20) == [2]
+        # no ping; doesn't answer.
+        assert 0 not in snapshot.select(max_ping=100)
+        assert snapshot.select(map_prefix="pl_upward_long") == []
+
+
+def test_snapshot_strings_interned(tmp_path: Path) -> None:
+    once = tmp_path / "once"
+    many = tmp_path / "many"
+    _publish(once, ["pl_upward"])
+    _publish(many, ["pl_upward"] * 2)
+    # each additional server costs its columns, and its own strings only.
+    cost = many.stat().st_size - once.stat().st_size
+    assert cost < 100
+
+
+def test_snapshot_replaced(tmp_path: Path) -> None:
+    path = tmp_path / "snapshot"
+    _publish(path, ["pl_upward"], when=1000.0)
+    snapshot = Snapshot.open(path)
+    assert not snapshot.is_stale()
+    assert snapshot.refresh() is snapshot
+
+    _publish(path, ["cp_dustbowl", "koth_harvest"], when=2000.0)
+    # still reads what it opened.
+    assert snapshot.is_stale()
+    assert snapshot.record(0)["map_name"] == "pl_upward"
+    assert list(tmp_path.iterdir()) == [path]
+
+    latest = snapshot.refresh()
+    assert latest.created == 2000.0
+    assert [x["map_name"] for x in latest] == ["cp_dustbowl", "koth_harvest"]
+    latest.close()
+
+
+def test_snapshot_not_a_snapshot(tmp_path: Path) -> None:
+    path = tmp_path / "snapshot"
+    path.write_bytes(b"not a snapshot, but long enough to hold a header; honestly.")
+    with pytest.raises(ValueError, match="not a version"):
+        Snapshot.open(path)
+    path.write_bytes(b"short")
+    with pytest.raises(ValueError, match="not a snapshot"):
+        Snapshot.open(path)
@@ -0,0 +1,161 @@
+import socket
+import struct
+import threading
+import time
+
+import pytest
+from conftest import info_response
+
+from qvalve.transport import Transport
+
+
+def test_transport(a2s_server: tuple[str, int]) -> None:
+    transport = Transport()
+
+    info = transport.a2s_info(a2s_server)
+    assert info["map"] == "cp_dustbowl"
+    assert info["players"] == 5
+    assert info["keywords"] == "payload,nocrits"
+    assert info["_ping"] >= 0
+
+    players = transport.a2s_players(a2s_server)
+    assert [x["name"] for x in players] == ["bob", "alice"]
+    assert players[1]["score"] == 1
+
+    assert transport.a2s_rules(a2s_server) == {"sv_tags": "payload"}
+
+    # one socket for all requests from this thread; two datagrams each.
+    assert transport.stats() == {
+        "sockets": 1,
+        "requests": 6,
+        "timeouts": 0,
+        "stale": 0,
+        "hedges": 0,
+        "failovers": 0,
+    }
+    transport.close()
+
+
+def test_transport_stale(a2s_server: tuple[str, int]) -> None:
+    transport = Transport()
+    silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    silent.bind(("127.0.0.1", 0))
+
+    with pytest.raises(TimeoutError):
+        transport.a2s_info(silent.getsockname(), timeout=0.1)
+
+    # a late answer from the silent server is dropped by the next request.
+    silent.sendto(info_response(), transport._socket().getsockname())
+    assert transport.a2s_info(a2s_server)["map"] == "cp_dustbowl"
+
+    stats = transport.stats()
+    assert stats["sockets"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["stale"] == 1
+    silent.close()
+    transport.close()
+
+
+SERVERS = [(f"10.0.0.{x}", 27015) for x in range(30)]
+
+
+def _master(sock: socket.socket, delay: float = 0, valid: bool = True) -> None:
+    """Answer main server page requests for `SERVERS`, 20 per page."""
+
+    while True:
+        try:
+            data, addr = sock.recvfrom(2048)
+        except OSError:
+            return
+        time.sleep(delay)
+        host, port = data[2 : data.index(b"\x00", 2)].decode().split(":")
+        start = 0 if host == "0.0.0.0" else SERVERS.index((host, int(port))) + 1
+        body = b"".join(
+            socket.inet_aton(h) + struct.pack(">H", p) for h, p in SERVERS[start:][:20]
+        )
+        if start + 20 >= len(SERVERS):
+            body += b"\x00" * 6
+        sock.sendto(b"\xff\xff\xff\xff" + (b"\x66\x0a" if valid else b"??") + body, addr)
+
+
+def _masters(*behaviors: dict | None) -> list[socket.socket]:
+    """Return a main server socket for each of `behaviors`; `None` is silent."""
+
+    socks = []
+    for kw in behaviors:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        if kw is not None:
+            threading.Thread(target=_master, args=(sock,), kwargs=kw, daemon=True).start()
+        socks.append(sock)
+    return socks
+
+
+def test_query_master() -> None:
+    transport = Transport()
+    (good,) = _masters({})
+    servers = list(transport.query_master(master=good.getsockname(), max_servers=100))
+    assert servers == SERVERS
+    assert transport.stats()["requests"] == 2
+    good.close()
+    transport.close()
+
+
+def test_query_master_hedges_slow_page() -> None:
+    transport = Transport()
+    # silent, then good.
+    socks = _masters(None, {})
+    masters = [x.getsockname() for x in socks]
+
+    servers = list(transport.query_master(master=masters, max_servers=100, timeout=0.3))
+    assert servers == SERVERS
+    # only the first page waited for the silent one; it's tried last after that.
+    stats = transport.stats()
+    assert stats["hedges"] == 1
+    assert stats["requests"] == 3
+    for sock in socks:
+        sock.close()
+    transport.close()
+
+
+def test_query_master_fails_over() -> None:
+    transport = Transport()
+    socks = _masters({"valid": False}, {})
+    masters = [x.getsockname() for x in socks]
+
+    servers = list(transport.query_master(master=masters, max_servers=25))
+    assert servers == SERVERS[:25]
+    assert transport.stats()["failovers"] == 1
+
+    with pytest.raises(RuntimeError):
+        list(transport.query_master(master=masters[:1]))
+    for sock in socks:
+        sock.close()
+    transport.close()
+
+
+def test_concurrent_pages_not_hedged() -> None:
+    transport = Transport()
+    master = ("127.0.0.1", 27011)
+    fetched = []
+
+    def _fetch_page(master: tuple, request: bytes, timeout: float) -> tuple[bytes, float]:
+        fetched.append(master)
+        time.sleep(0.3)
+        return b"\xff\xff\xff\xff\x66\x0a", 0.3
+
+    transport._fetch_page = _fetch_page
+    # more pagers (e.g., a region each) than the pool has threads.
+    pagers = [
+        threading.Thread(target=transport._page, args=([master], b"page", 2)) for _ in range(4)
+    ]
+    for pager in pagers:
+        pager.start()
+    for pager in pagers:
+        pager.join()
+
+    # waiting for a thread isn't the main server being slow.
+    assert len(fetched) == 4
+    assert transport.stats()["hedges"] == 0
+    assert not transport._master_failures
+    transport.close()
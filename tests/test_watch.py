@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from qvalve.watch import Differ
+
+
+def _server(players: int, ping: int, map_name: str = "pl_upward") -> SimpleNamespace:
+    return SimpleNamespace(players=players, ping=ping, map_name=map_name, known_hackers=[])
+
+
+def test_differ() -> None:
+    differ = Differ(ping_tolerance=10)
+
+    events = differ.update({"a": _server(1, 50), "b": _server(2, 60)})
+    assert sorted(x[0] for x in events) == ["added", "added"]
+
+    # no change, and ping jitter under the tolerance.
+    assert differ.update({"a": _server(1, 55), "b": _server(2, 60)}) == []
+
+    # jitter accumulates against the last reported ping.
+    events = differ.update({"a": _server(1, 61), "b": _server(2, 60)})
+    assert events == [("changed", "a", events[0][2], {"ping": (50, 61)})]
+
+    events = differ.update({"a": _server(3, 61, "cp_dustbowl")})
+    assert ("removed", "b", None, None) in events
+    changed = [x for x in events if x[0] == "changed"]
+    assert changed[0][3] == {"players": (1, 3), "map_name": ("pl_upward", "cp_dustbowl")}